@@ -14,62 +14,70 @@ import torch.nn as nn
 import torch.nn.functional as F
 import dgl
 from dgl import DGLGraph
+import dgl.function as fn
+from dgl.nn import edge_softmax
 from dgl.data import register_data_args, load_data
 
-def gat_message(edges):
-    return {'ft' : edges.src['ft'], 'a2' : edges.src['a2']}
+# the features of all the heads are batched, so that one SPMV propagates
+# all the heads: ft is of shape (N, H, D) and e of shape (E, H, 1)
+gat_message = fn.src_mul_edge(src='ft', edge='e', out='ft')
+gat_reduce = fn.sum(msg='ft', out='accum')
 
-class GATReduce(nn.Module):
+class GATAttention(nn.Module):
     def __init__(self, attn_drop):
-        super(GATReduce, self).__init__()
+        super(GATAttention, self).__init__()
         self.attn_drop = attn_drop
 
-    def forward(self, nodes):
-        a1 = torch.unsqueeze(nodes.data['a1'], 1)  # shape (B, 1, 1)
-        a2 = nodes.mailbox['a2'] # shape (B, deg, 1)
-        ft = nodes.mailbox['ft'] # shape (B, deg, D)
-        # attention
-        a = a1 + a2  # shape (B, deg, 1)
-        e = F.softmax(F.leaky_relu(a), dim=1)
+    def forward(self, g):
+        # attention score of each edge and head
+        g.apply_edges(lambda edges : {
+            'a' : F.leaky_relu(edges.dst['a1'] + edges.src['a2'])})
+        # normalize over the in-edges of each node
+        e = edge_softmax(g, g.edata.pop('a'))  # shape (E, H, 1)
         if self.attn_drop != 0.0:
             e = F.dropout(e, self.attn_drop)
-        return {'accum' : torch.sum(e * ft, dim=1)} # shape (B, D)
+        g.edata['e'] = e
 
 class GATFinalize(nn.Module):
-    def __init__(self, headid, indim, hiddendim, activation, residual):
+    def __init__(self, num_heads, indim, hiddendim, activation, residual):
         super(GATFinalize, self).__init__()
-        self.headid = headid
+        self.num_heads = num_heads
+        self.hiddendim = hiddendim
         self.activation = activation
         self.residual = residual
         self.residual_fc = None
         if residual:
-            if indim != hiddendim:
-                self.residual_fc = nn.Linear(indim, hiddendim)
+            if indim != num_heads * hiddendim:
+                self.residual_fc = nn.Linear(indim, num_heads * hiddendim)
 
     def forward(self, nodes):
-        ret = nodes.data['accum']
+        ret = nodes.data['accum']  # shape (N, H, D)
         if self.residual:
+            h = nodes.data['h']
             if self.residual_fc is not None:
-                ret = self.residual_fc(nodes.data['h']) + ret
-            else:
-                ret = nodes.data['h'] + ret
-        return {'head%d' % self.headid : self.activation(ret)}
+                h = self.residual_fc(h)
+            ret = h.view(-1, self.num_heads, self.hiddendim) + ret
+        return {'out' : self.activation(ret)}
 
 class GATPrepare(nn.Module):
-    def __init__(self, indim, hiddendim, drop):
+    def __init__(self, num_heads, indim, hiddendim, drop):
         super(GATPrepare, self).__init__()
-        self.fc = nn.Linear(indim, hiddendim)
+        self.num_heads = num_heads
+        self.hiddendim = hiddendim
+        self.fc = nn.Linear(indim, num_heads * hiddendim)
         self.drop = drop
-        self.attn_l = nn.Linear(hiddendim, 1)
-        self.attn_r = nn.Linear(hiddendim, 1)
+        self.attn_l = nn.Parameter(torch.Tensor(1, num_heads, hiddendim))
+        self.attn_r = nn.Parameter(torch.Tensor(1, num_heads, hiddendim))
+        nn.init.xavier_normal_(self.attn_l)
+        nn.init.xavier_normal_(self.attn_r)
 
     def forward(self, feats):
         h = feats
         if self.drop != 0.0:
             h = F.dropout(h, self.drop)
-        ft = self.fc(h)
-        a1 = self.attn_l(ft)
-        a2 = self.attn_r(ft)
+        ft = self.fc(h).view(-1, self.num_heads, self.hiddendim)
+        a1 = (ft * self.attn_l).sum(dim=-1, keepdim=True)  # shape (N, H, 1)
+        a2 = (ft * self.attn_r).sum(dim=-1, keepdim=True)  # shape (N, H, 1)
         return {'h' : h, 'ft' : ft, 'a1' : a1, 'a2' : a2}
 
 class GAT(nn.Module):
@@ -92,45 +100,39 @@ class GAT(nn.Module):
         self.red = nn.ModuleList()
         self.fnl = nn.ModuleList()
         # input projection (no residual)
-        for hid in range(num_heads):
-            self.prp.append(GATPrepare(in_dim, num_hidden, in_drop))
-            self.red.append(GATReduce(attn_drop))
-            self.fnl.append(GATFinalize(hid, in_dim, num_hidden, activation, False))
+        self.prp.append(GATPrepare(num_heads, in_dim, num_hidden, in_drop))
+        self.red.append(GATAttention(attn_drop))
+        self.fnl.append(GATFinalize(num_heads, in_dim, num_hidden, activation, False))
         # hidden layers
         for l in range(num_layers - 1):
-            for hid in range(num_heads):
-                # due to multi-head, the in_dim = num_hidden * num_heads
-                self.prp.append(GATPrepare(num_hidden * num_heads, num_hidden, in_drop))
-                self.red.append(GATReduce(attn_drop))
-                self.fnl.append(GATFinalize(hid, num_hidden * num_heads,
-                                            num_hidden, activation, residual))
+            # due to multi-head, the in_dim = num_hidden * num_heads
+            self.prp.append(GATPrepare(num_heads, num_hidden * num_heads,
+                                       num_hidden, in_drop))
+            self.red.append(GATAttention(attn_drop))
+            self.fnl.append(GATFinalize(num_heads, num_hidden * num_heads,
+                                        num_hidden, activation, residual))
         # output projection
-        self.prp.append(GATPrepare(num_hidden * num_heads, num_classes, in_drop))
-        self.red.append(GATReduce(attn_drop))
-        self.fnl.append(GATFinalize(0, num_hidden * num_heads,
+        self.prp.append(GATPrepare(1, num_hidden * num_heads, num_classes, in_drop))
+        self.red.append(GATAttention(attn_drop))
+        self.fnl.append(GATFinalize(1, num_hidden * num_heads,
                                     num_classes, activation, residual))
         # sanity check
-        assert len(self.prp) == self.num_layers * self.num_heads + 1
-        assert len(self.red) == self.num_layers * self.num_heads + 1
-        assert len(self.fnl) == self.num_layers * self.num_heads + 1
+        assert len(self.prp) == self.num_layers + 1
+        assert len(self.red) == self.num_layers + 1
+        assert len(self.fnl) == self.num_layers + 1
 
     def forward(self, features):
         last = features
-        for l in range(self.num_layers):
-            for hid in range(self.num_heads):
-                i = l * self.num_heads + hid
-                # prepare
-                self.g.ndata.update(self.prp[i](last))
-                # message passing
-                self.g.update_all(gat_message, self.red[i], self.fnl[i])
+        for i in range(self.num_layers + 1):
+            # prepare
+            self.g.ndata.update(self.prp[i](last))
+            # attention
+            self.red[i](self.g)
+            # message passing of all the heads
+            self.g.update_all(gat_message, gat_reduce, self.fnl[i])
             # merge all the heads
-            last = torch.cat(
-                    [self.g.pop_n_repr('head%d' % hid) for hid in range(self.num_heads)],
-                    dim=1)
-        # output projection
-        self.g.ndata.update(self.prp[-1](last))
-        self.g.update_all(gat_message, self.red[-1], self.fnl[-1])
-        return self.g.pop_n_repr('head0')
+            last = self.g.pop_n_repr('out').view(self.g.number_of_nodes(), -1)
+        return last
 
 def main(args):
     # load and preprocess dataset
@@ -23,9 +23,7 @@ class NodeApplyModule(nn.Module):
         self.activation = activation
 
     def forward(self, nodes):
-        # normalization by square root of dst degree
-        h = nodes.data['h'] * nodes.data['norm']
-        h = self.linear(h)
+        h = self.linear(nodes.data['h'])
         if self.activation:
             h = self.activation(h)
         return {'h': h}
@@ -66,9 +64,9 @@ class GCN(nn.Module):
             # apply dropout
             if idx > 0 and self.dropout:
                 self.g.ndata['h'] = self.dropout(self.g.ndata['h'])
-            # normalization by square root of src degree
-            self.g.ndata['h'] = self.g.ndata['h'] * self.g.ndata['norm']
-            self.g.update_all(fn.copy_src(src='h', out='m'),
+            # normalization by square roots of the src and dst degrees,
+            # with the degree normalizers cached on the graph
+            self.g.update_all(fn.copy_src_norm(src='h', out='m', norm='both'),
                               fn.sum(msg='m', out='h'),
                               layer)
         return self.g.pop_n_repr('h')
@@ -106,18 +104,11 @@ def main(args):
         val_mask = val_mask.cuda()
         test_mask = test_mask.cuda()
 
-    # graph preprocess and calculate normalization factor
+    # graph preprocess
     g = DGLGraph(data.graph)
     n_edges = g.number_of_edges()
     # add self loop
     g.add_edges(g.nodes(), g.nodes())
-    # normalization
-    degs = g.in_degrees().float()
-    norm = torch.pow(degs, -0.5)
-    norm[torch.isinf(norm)] = 0
-    if cuda:
-        norm = norm.cuda()
-    g.ndata['norm'] = norm.unsqueeze(1)
 
     # create GCN model
     model = GCN(g,
@@ -84,18 +84,15 @@ class RGCNBasisLayer(RGCNLayer):
             weight = self.weight
 
         if self.is_input_layer:
-            def msg_func(edges):
-                # for input layer, matrix multiply can be converted to be
-                # an embedding lookup using source node id
-                embed = weight.view(-1, self.out_feat)
-                index = edges.data['type'] * self.in_feat + edges.src['id']
-                return {'msg': embed[index] * edges.data['norm']}
+            # for input layer, matrix multiply can be converted to be
+            # an embedding lookup using source node id
+            msg_func = fn.src_embedding(src='id', table=weight, out='msg',
+                                        type='type', edge='norm')
         else:
-            def msg_func(edges):
-                w = weight[edges.data['type']]
-                msg = torch.bmm(edges.src['h'].unsqueeze(1), w).squeeze()
-                msg = msg * edges.data['norm']
-                return {'msg': msg}
+            # one matrix multiplication per relation on the grouped edges
+            msg_func = fn.src_mul_typed_weight(src='h', type='type',
+                                               weight=weight, out='msg',
+                                               edge='norm')
 
         g.update_all(msg_func, fn.sum(msg='msg', out='h'), None)
 
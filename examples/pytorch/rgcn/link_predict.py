@@ -4,7 +4,7 @@ Paper: https://arxiv.org/abs/1703.06103
 Code: https://github.com/MichSchli/RelationPrediction
 
 Difference compared to MichSchli/RelationPrediction
-* report raw metrics instead of filtered metrics
+* report raw metrics by default; pass --filtered for filtered metrics
 """
 
 import argparse
@@ -15,6 +15,7 @@ import torch.nn as nn
 import torch.nn.functional as F
 import random
 from dgl.contrib.data import load_data
+from dgl.contrib.sampling import EdgeNeighborhoodSampler
 
 from layers import RGCNBlockLayer as RGCNLayer
 from model import BaseRGCN
@@ -104,6 +105,11 @@ def main(args):
                         reg_param=args.regularization)
 
     # validation and testing triplets
+    # known triplets for filtered metrics
+    if args.filtered:
+        filter_data = np.concatenate((train_data, valid_data, test_data))
+    else:
+        filter_data = None
     valid_data = torch.LongTensor(valid_data)
     test_data = torch.LongTensor(test_data)
 
@@ -121,8 +127,10 @@ def main(args):
     if use_cuda:
         model.cuda()
 
-    # build adj list and calculate degrees for sampling
-    adj_list, degrees = utils.get_adj_and_degrees(num_nodes, train_data)
+    # edge neighborhood sampler of the training graph
+    sampler = EdgeNeighborhoodSampler(
+        utils.build_sampling_graph(num_nodes, train_data),
+        args.graph_batch_size, negative_rate=args.negative_sample)
 
     # optimizer
     optimizer = torch.optim.Adam(model.parameters(), lr=args.lr)
@@ -143,8 +151,8 @@ def main(args):
         # perform edge neighborhood sampling to generate training graph and data
         g, node_id, edge_type, node_norm, data, labels = \
             utils.generate_sampled_graph_and_labels(
-                train_data, args.graph_batch_size, args.graph_split_size,
-                num_rels, adj_list, degrees, args.negative_sample)
+                train_data, sampler, args.graph_batch_size,
+                args.graph_split_size, num_rels, args.negative_sample)
         print("Done edge sampling")
 
         # set node/edge feature
@@ -183,7 +191,9 @@ def main(args):
             model.eval()
             print("start eval")
             mrr = utils.evaluate(test_graph, model, valid_data, num_nodes,
-                                 hits=[1, 3, 10], eval_bz=args.eval_batch_size)
+                                 hits=[1, 3, 10], eval_bz=args.eval_batch_size,
+                                 filter_triplets=filter_data,
+                                 num_workers=args.eval_workers)
             # save best model
             if mrr < best_mrr:
                 if epoch >= args.n_epochs:
@@ -208,7 +218,8 @@ def main(args):
     model.load_state_dict(checkpoint['state_dict'])
     print("Using best epoch: {}".format(checkpoint['epoch']))
     utils.evaluate(test_graph, model, test_data, num_nodes, hits=[1, 3, 10],
-                   eval_bz=args.eval_batch_size)
+                   eval_bz=args.eval_batch_size, filter_triplets=filter_data,
+                   num_workers=args.eval_workers)
 
 
 if __name__ == '__main__':
@@ -231,6 +242,10 @@ if __name__ == '__main__':
             help="dataset to use")
     parser.add_argument("--eval-batch-size", type=int, default=500,
             help="batch size when evaluating")
+    parser.add_argument("--eval-workers", type=int, default=1,
+            help="number of threads for evaluation")
+    parser.add_argument("--filtered", action="store_true",
+            help="report filtered metrics")
     parser.add_argument("--regularization", type=float, default=0.01,
             help="regularization weight")
     parser.add_argument("--grad-norm", type=float, default=1.0,
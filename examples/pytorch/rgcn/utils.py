@@ -15,81 +15,32 @@ import dgl
 #
 #######################################################################
 
-def get_adj_and_degrees(num_nodes, triplets):
-    """ Get adjacency list and degrees of the graph
+def build_sampling_graph(num_nodes, triplets):
+    """ Create the graph of the training triplets to sample edges from
     """
-    adj_list = [[] for _ in range(num_nodes)]
-    for i,triplet in enumerate(triplets):
-        adj_list[triplet[0]].append([i, triplet[2]])
-        adj_list[triplet[2]].append([i, triplet[0]])
-
-    degrees = np.array([len(a) for a in adj_list])
-    adj_list = [np.array(a) for a in adj_list]
-    return adj_list, degrees
-
-def sample_edge_neighborhood(adj_list, degrees, n_triplets, sample_size):
-    """ Edge neighborhood sampling to reduce training graph size
-    """
-
-    edges = np.zeros((sample_size), dtype=np.int32)
-
-    #initialize
-    sample_counts = np.array([d for d in degrees])
-    picked = np.array([False for _ in range(n_triplets)])
-    seen = np.array([False for _ in degrees])
-
-    for i in range(0, sample_size):
-        weights = sample_counts * seen
-
-        if np.sum(weights) == 0:
-            weights = np.ones_like(weights)
-            weights[np.where(sample_counts == 0)] = 0
-
-        probabilities = (weights) / np.sum(weights)
-        chosen_vertex = np.random.choice(np.arange(degrees.shape[0]),
-                                         p=probabilities)
-        chosen_adj_list = adj_list[chosen_vertex]
-        seen[chosen_vertex] = True
-
-        chosen_edge = np.random.choice(np.arange(chosen_adj_list.shape[0]))
-        chosen_edge = chosen_adj_list[chosen_edge]
-        edge_number = chosen_edge[0]
-
-        while picked[edge_number]:
-            chosen_edge = np.random.choice(np.arange(chosen_adj_list.shape[0]))
-            chosen_edge = chosen_adj_list[chosen_edge]
-            edge_number = chosen_edge[0]
-
-        edges[i] = edge_number
-        other_vertex = chosen_edge[1]
-        picked[edge_number] = True
-        sample_counts[chosen_vertex] -= 1
-        sample_counts[other_vertex] -= 1
-        seen[other_vertex] = True
-
-    return edges
+    g = dgl.DGLGraph()
+    g.add_nodes(num_nodes)
+    g.add_edges(triplets[:, 0], triplets[:, 2])
+    return g
 
-def generate_sampled_graph_and_labels(triplets, sample_size, split_size,
-                                      num_rels, adj_list, degrees,
-                                      negative_rate):
+def generate_sampled_graph_and_labels(triplets, sampler, sample_size,
+                                      split_size, num_rels, negative_rate):
     """Get training graph and signals
-    First perform edge neighborhood sampling on graph, then perform negative
-    sampling to generate negative samples
+    Draw an edge neighborhood sample of the training graph, along with its
+    negative samples
     """
-    # perform edge neighbor sampling
-    edges = sample_edge_neighborhood(adj_list, degrees, len(triplets),
-                                     sample_size)
-
-    # relabel nodes to have consecutive node ids
-    edges = triplets[edges]
-    src, rel, dst = edges.transpose()
-    uniq_v, edges = np.unique((src, dst), return_inverse=True)
-    src, dst = np.reshape(edges, (2, -1))
-    relabeled_edges = np.stack((src, rel, dst)).transpose()
-
-    # negative sampling
-    samples, labels = negative_sampling(relabeled_edges, len(uniq_v),
-                                        negative_rate)
+    # edge neighborhood sampling, relabeling and negative sampling
+    sample = next(sampler)
+    uniq_v = sample.nodes.numpy()
+    src, dst = sample.src.numpy(), sample.dst.numpy()
+    rel = triplets[sample.edges.numpy()][:, 1]
+    pos_samples = np.stack((src, rel, dst)).transpose()
+    neg_samples = np.stack((sample.neg_src.numpy(),
+                            np.tile(rel, negative_rate),
+                            sample.neg_dst.numpy())).transpose()
+    samples = np.concatenate((pos_samples, neg_samples))
+    labels = np.zeros(len(samples), dtype=np.float32)
+    labels[: len(pos_samples)] = 1
 
     # further split graph, only half of the edges will be used as graph
     # structure, while the rest half is used as unseen positive samples
@@ -108,10 +59,8 @@ def generate_sampled_graph_and_labels(triplets, sample_size, split_size,
     return g, uniq_v, rel, norm, samples, labels
 
 def comp_deg_norm(g):
-    in_deg = g.in_degrees(range(g.number_of_nodes())).float().numpy()
-    norm = 1.0 / in_deg
-    norm[np.isinf(norm)] = 0
-    return norm
+    _, norm = g.degree_norm('right')
+    return norm.numpy()
 
 def build_graph_from_triplets(num_nodes, num_rels, triplets):
     """ Create a DGL graph. The graph is bidirectional because RGCN authors
@@ -136,77 +85,102 @@ def build_test_graph(num_nodes, num_rels, edges):
     print("Test graph:")
     return build_graph_from_triplets(num_nodes, num_rels, (src, rel, dst))
 
-def negative_sampling(pos_samples, num_entity, negative_rate):
-    size_of_batch = len(pos_samples)
-    num_to_generate = size_of_batch * negative_rate
-    neg_samples = np.tile(pos_samples, (negative_rate, 1))
-    labels = np.zeros(size_of_batch * (negative_rate + 1), dtype=np.float32)
-    labels[: size_of_batch] = 1
-    values = np.random.randint(num_entity, size=num_to_generate)
-    choices = np.random.uniform(size=num_to_generate)
-    subj = choices > 0.5
-    obj = choices <= 0.5
-    neg_samples[subj, 0] = values[subj]
-    neg_samples[obj, 2] = values[obj]
-
-    return np.concatenate((pos_samples, neg_samples)), labels
-
 #######################################################################
 #
 # Utility function for evaluations
 #
 #######################################################################
 
-def sort_and_rank(score, target):
-    _, indices = torch.sort(score, dim=1, descending=True)
-    indices = torch.nonzero(indices == target.view(-1, 1))
-    indices = indices[:, 1].view(-1)
-    return indices
+def build_filter_index(triplets):
+    """ Index the known triplets for filtered ranking
 
-def perturb_and_get_rank(embedding, w, a, r, b, num_entity, batch_size=100):
+    Returns two dicts, from (subject, relation) to the array of the known
+    objects, and from (object, relation) to the array of the known subjects.
+    Each array is sorted and has no duplicates.
+    """
+    def _index(heads, rels, tails):
+        order = np.lexsort((tails, rels, heads))
+        heads, rels, tails = heads[order], rels[order], tails[order]
+        bounds = np.flatnonzero((heads[1:] != heads[:-1]) |
+                                (rels[1:] != rels[:-1])) + 1
+        starts = np.concatenate(([0], bounds))
+        return {(heads[i], rels[i]) : t for i, t in
+                zip(starts, np.split(tails, bounds))}
+    # the same triplet can appear in several splits
+    triplets = np.unique(np.asarray(triplets), axis=0)
+    s, r, o = triplets[:, 0], triplets[:, 1], triplets[:, 2]
+    return _index(s, r, o), _index(o, r, s)
+
+def perturb_and_get_rank(embedding, w, a, r, b, num_entity, batch_size=100,
+                         known=None, num_workers=1):
     """ Perturb one element in the triplets
+
+    Returns the 0-indexed rank of each target b among all entities, i.e. the
+    number of entities scoring higher. Scores are computed in tiles of
+    (batch_size x batch_size * 100) entities. If ``known`` maps (a, r) to
+    the array of the known entities, these entities (other than the target)
+    are not counted (filtered ranking).
     """
-    n_batch = (num_entity + batch_size - 1) // batch_size
-    ranks = []
-    for idx in range(n_batch):
-        print("batch {} / {}".format(idx, n_batch))
-        batch_start = idx * batch_size
-        batch_end = min(num_entity, (idx + 1) * batch_size)
-        batch_a = a[batch_start: batch_end]
-        batch_r = r[batch_start: batch_end]
-        emb_ar = embedding[batch_a] * w[batch_r]
-        emb_ar = emb_ar.transpose(0, 1).unsqueeze(2) # size: D x E x 1
-        emb_c = embedding.transpose(0, 1).unsqueeze(1) # size: D x 1 x V
-        # out-prod and reduce sum
-        out_prod = torch.bmm(emb_ar, emb_c) # size D x E x V
-        score = torch.sum(out_prod, dim=0) # size E x V
-        score = torch.sigmoid(score)
-        target = b[batch_start: batch_end]
-        ranks.append(sort_and_rank(score, target))
+    entity_block = batch_size * 100
+    def _rank(start, end):
+        batch_a = a[start: end]
+        batch_r = r[start: end]
+        batch_b = b[start: end]
+        emb_ar = embedding[batch_a] * w[batch_r] # size: B x D
+        target = torch.sum(emb_ar * embedding[batch_b], dim=1, keepdim=True)
+        # (query, entity) pairs that never count: the target itself, whatever
+        # the rounding, and the other known entities if filtered
+        qid, cand = [torch.arange(end - start)], [batch_b]
+        if known is not None:
+            for i, (ai, ri) in enumerate(zip(batch_a.tolist(), batch_r.tolist())):
+                c = known.get((ai, ri))
+                if c is not None:
+                    qid.append(torch.full((len(c),), i, dtype=torch.long))
+                    cand.append(torch.from_numpy(c))
+        qid, cand = torch.cat(qid), torch.cat(cand)
+        rank = torch.zeros(end - start, dtype=torch.long)
+        for v in range(0, num_entity, entity_block):
+            score = torch.mm(emb_ar, embedding[v: v + entity_block].t())
+            inside = (cand >= v) & (cand < v + entity_block)
+            score[qid[inside], cand[inside] - v] = -float('inf')
+            rank += torch.sum(score > target, dim=1)
+        return rank
+    ranks = dgl.utils.map_blocks(_rank, len(a), batch_size, num_workers)
     return torch.cat(ranks)
 
-# TODO (lingfan): implement filtered metrics
-# return MRR (raw), and Hits @ (1, 3, 10)
-def evaluate(test_graph, model, test_triplets, num_entity, hits=[], eval_bz=100):
+def evaluate(test_graph, model, test_triplets, num_entity, hits=[], eval_bz=100,
+             filter_triplets=None, num_workers=1):
+    """ Return MRR and print Hits @ k
+
+    The metrics are filtered if the known triplets are given: other known
+    triplets scoring higher than a test triplet do not count in its rank.
+    """
     with torch.no_grad():
         embedding, w = model.evaluate(test_graph)
         s = test_triplets[:, 0]
         r = test_triplets[:, 1]
         o = test_triplets[:, 2]
+        if filter_triplets is not None:
+            known_o, known_s = build_filter_index(filter_triplets)
+            setting = "filtered"
+        else:
+            known_o = known_s = None
+            setting = "raw"
 
         # perturb subject
-        ranks_s = perturb_and_get_rank(embedding, w, o, r, s, num_entity, eval_bz)
+        ranks_s = perturb_and_get_rank(embedding, w, o, r, s, num_entity,
+                                       eval_bz, known_s, num_workers)
         # perturb object
-        ranks_o = perturb_and_get_rank(embedding, w, s, r, o, num_entity, eval_bz)
+        ranks_o = perturb_and_get_rank(embedding, w, s, r, o, num_entity,
+                                       eval_bz, known_o, num_workers)
 
         ranks = torch.cat([ranks_s, ranks_o])
         ranks += 1 # change to 1-indexed
 
         mrr = torch.mean(1.0 / ranks.float())
-        print("MRR (raw): {:.6f}".format(mrr.item()))
+        print("MRR ({}): {:.6f}".format(setting, mrr.item()))
 
         for hit in hits:
             avg_count = torch.mean((ranks <= hit).float())
-            print("Hits (raw) @ {}: {:.6f}".format(hit, avg_count.item()))
+            print("Hits ({}) @ {}: {:.6f}".format(setting, hit, avg_count.item()))
     return mrr.item()
-
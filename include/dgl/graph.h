@@ -8,13 +8,14 @@
 
 #include <vector>
 #include <cstdint>
+#include <mutex>
 #include <utility>
 #include <tuple>
 #include "runtime/ndarray.h"
+#include "id_vector.h"
 
 namespace dgl {
 
-typedef uint64_t dgl_id_t;
 typedef dgl::runtime::NDArray IdArray;
 typedef dgl::runtime::NDArray DegreeArray;
 typedef dgl::runtime::NDArray BoolArray;
@@ -39,6 +40,10 @@ struct Subgraph;
  * vertex ids. In the general case, the two arrays should have the same length.
  * If the length of src id array is one, it represents one-many connections.
  * If the length of dst id array is one, it represents many-one connections.
+ *
+ * The graph structure stores ids in either 32 or 64 bits (see IdBits). A 32-bit
+ * graph switches to 64 bits once it has more than IdVector::kMaxNarrowId
+ * vertices or edges.
  */
 class Graph {
  public:
@@ -48,8 +53,17 @@ class Graph {
     IdArray src, dst, id;
   } EdgeArray;
 
-  /*! \brief default constructor */
-  explicit Graph(bool multigraph = false) : is_multigraph_(multigraph) {}
+  /*!
+   * \brief default constructor
+   * \param multigraph Whether the graph is a multigraph.
+   * \param id_bits Number of bits to store each id in the graph structure,
+   *        either 32 or 64.
+   */
+  explicit Graph(bool multigraph = false, int id_bits = 64)
+    : all_edges_src_(id_bits == 64), all_edges_dst_(id_bits == 64),
+      is_multigraph_(multigraph), id_bits_(id_bits) {
+    CHECK(id_bits == 32 || id_bits == 64) << "Invalid id bits: " << id_bits;
+  }
 
   /*! \brief default copy constructor */
   Graph(const Graph& other) = default;
@@ -66,6 +80,8 @@ class Graph {
     read_only_ = other.read_only_;
     is_multigraph_ = other.is_multigraph_;
     num_edges_ = other.num_edges_;
+    id_bits_ = other.id_bits_;
+    stale_index_ = other.stale_index_;
     other.Clear();
   }
 #endif  // _MSC_VER
@@ -106,6 +122,7 @@ class Graph {
     reverse_adjlist_.clear();
     all_edges_src_.clear();
     all_edges_dst_.clear();
+    stale_index_.clear();
     read_only_ = false;
     num_edges_ = 0;
   }
@@ -118,6 +135,14 @@ class Graph {
     return is_multigraph_;
   }
 
+  /*!
+   * \return the number of bits each id is stored in, 32 or 64. A 32-bit graph
+   *         becomes a 64-bit one when it grows too large.
+   */
+  int IdBits() const {
+    return id_bits_;
+  }
+
   /*! \return the number of vertices in the graph.*/
   uint64_t NumVertices() const {
     return adjlist_.size();
@@ -318,7 +343,7 @@ class Graph {
    * \param vid The vertex id.
    * \return the successor vector
    */
-  const std::vector<dgl_id_t>& SuccVec(dgl_id_t vid) const {
+  const IdVector& SuccVec(dgl_id_t vid) const {
     return adjlist_[vid].succ;
   }
 
@@ -327,7 +352,7 @@ class Graph {
    * \param vid The vertex id.
    * \return the out edge id vector
    */
-  const std::vector<dgl_id_t>& OutEdgeVec(dgl_id_t vid) const {
+  const IdVector& OutEdgeVec(dgl_id_t vid) const {
     return adjlist_[vid].edge_id;
   }
 
@@ -336,7 +361,7 @@ class Graph {
    * \param vid The vertex id.
    * \return the predecessor vector
    */
-  const std::vector<dgl_id_t>& PredVec(dgl_id_t vid) const {
+  const IdVector& PredVec(dgl_id_t vid) const {
     return reverse_adjlist_[vid].succ;
   }
 
@@ -345,7 +370,7 @@ class Graph {
    * \param vid The vertex id.
    * \return the in edge id vector
    */
-  const std::vector<dgl_id_t>& InEdgeVec(dgl_id_t vid) const {
+  const IdVector& InEdgeVec(dgl_id_t vid) const {
     return reverse_adjlist_[vid].edge_id;
   }
 
@@ -353,10 +378,19 @@ class Graph {
   friend class GraphOp;
   /*! \brief Internal edge list type */
   struct EdgeList {
+    explicit EdgeList(bool wide = true) : succ(wide), edge_id(wide), sorted(wide) {}
     /*! \brief successor vertex list */
-    std::vector<dgl_id_t> succ;
+    IdVector succ;
     /*! \brief predecessor vertex list */
-    std::vector<dgl_id_t> edge_id;
+    IdVector edge_id;
+    /*!
+     * \brief edge lookup index
+     *
+     * Positions in succ sorted by successor (ties in position order), for
+     * binary search of the edges to a given successor. Only built for
+     * out-edge lists of vertices with a large degree; empty otherwise.
+     */
+    IdVector sorted;
   };
   typedef std::vector<EdgeList> AdjacencyList;
 
@@ -366,9 +400,9 @@ class Graph {
   AdjacencyList reverse_adjlist_;
 
   /*! \brief all edges' src endpoints in their edge id order */
-  std::vector<dgl_id_t> all_edges_src_;
+  IdVector all_edges_src_;
   /*! \brief all edges' dst endpoints in their edge id order */
-  std::vector<dgl_id_t> all_edges_dst_;
+  IdVector all_edges_dst_;
 
   /*! \brief read only flag */
   bool read_only_ = false;
@@ -380,6 +414,66 @@ class Graph {
   bool is_multigraph_ = false;
   /*! \brief number of edges */
   uint64_t num_edges_ = 0;
+  /*! \brief number of bits each id is stored in */
+  int id_bits_ = 64;
+  /*!
+   * \brief vertices whose edge lookup index misses edges added one by one;
+   *        the index is brought up to date by the next lookup
+   */
+  mutable std::vector<dgl_id_t> stale_index_;
+
+  /*! \brief A mutex that is not copied along with the graph. */
+  struct IndexMutex {
+    IndexMutex() {}
+    IndexMutex(const IndexMutex&) {}
+    IndexMutex& operator=(const IndexMutex&) { return *this; }
+    std::mutex mutex;
+  };
+  /*! \brief serializes the lazy updates of the edge lookup index */
+  mutable IndexMutex index_mutex_;
+
+ private:
+  /*!
+   * \brief Switch a 32-bit graph to 64 bits if it would have more than
+   *        IdVector::kMaxNarrowId vertices or edges.
+   */
+  void ReserveIds(uint64_t num_vertices, uint64_t num_edges);
+
+  /*! \brief Add one edge without updating the edge lookup index. */
+  void AddEdgeInternal(dgl_id_t src, dgl_id_t dst);
+
+  /*!
+   * \brief Bring the edge lookup index of the vertex up to date with its
+   *        out-edges. The index is created once the out-degree is large
+   *        enough for binary search to beat a linear scan.
+   */
+  void SyncEdgeIndex(dgl_id_t vid);
+
+  /*! \brief Bring the edge lookup index of all the vertices up to date. */
+  void SyncAllEdgeIndex();
+
+  /*!
+   * \brief Remember to bring the edge lookup index of the vertex up to date
+   *        at the next lookup, so that adding edges one by one to a vertex
+   *        does not merge its index each time.
+   */
+  void MarkEdgeIndexStale(dgl_id_t vid);
+
+  /*!
+   * \brief Bring the edge lookup index of the vertices marked stale up to
+   *        date. Called by the lookups before they read the index.
+   */
+  void SyncStaleEdgeIndex() const;
+
+  /*! \brief HasEdgeBetween without bringing the edge lookup index up to date. */
+  bool HasEdgeBetweenImpl(dgl_id_t src, dgl_id_t dst) const;
+
+  /*!
+   * \brief Call fn(eid) for every edge between the two vertices, in the
+   *        order of edge ids.
+   */
+  template <typename Fn>
+  void VisitEdgesBetween(dgl_id_t src, dgl_id_t dst, Fn fn) const;
 };
 
 /*! \brief Subgraph data structure */
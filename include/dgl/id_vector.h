@@ -0,0 +1,214 @@
+/*!
+ *  Copyright (c) 2018 by Contributors
+ * \file dgl/id_vector.h
+ * \brief Compact vector of vertex/edge ids.
+ */
+#ifndef DGL_ID_VECTOR_H_
+#define DGL_ID_VECTOR_H_
+
+#include <dmlc/logging.h>
+#include <algorithm>
+#include <cstdint>
+#include <cstring>
+#include <iterator>
+#include <vector>
+
+namespace dgl {
+
+typedef uint64_t dgl_id_t;
+
+/*!
+ * \brief A vector of ids stored in either 32 or 64 bits per id.
+ *
+ * Narrow (32-bit) vectors halve the memory of the graph structure. They can
+ * only hold ids below kMaxNarrowId; Widen() converts a vector to 64-bit
+ * storage in place. Elements are read by value; use Set() to write.
+ */
+class IdVector {
+ public:
+  /*! \brief Largest id that a narrow vector (and an int32 array) can hold. */
+  static constexpr dgl_id_t kMaxNarrowId = 0x7fffffff;
+
+  /*! \brief Random access iterator over the ids (read only). */
+  class const_iterator {
+   public:
+    typedef std::random_access_iterator_tag iterator_category;
+    typedef dgl_id_t value_type;
+    typedef int64_t difference_type;
+    typedef const dgl_id_t* pointer;
+    typedef dgl_id_t reference;
+
+    const_iterator() = default;
+    const_iterator(const IdVector* vec, int64_t pos) : vec_(vec), pos_(pos) {}
+
+    dgl_id_t operator*() const { return (*vec_)[pos_]; }
+    dgl_id_t operator[](int64_t n) const { return (*vec_)[pos_ + n]; }
+    const_iterator& operator++() { ++pos_; return *this; }
+    const_iterator& operator--() { --pos_; return *this; }
+    const_iterator operator++(int) { const_iterator it = *this; ++pos_; return it; }
+    const_iterator operator--(int) { const_iterator it = *this; --pos_; return it; }
+    const_iterator& operator+=(int64_t n) { pos_ += n; return *this; }
+    const_iterator& operator-=(int64_t n) { pos_ -= n; return *this; }
+    const_iterator operator+(int64_t n) const { return const_iterator(vec_, pos_ + n); }
+    const_iterator operator-(int64_t n) const { return const_iterator(vec_, pos_ - n); }
+    int64_t operator-(const const_iterator& other) const { return pos_ - other.pos_; }
+    bool operator==(const const_iterator& other) const { return pos_ == other.pos_; }
+    bool operator!=(const const_iterator& other) const { return pos_ != other.pos_; }
+    bool operator<(const const_iterator& other) const { return pos_ < other.pos_; }
+    bool operator>(const const_iterator& other) const { return pos_ > other.pos_; }
+    bool operator<=(const const_iterator& other) const { return pos_ <= other.pos_; }
+    bool operator>=(const const_iterator& other) const { return pos_ >= other.pos_; }
+
+   private:
+    const IdVector* vec_ = nullptr;
+    int64_t pos_ = 0;
+  };
+
+  /*!
+   * \brief Create an empty vector.
+   * \param wide Whether the ids are stored in 64 bits.
+   */
+  explicit IdVector(bool wide = true) : wide_(wide) {}
+
+  /*! \return whether the ids are stored in 64 bits */
+  bool wide() const {
+    return wide_;
+  }
+
+  /*! \return the number of ids */
+  size_t size() const {
+    return wide_ ? data_.size() / 2 : data_.size();
+  }
+
+  /*! \return whether the vector is empty */
+  bool empty() const {
+    return data_.empty();
+  }
+
+  /*! \return the i-th id */
+  dgl_id_t operator[](size_t i) const {
+    if (wide_) {
+      uint64_t v;
+      std::memcpy(&v, &data_[2 * i], sizeof(v));
+      return v;
+    }
+    return data_[i];
+  }
+
+  /*! \brief Set the i-th id. */
+  void Set(size_t i, dgl_id_t v) {
+    if (wide_) {
+      std::memcpy(&data_[2 * i], &v, sizeof(v));
+    } else {
+      CHECK_LE(v, kMaxNarrowId) << "Id " << v << " does not fit in 32 bits.";
+      data_[i] = static_cast<uint32_t>(v);
+    }
+  }
+
+  /*! \brief Append an id. */
+  void push_back(dgl_id_t v) {
+    if (wide_) {
+      data_.resize(data_.size() + 2);
+      std::memcpy(&data_[data_.size() - 2], &v, sizeof(v));
+    } else {
+      CHECK_LE(v, kMaxNarrowId) << "Id " << v << " does not fit in 32 bits.";
+      data_.push_back(static_cast<uint32_t>(v));
+    }
+  }
+
+  /*! \brief Reserve space for n ids. */
+  void reserve(size_t n) {
+    data_.reserve(wide_ ? 2 * n : n);
+  }
+
+  /*! \brief Resize to n ids; new ids are zero. */
+  void resize(size_t n) {
+    data_.resize(wide_ ? 2 * n : n);
+  }
+
+  /*! \brief Remove all the ids. */
+  void clear() {
+    data_.clear();
+  }
+
+  /*! \brief Replace the content with the given ids. */
+  template <typename Iter>
+  void assign(Iter first, Iter last) {
+    clear();
+    reserve(std::distance(first, last));
+    for (; first != last; ++first) {
+      push_back(*first);
+    }
+  }
+
+  /*!
+   * \brief Stable sort the ids from position start, then merge them in place
+   *        with the ids before start, which must already be sorted.
+   * \param start The first position of the ids to sort.
+   * \param cmp The comparison of two ids.
+   */
+  template <typename Cmp>
+  void MergeTail(size_t start, Cmp cmp) {
+    if (wide_) {
+      WideId* first = reinterpret_cast<WideId*>(data_.data());
+      auto wide_cmp = [&cmp] (const WideId& a, const WideId& b) {
+        return cmp(a.Get(), b.Get());
+      };
+      std::stable_sort(first + start, first + size(), wide_cmp);
+      std::inplace_merge(first, first + start, first + size(), wide_cmp);
+    } else {
+      uint32_t* first = data_.data();
+      std::stable_sort(first + start, first + size(), cmp);
+      std::inplace_merge(first, first + start, first + size(), cmp);
+    }
+  }
+
+  /*! \brief Switch to 64-bit storage, keeping the ids. */
+  void Widen() {
+    if (wide_) return;
+    std::vector<uint32_t> data(2 * data_.size());
+    for (size_t i = 0; i < data_.size(); ++i) {
+      const uint64_t v = data_[i];
+      std::memcpy(&data[2 * i], &v, sizeof(v));
+    }
+    data_.swap(data);
+    wide_ = true;
+  }
+
+  /*! \brief Copy the ids to the given buffer. */
+  void CopyTo(int64_t* out) const {
+    if (wide_) {
+      std::memcpy(out, data_.data(), data_.size() * sizeof(uint32_t));
+    } else {
+      std::copy(data_.begin(), data_.end(), out);
+    }
+  }
+
+  const_iterator begin() const {
+    return const_iterator(this, 0);
+  }
+
+  const_iterator end() const {
+    return const_iterator(this, size());
+  }
+
+ private:
+  /*! \brief A 64-bit id in the storage of a wide vector. */
+  struct WideId {
+    uint32_t half[2];
+    dgl_id_t Get() const {
+      uint64_t v;
+      std::memcpy(&v, half, sizeof(v));
+      return v;
+    }
+  };
+
+  /*! \brief the ids; two consecutive elements per id if wide */
+  std::vector<uint32_t> data_;
+  /*! \brief whether the ids are stored in 64 bits */
+  bool wide_;
+};
+
+}  // namespace dgl
+
+#endif  // DGL_ID_VECTOR_H_
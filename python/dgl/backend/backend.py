@@ -134,6 +134,30 @@ def sparse_matrix_indices(spmat):
     """
     pass
 
+def sparse_matrix_transpose(spmat):
+    """Return the transpose of the given sparse matrix.
+
+    The nonzeros of the transpose are sorted by row and then by column, so
+    that it can be multiplied without any further format conversion. The
+    result is meant to be computed once and cached with the matrix.
+
+    Parameters
+    ----------
+    spmat : SparseMatrix
+        The framework-specific sparse matrix.
+
+    Returns
+    -------
+    SparseMatrix
+        The transposed matrix.
+    Tensor
+        The nonzero permutation, of shape (nnz,) and type int64. The i-th
+        nonzero of the transposed matrix is the perm[i]-th nonzero of
+        ``spmat``, so the transpose of a matrix of the same indices but other
+        values ``data`` has the values ``data[perm]``.
+    """
+    pass
+
 def is_tensor(obj):
     """Returns true if the given object is a framework-specific tensor."""
     pass
@@ -249,6 +273,54 @@ def copy_to(input, ctx):
     """
     pass
 
+def pin_memory(input):
+    """Return a copy of the CPU tensor in page-locked (pinned) memory.
+
+    Pinned host memory can be copied to the GPU faster and asynchronously, so
+    it is used as the staging buffer of host-to-device copies.
+
+    Parameters
+    ----------
+    input : Tensor
+        The input tensor on CPU.
+
+    Returns
+    -------
+    Tensor
+        The tensor in pinned memory.
+    """
+    pass
+
+def copy_to_async(input, ctx):
+    """Start copying a CPU tensor in pinned memory to the given context.
+
+    The copy may still be running when the function returns, so the input
+    must not be modified before ``synchronize`` is called on the context.
+
+    Parameters
+    ----------
+    input : Tensor
+        The input tensor in pinned memory.
+    ctx :
+        A framework-specific context object.
+
+    Returns
+    -------
+    Tensor
+        The tensor on the given context.
+    """
+    pass
+
+def synchronize(ctx):
+    """Wait until the work queued on the given context has finished.
+
+    Parameters
+    ----------
+    ctx :
+        A framework-specific context object.
+    """
+    pass
+
 ###############################################################################
 # Tensor functions on feature data
 # --------------------------------
@@ -306,6 +378,40 @@ def max(input, dim):
     """
     pass
 
+def min(input, dim):
+    """Reduce min the input tensor along the given dim.
+
+    Parameters
+    ----------
+    input : Tensor
+        The input tensor.
+    dim : int
+        The reduce dim.
+
+    Returns
+    -------
+    Tensor
+        A framework-specific tensor.
+    """
+    pass
+
+def prod(input, dim):
+    """Reduce product the input tensor along the given dim.
+
+    Parameters
+    ----------
+    input : Tensor
+        The input tensor.
+    dim : int
+        The reduce dim.
+
+    Returns
+    -------
+    Tensor
+        A framework-specific tensor.
+    """
+    pass
+
 def cat(seq, dim):
     """Concat the sequence of tensors in the given dimension.
 
@@ -377,6 +483,27 @@ def gather_row(data, row_index):
     """
     pass
 
+def gather_row_sparse_grad(data, row_index):
+    """Slice out the rows of a 2-D table, whose gradient is row-sparse.
+
+    The gradient of ``data`` only stores the gathered rows, as an embedding
+    lookup with sparse gradient does. Optimizers have to support sparse
+    gradients if ``data`` is a parameter.
+
+    Parameters
+    ----------
+    data : Tensor
+        The 2-D data tensor
+    row_index : Tensor
+        A 1-D integer tensor containing which rows to be sliced out.
+
+    Returns
+    -------
+    Tensor
+        The sliced data. The first dimension should equal to ``len(row_index)``.
+    """
+    pass
+
 def narrow_row(x, start, stop):
     """Narrow down the tensor along the first dimension.
     
@@ -526,7 +653,7 @@ def ones(shape, dtype, ctx):
     """
     pass
 
-def spmm(x, y):
+def spmm(x, y, xt=None, data=None, data_t=None):
     """Multiply a sparse matrix with a dense matrix.
 
     Parameters
@@ -535,6 +662,19 @@ def spmm(x, y):
         The sparse matrix.
     y : Tensor
         The dense matrix.
+    xt : SparseTensor, optional
+        The transpose of ``x`` with the same values (see
+        ``sparse_matrix_transpose``). If given, the gradient of ``y`` is
+        computed by multiplying ``xt`` instead of transposing ``x`` in the
+        backward pass. Frameworks that do not need it may ignore it.
+    data : Tensor, optional
+        The values of ``x`` in the order of its nonzeros, of shape (nnz,).
+        If given, they replace the values of ``x`` and their gradient is
+        computed.
+    data_t : Tensor, optional
+        The values of ``xt``, i.e. ``data[perm]`` with the permutation
+        returned by ``sparse_matrix_transpose``. Required if both ``xt`` and
+        ``data`` are given.
 
     Returns
     -------
@@ -543,6 +683,23 @@ def spmm(x, y):
     """
     pass
 
+def matmul(a, b):
+    """Multiply two dense matrices.
+
+    Parameters
+    ----------
+    a : Tensor
+        The left matrix, of shape (n, k).
+    b : Tensor
+        The right matrix, of shape (k, m).
+
+    Returns
+    -------
+    Tensor
+        The result matrix, of shape (n, m).
+    """
+    pass
+
 def unsorted_1d_segment_sum(input, seg_id, n_segs, dim):
     """Computes the sum along segments of a tensor.
 
@@ -603,6 +760,93 @@ def unsorted_1d_segment_mean(input, seg_id, n_segs, dim):
 # DGL should contain all the operations on index, so this set of operators
 # should be gradually removed.
 
+def unsorted_1d_segment_max(input, seg_id, n_segs, dim):
+    """Computes the maximum along segments of a tensor.
+
+    Equivalent to tf.unsorted_segment_max, but seg_id is required to be a
+    1D tensor.
+
+    Note that segments never appeared in seg_id will have results of 0.
+
+    The gradient only flows to the first input element that attains the
+    maximum of its segment.
+
+    Parameters
+    ----------
+    input : Tensor
+        The input tensor
+    seg_id : 1D Tensor
+        The segment IDs whose values are between 0 and n_segs - 1.  Should
+        have the same length as input.
+    n_segs : int
+        Number of distinct segments
+    dim : int
+        Dimension to reduce on
+
+    Returns
+    -------
+    Tensor
+        The result
+    """
+    pass
+
+def unsorted_1d_segment_min(input, seg_id, n_segs, dim):
+    """Computes the minimum along segments of a tensor.
+
+    Equivalent to tf.unsorted_segment_min, but seg_id is required to be a
+    1D tensor.
+
+    Note that segments never appeared in seg_id will have results of 0.
+
+    The gradient only flows to the first input element that attains the
+    minimum of its segment.
+
+    Parameters
+    ----------
+    input : Tensor
+        The input tensor
+    seg_id : 1D Tensor
+        The segment IDs whose values are between 0 and n_segs - 1.  Should
+        have the same length as input.
+    n_segs : int
+        Number of distinct segments
+    dim : int
+        Dimension to reduce on
+
+    Returns
+    -------
+    Tensor
+        The result
+    """
+    pass
+
+def unsorted_1d_segment_prod(input, seg_id, n_segs, dim):
+    """Computes the product along segments of a tensor.
+
+    Equivalent to tf.unsorted_segment_prod, but seg_id is required to be a
+    1D tensor.
+
+    Note that segments never appeared in seg_id will have results of 0.
+
+    Parameters
+    ----------
+    input : Tensor
+        The input tensor
+    seg_id : 1D Tensor
+        The segment IDs whose values are between 0 and n_segs - 1.  Should
+        have the same length as input.
+    n_segs : int
+        Number of distinct segments
+    dim : int
+        Dimension to reduce on
+
+    Returns
+    -------
+    Tensor
+        The result
+    """
+    pass
+
 def unique(input):
     """Returns the unique scalar elements in a tensor.
 
@@ -51,6 +51,16 @@ def sparse_matrix(data, index, shape, force_format=False):
 def sparse_matrix_indices(spmat):
     return ('csr', spmat.indices, spmat.indptr)
 
+def sparse_matrix_transpose(spmat):
+    nrows, ncols = spmat.shape[1], spmat.shape[0]
+    ctx = spmat.context
+    indptr = spmat.indptr.asnumpy()
+    row = np.repeat(np.arange(ncols, dtype=np.int64), np.diff(indptr))
+    row = nd.array(row, dtype='int64', ctx=ctx)
+    coord = nd.stack(spmat.indices.astype('int64'), row, axis=0)
+    spmat_t, perm = sparse_matrix(spmat.data, ('coo', coord), (nrows, ncols))
+    return spmat_t, perm
+
 def is_tensor(obj):
     return isinstance(obj, nd.NDArray)
 
@@ -77,6 +87,9 @@ def asnumpy(input):
 def copy_to(input, ctx):
     return input.as_in_context(ctx)
 
+def pin_memory(input):
+    return input.as_in_context(mx.cpu_pinned())
+
 def sum(input, dim):
     return nd.sum(input, axis=dim)
 
@@ -86,6 +99,12 @@ def mean(input, dim):
 def max(input, dim):
     return nd.max(input, axis=dim)
 
+def min(input, dim):
+    return nd.min(input, axis=dim)
+
+def prod(input, dim):
+    return nd.prod(input, axis=dim)
+
 def cat(seq, dim):
     return nd.concat(*seq, dim=dim)
 
@@ -108,6 +127,10 @@ def gather_row(data, row_index):
     else:
         return data[row_index,]
 
+def gather_row_sparse_grad(data, row_index):
+    return nd.Embedding(row_index, data, input_dim=data.shape[0],
+                        output_dim=data.shape[1], sparse_grad=True)
+
 def narrow_row(data, start, stop):
     return nd.slice(data, begin=start, end=stop)
 
@@ -133,9 +156,16 @@ def zeros(shape, dtype, ctx):
 def ones(shape, dtype, ctx):
     return nd.ones(shape, dtype=dtype, ctx=ctx)
 
-def spmm(x, y):
+def spmm(x, y, xt=None, data=None, data_t=None):
+    # the backward of dot multiplies the transpose of a CSR matrix directly
+    if data is not None:
+        x = nd.sparse.csr_matrix((data, x.indices, x.indptr), x.shape,
+                                 ctx=data.context)
     return nd.dot(x, y)
 
+def matmul(a, b):
+    return nd.dot(a, b)
+
 def unsorted_1d_segment_sum(input, seg_id, n_segs, dim):
     # TODO: support other dimensions
     assert dim == 0, 'MXNet only supports segment sum on first dimension'
@@ -165,6 +195,38 @@ def unsorted_1d_segment_mean(input, seg_id, n_segs, dim):
     y /= w.reshape((-1,) + (1,) * (y.ndim - 1))
     return y
 
+def _unsorted_1d_segment_padded(input, seg_id, n_segs, fill, reducer):
+    # Gather the input into a (n_segs, max_len, ...) tensor padded with the
+    # fill value, and reduce the padded tensor.
+    seg = seg_id.asnumpy()
+    order = np.argsort(seg, kind='stable')
+    lens = np.bincount(seg, minlength=n_segs)
+    max_len = max(int(lens.max()) if len(lens) > 0 else 0, 1)
+    starts = np.cumsum(lens) - lens
+    pos = np.arange(len(seg)) - np.repeat(starts, lens)
+    gather_idx = np.full((n_segs, max_len), len(seg), dtype=np.int64)
+    gather_idx[seg[order], pos] = order
+    shape_suffix = input.shape[1:]
+    pad = nd.full((1,) + shape_suffix, fill, ctx=input.context, dtype=input.dtype)
+    padded = nd.take(nd.concat(input, pad, dim=0),
+                     nd.array(gather_idx.reshape(-1), ctx=input.context, dtype='int64'))
+    y = reducer(nd.reshape(padded, (n_segs, max_len) + shape_suffix), axis=1)
+    # empty segments are 0
+    mask = nd.array(lens > 0, ctx=input.context, dtype=input.dtype)
+    return nd.where(mask, y, nd.zeros_like(y))
+
+def unsorted_1d_segment_max(input, seg_id, n_segs, dim):
+    assert dim == 0, 'MXNet only supports segment max on first dimension'
+    return _unsorted_1d_segment_padded(input, seg_id, n_segs, -np.inf, nd.max)
+
+def unsorted_1d_segment_min(input, seg_id, n_segs, dim):
+    assert dim == 0, 'MXNet only supports segment min on first dimension'
+    return _unsorted_1d_segment_padded(input, seg_id, n_segs, np.inf, nd.min)
+
+def unsorted_1d_segment_prod(input, seg_id, n_segs, dim):
+    assert dim == 0, 'MXNet only supports segment prod on first dimension'
+    return _unsorted_1d_segment_padded(input, seg_id, n_segs, 1, nd.prod)
+
 def unique(input):
     # TODO: fallback to numpy is unfortunate
     tmp = input.asnumpy()
@@ -43,6 +43,15 @@ def sparse_matrix_indices(spmat):
     else:
         raise TypeError('Invalid format: %s.' % spmat.format)
 
+def sparse_matrix_transpose(spmat):
+    spmat = spmat.tocoo()
+    perm = np.lexsort((spmat.row, spmat.col))
+    spmat_t = sp.csr_matrix((spmat.data[perm], spmat.row[perm],
+                             np.concatenate([[0], np.cumsum(np.bincount(
+                                 spmat.col, minlength=spmat.shape[1]))])),
+                            shape=(spmat.shape[1], spmat.shape[0]))
+    return spmat_t, perm
+
 def is_tensor(obj):
     return isinstance(obj, np.ndarray)
 
@@ -70,6 +79,12 @@ def sum(input, dim):
 def max(input, dim):
     return np.max(input, axis=dim)
 
+def min(input, dim):
+    return np.min(input, axis=dim)
+
+def prod(input, dim):
+    return np.prod(input, axis=dim)
+
 def cat(seq, dim):
     return np.concatenate(seq, axis=dim)
 
@@ -87,6 +102,9 @@ def split(input, sizes_or_sections, dim):
 def gather_row(data, row_index):
     return data[row_index]
 
+def gather_row_sparse_grad(data, row_index):
+    return data[row_index]
+
 def scatter_row(data, row_index, value):
     # NOTE: inplace instead of out-place
     data[row_index] = value
@@ -110,9 +128,15 @@ def zeros(shape, dtype):
 def ones(shape, dtype):
     return np.ones(shape, dtype=dtype)
 
-def spmm(x, y):
+def spmm(x, y, xt=None, data=None, data_t=None):
+    if data is not None:
+        x = x.copy()
+        x.data = data
     return x.dot(y)
 
+def matmul(a, b):
+    return np.matmul(a, b)
+
 def unique(input):
     return np.unique(input)
 
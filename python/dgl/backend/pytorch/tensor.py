@@ -31,6 +31,20 @@ def sparse_matrix(data, index, shape, force_format=False):
 def sparse_matrix_indices(spmat):
     return ('coo', spmat._indices())
 
+def sparse_matrix_transpose(spmat):
+    idx = spmat._indices()
+    nrows, ncols = spmat.shape[1], spmat.shape[0]
+    row, col = idx[1], idx[0]
+    key = row * ncols + col
+    key, perm = th.sort(key)
+    idx_t = th.stack([row[perm], col[perm]], 0)
+    spmat_t = th._sparse_coo_tensor_unsafe(idx_t, spmat._values()[perm],
+                                           (nrows, ncols))
+    if len(key) < 2 or bool((key[1:] != key[:-1]).all()):
+        # sorted without duplicates, so spmm needs not coalesce it again
+        spmat_t = spmat_t._coalesced_(True)
+    return spmat_t, perm
+
 def is_tensor(obj):
     return isinstance(obj, th.Tensor)
 
@@ -61,6 +75,18 @@ def copy_to(input, ctx):
     else:
         raise RuntimeError('Invalid context', ctx)
 
+def pin_memory(input):
+    return input.pin_memory()
+
+def copy_to_async(input, ctx):
+    if ctx.type == 'cuda':
+        th.cuda.set_device(ctx.index)
+    return input.to(ctx, non_blocking=True)
+
+def synchronize(ctx):
+    if ctx.type == 'cuda':
+        th.cuda.synchronize(ctx)
+
 def sum(input, dim):
     return th.sum(input, dim=dim)
 
@@ -71,6 +97,13 @@ def max(input, dim):
     # NOTE: the second argmax array is not returned
     return th.max(input, dim=dim)[0]
 
+def min(input, dim):
+    # NOTE: the second argmin array is not returned
+    return th.min(input, dim=dim)[0]
+
+def prod(input, dim):
+    return th.prod(input, dim=dim)
+
 def cat(seq, dim):
     return th.cat(seq, dim=dim)
 
@@ -83,6 +116,9 @@ def split(input, sizes_or_sections, dim):
 def gather_row(data, row_index):
     return th.index_select(data, 0, row_index)
 
+def gather_row_sparse_grad(data, row_index):
+    return th.nn.functional.embedding(row_index, data, sparse=True)
+
 def narrow_row(x, start, stop):
     return x[start:stop]
 
@@ -107,8 +143,48 @@ def zeros(shape, dtype, ctx):
 def ones(shape, dtype, ctx):
     return th.ones(shape, dtype=dtype, device=ctx)
 
-def spmm(x, y):
-    return th.spmm(x, y)
+def _with_values(spmat, data):
+    ret = th._sparse_coo_tensor_unsafe(spmat._indices(), data, spmat.shape)
+    if spmat.is_coalesced():
+        ret = ret._coalesced_(True)
+    return ret
+
+class SparseDenseMM(th.autograd.Function):
+    """Multiply a sparse matrix with a dense matrix, using the cached
+    transpose of the sparse matrix for the gradient of the dense one.
+
+    The values of the sparse matrix are a dense input, since the gradient of
+    a sparse tensor would sum the duplicate entries of a multigraph.
+    """
+    @staticmethod
+    def forward(ctx, data, y, x, xt):
+        ctx.save_for_backward(y, x, xt)
+        if data is not None:
+            x = _with_values(x, data)
+        return th.spmm(x, y)
+
+    @staticmethod
+    def backward(ctx, grad_out):
+        y, x, xt = ctx.saved_tensors
+        grad_data = grad_y = None
+        if ctx.needs_input_grad[0]:
+            idx = x._indices()
+            grad_data = th.sum(grad_out[idx[0]] * y[idx[1]], 1)
+        if ctx.needs_input_grad[1]:
+            grad_y = th.spmm(xt, grad_out)
+        return grad_data, grad_y, None, None
+
+def spmm(x, y, xt=None, data=None, data_t=None):
+    if xt is None:
+        if data is not None:
+            x = _with_values(x, data)
+        return th.spmm(x, y)
+    if data is not None:
+        xt = _with_values(xt, data_t.detach())
+    return SparseDenseMM.apply(data, y, x, xt)
+
+def matmul(a, b):
+    return th.matmul(a, b)
 
 def unsorted_1d_segment_sum(input, seg_id, n_segs, dim):
     y = th.zeros(n_segs, *input.shape[1:]).to(input)
@@ -123,6 +199,54 @@ def unsorted_1d_segment_mean(input, seg_id, n_segs, dim):
     y /= w.view((-1,) + (1,) * (y.dim() - 1))
     return y
 
+class SegmentArgReduce(th.autograd.Function):
+    """Segment max or min, which keeps the position of the result of each
+    segment for the backward pass."""
+    @staticmethod
+    def forward(ctx, input, seg_id, n_segs, reduce):
+        n_inputs = input.shape[0]
+        shape = (n_segs,) + input.shape[1:]
+        idx = seg_id.view((-1,) + (1,) * (input.dim() - 1)).expand_as(input)
+        y = input.new_zeros(shape).scatter_reduce_(
+            0, idx, input, reduce, include_self=False)
+        # the first input attaining the result, or n_inputs for empty segments
+        pos = th.arange(n_inputs, device=input.device)
+        pos = pos.view(idx.shape[:1] + (1,) * (input.dim() - 1)).expand_as(input)
+        pos = th.where(input == y.gather(0, idx), pos, th.full_like(pos, n_inputs))
+        arg = th.full(shape, n_inputs, dtype=th.int64, device=input.device)
+        arg = arg.scatter_reduce_(0, idx, pos, 'amin')
+        ctx.save_for_backward(arg)
+        ctx.input_shape = input.shape
+        return y
+
+    @staticmethod
+    def backward(ctx, grad_out):
+        arg, = ctx.saved_tensors
+        n_inputs = ctx.input_shape[0]
+        grad = grad_out.new_zeros((n_inputs + 1,) + ctx.input_shape[1:])
+        grad = grad.scatter_add_(0, arg, grad_out)
+        return grad[:n_inputs], None, None, None
+
+def unsorted_1d_segment_max(input, seg_id, n_segs, dim):
+    assert dim == 0, 'Only support segment max on first dimension'
+    return SegmentArgReduce.apply(input, seg_id, n_segs, 'amax')
+
+def unsorted_1d_segment_min(input, seg_id, n_segs, dim):
+    assert dim == 0, 'Only support segment min on first dimension'
+    return SegmentArgReduce.apply(input, seg_id, n_segs, 'amin')
+
+def unsorted_1d_segment_prod(input, seg_id, n_segs, dim):
+    assert dim == 0, 'Only support segment prod on first dimension'
+    idx = seg_id.view((-1,) + (1,) * (input.dim() - 1)).expand_as(input)
+    y = input.new_zeros((n_segs,) + input.shape[1:])
+    return y.scatter_reduce(0, idx, input, 'prod', include_self=False)
+
+if not hasattr(th.Tensor, 'scatter_reduce_'):
+    # scatter_reduce_ is available from PyTorch 1.12; without these APIs the
+    # max, min and prod reducers fall back to degree bucketing
+    del SegmentArgReduce
+    del unsorted_1d_segment_max, unsorted_1d_segment_min, unsorted_1d_segment_prod
+
 def unique(input):
     return th.unique(input)
 
@@ -149,7 +273,7 @@ def zerocopy_from_dlpack(dlpack_tensor):
     return dlpack.from_dlpack(dlpack_tensor)
 
 def zerocopy_to_numpy(input):
-    # NOTE: not zerocopy
+    # NOTE: only zerocopy for CPU tensors
     return asnumpy(input)
 
 def zerocopy_from_numpy(np_array):
@@ -377,7 +377,7 @@ def _sum_on(graph, on, input, weight):
 
         seg_id = F.zerocopy_from_numpy(
                 np.arange(n_graphs, dtype='int64').repeat(batch_num_objs))
-        seg_id = F.copy_to(seg_id, F.context(input))
+        seg_id = utils.copy_to(seg_id, F.context(input), 'readout')
         y = F.unsorted_1d_segment_sum(input, seg_id, n_graphs, 0)
         return y
     else:
@@ -541,7 +541,7 @@ def _mean_on(graph, on, input, weight):
 
         seg_id = F.zerocopy_from_numpy(
                 np.arange(n_graphs, dtype='int64').repeat(batch_num_objs))
-        seg_id = F.copy_to(seg_id, F.context(input))
+        seg_id = utils.copy_to(seg_id, F.context(input), 'readout')
         if weight is not None:
             w = F.unsorted_1d_segment_sum(weight, seg_id, n_graphs, 0)
             y = F.unsorted_1d_segment_sum(input, seg_id, n_graphs, 0)
@@ -8,10 +8,9 @@ from __future__ import print_function
 from __future__ import absolute_import
 import numpy as np
 import scipy.sparse as sp
-import os, gzip
-import rdflib as rdf
+import os, gzip, re
+import array
 import pandas as pd
-from collections import Counter
 
 from dgl.data.utils import download, extract_archive, get_download_dir, _get_dgl_url
 
@@ -177,19 +176,32 @@ class RGCNLinkDataset(object):
         extract_archive(tgz_path, self.dir)
 
     def load(self):
-        entity_path = os.path.join(self.dir, 'entities.dict')
-        relation_path = os.path.join(self.dir, 'relations.dict')
-        train_path = os.path.join(self.dir, 'train.txt')
-        valid_path = os.path.join(self.dir, 'valid.txt')
-        test_path = os.path.join(self.dir, 'test.txt')
-        entity_dict = _read_dictionary(entity_path)
-        relation_dict = _read_dictionary(relation_path)
-        self.train = np.array(_read_triplets_as_list(train_path, entity_dict, relation_dict))
-        self.valid = np.array(_read_triplets_as_list(valid_path, entity_dict, relation_dict))
-        self.test = np.array(_read_triplets_as_list(test_path, entity_dict, relation_dict))
-        self.num_nodes = len(entity_dict)
+        cache_path = os.path.join(self.dir, 'triplets.npz')
+        if os.path.isfile(cache_path):
+            cache = np.load(cache_path)
+            self.train = cache['train']
+            self.valid = cache['valid']
+            self.test = cache['test']
+            self.num_nodes = cache['num_nodes'].item()
+            self.num_rels = cache['num_rels'].item()
+        else:
+            entity_path = os.path.join(self.dir, 'entities.dict')
+            relation_path = os.path.join(self.dir, 'relations.dict')
+            train_path = os.path.join(self.dir, 'train.txt')
+            valid_path = os.path.join(self.dir, 'valid.txt')
+            test_path = os.path.join(self.dir, 'test.txt')
+            entity_dict = _read_dictionary(entity_path)
+            relation_dict = _read_dictionary(relation_path)
+            self.num_nodes = len(entity_dict)
+            self.num_rels = len(relation_dict)
+            dtype = _smallest_id_dtype(max(self.num_nodes, self.num_rels))
+            self.train = _read_triplets_as_array(train_path, entity_dict, relation_dict, dtype)
+            self.valid = _read_triplets_as_array(valid_path, entity_dict, relation_dict, dtype)
+            self.test = _read_triplets_as_array(test_path, entity_dict, relation_dict, dtype)
+            np.savez(cache_path, train=self.train, valid=self.valid,
+                     test=self.test, num_nodes=np.array(self.num_nodes),
+                     num_rels=np.array(self.num_rels))
         print("# entities: {}".format(self.num_nodes))
-        self.num_rels = len(relation_dict)
         print("# relations: {}".format(self.num_rels))
         print("# edges: {}".format(len(self.train)))
 
@@ -243,59 +255,115 @@ def _bfs_relational(adj, roots):
         current_lvl = set.union(next_lvl)
 
 
-class RDFReader(object):
-    __graph = None
-    __freq = {}
-
-    def __init__(self, file):
-
-        self.__graph = rdf.Graph()
-
-        if file.endswith('nt.gz'):
-            with gzip.open(file, 'rb') as f:
-                self.__graph.parse(file=f, format='nt')
-        else:
-            self.__graph.parse(file, format=rdf.util.guess_format(file))
+# N-Triples terms: IRI, blank node or literal (with optional language tag or
+# datatype IRI). See https://www.w3.org/TR/n-triples/
+_NT_TERM = r'(<[^>]*>|_:\S+|"(?:[^"\\]|\\.)*"(?:@[A-Za-z0-9-]+|\^\^<[^>]*>)?)'
+_NT_LINE = re.compile(r'^\s*' + _NT_TERM + r'\s+' + _NT_TERM + r'\s+' +
+                      _NT_TERM + r'\s*\.\s*$')
+_NT_ESCAPE = re.compile(r'\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|[tbnrf"\'\\])')
+_NT_ESCAPE_CHARS = {'t': '\t', 'b': '\b', 'n': '\n', 'r': '\r', 'f': '\f',
+                    '"': '"', "'": "'", '\\': '\\'}
 
-        # See http://rdflib.readthedocs.io for the rdflib documentation
+def _nt_unescape_match(match):
+    esc = match.group(1)
+    if esc[0] in 'uU':
+        return chr(int(esc[1:], 16))
+    return _NT_ESCAPE_CHARS[esc]
 
-        self.__freq = Counter(self.__graph.predicates())
+def _nt_term_value(term):
+    """Return the lexical value of an N-Triples term.
 
-        print("Graph loaded, frequencies counted.")
+    This is the string the label files refer to, i.e. the IRI without angle
+    brackets, the blank node label, or the unescaped literal text.
+    """
+    if term[0] == '<':
+        value = term[1:-1]
+    elif term[0] == '_':
+        value = term[2:]
+    else:
+        value = term[1:term.rindex('"')]
+    if '\\' in value:
+        value = _NT_ESCAPE.sub(_nt_unescape_match, value)
+    return value
 
-    def triples(self, relation=None):
-        for s, p, o in self.__graph.triples((None, relation, None)):
-            yield s, p, o
+class NTriplesReader(object):
+    """Streaming N-Triples reader that interns terms into integer ids.
 
-    def __enter__(self):
-        return self
+    The file is read line by line so the whole knowledge base is never held
+    as Python objects. Nodes (subjects and objects) and relations
+    (predicates) are interned into consecutive integer ids in the order they
+    are first seen, and the triples are stored as compact integer arrays.
+    Duplicated triples are removed.
 
-    def __exit__(self, exc_type, exc_value, traceback):
-        self.__graph.destroy("store")
-        self.__graph.close(True)
+    Parameters
+    ----------
+    file : str
+        Path to the N-Triples file. Files ending with ``.gz`` are read
+        through gzip.
 
-    def subjectSet(self):
-        return set(self.__graph.subjects())
+    Attributes
+    ----------
+    nodes_dict : dict
+        Map from node term to node id.
+    relations_dict : dict
+        Map from relation term to relation id. Relation ids are ordered
+        descending by frequency.
+    src, rel, dst : numpy.ndarray
+        Node and relation ids of all triples.
+    """
+    def __init__(self, file):
+        opener = gzip.open if file.endswith('.gz') else open
+        nodes_dict = {}
+        relations_dict = {}
+        src = array.array('q')
+        rel = array.array('q')
+        dst = array.array('q')
+        with opener(file, 'rb') as f:
+            for lineno, line in enumerate(f):
+                line = line.decode('utf-8').strip()
+                if not line or line[0] == '#':
+                    continue
+                match = _NT_LINE.match(line)
+                if match is None:
+                    raise ValueError('Cannot parse line %d of %s: %s'
+                                     % (lineno + 1, file, line))
+                s, p, o = match.groups()
+                src.append(nodes_dict.setdefault(s, len(nodes_dict)))
+                rel.append(relations_dict.setdefault(p, len(relations_dict)))
+                dst.append(nodes_dict.setdefault(o, len(nodes_dict)))
+
+        triples = np.stack([np.frombuffer(src, dtype=np.int64),
+                            np.frombuffer(rel, dtype=np.int64),
+                            np.frombuffer(dst, dtype=np.int64)], axis=1)
+        triples = np.unique(triples, axis=0)
+        src, rel, dst = triples.transpose()
+
+        # relabel relations descending by frequency
+        freq = np.bincount(rel, minlength=len(relations_dict))
+        order = np.argsort(-freq, kind='stable')
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        self.relations_dict = {p: int(rank[i]) for p, i in relations_dict.items()}
+        self.nodes_dict = nodes_dict
+        self.src = src
+        self.rel = rank[rel]
+        self.dst = dst
+        print("Graph loaded, frequencies counted.")
 
-    def objectSet(self):
-        return set(self.__graph.objects())
+    def __len__(self):
+        return len(self.src)
 
-    def relationList(self):
-        """
-        Returns a list of relations, ordered descending by frequenecy
-        :return:
-        """
-        res = list(set(self.__graph.predicates()))
-        res.sort(key=lambda rel: - self.freq(rel))
-        return res
+    @property
+    def num_nodes(self):
+        return len(self.nodes_dict)
 
-    def __len__(self):
-        return len(self.__graph)
+    @property
+    def num_relations(self):
+        return len(self.relations_dict)
 
-    def freq(self, rel):
-        if rel not in self.__freq:
-            return 0
-        return self.__freq[rel]
+    def node_values(self):
+        """Return a dict from the lexical value of each node to its id."""
+        return {_nt_term_value(term): i for term, i in self.nodes_dict.items()}
 
 
 def _load_sparse_csr(filename):
@@ -309,6 +377,59 @@ def _save_sparse_csr(filename, array):
              indptr=array.indptr, shape=array.shape)
 
 
+def _smallest_id_dtype(bound):
+    """Return the smallest integer dtype that can hold ids in [0, bound)."""
+    if bound < np.iinfo(np.int32).max:
+        return np.int32
+    return np.int64
+
+
+def _build_edge_list(reader):
+    """Build the relational edge list from the parsed triples.
+
+    Every node gets a self loop of relation 0, and every triple (s, p, o) is
+    added as edge (s, o) of type 2 * p and edge (o, s) of type 2 * p + 1.
+    The edges are sorted by (dst, src, type).
+
+    Returns
+    -------
+    numpy.ndarray
+        Edge list of shape (E, 3) with rows (src, dst, type).
+    """
+    num_node = reader.num_nodes
+    dtype = _smallest_id_dtype(max(num_node, 2 * reader.num_relations + 1))
+    loop = np.arange(num_node, dtype=dtype)
+    src = np.concatenate([loop, reader.src, reader.dst]).astype(dtype)
+    dst = np.concatenate([loop, reader.dst, reader.src]).astype(dtype)
+    etype = np.concatenate([np.zeros(num_node, dtype=dtype),
+                            2 * reader.rel, 2 * reader.rel + 1]).astype(dtype)
+    # sort indices by destination
+    order = np.lexsort((etype, src, dst))
+    return np.stack([src[order], dst[order], etype[order]], axis=1)
+
+
+def _save_edge_cache(filename, edge_list, num_node, num_rel):
+    """Save the edge list as separate compact integer columns."""
+    np.savez(filename, src=edge_list[:, 0], dst=edge_list[:, 1],
+             etype=edge_list[:, 2], n=np.array(num_node),
+             nrel=np.array(num_rel))
+
+
+def _load_edge_cache(filename):
+    """Load the edge list cache saved by :func:`_save_edge_cache`.
+
+    Caches written by older versions store the edge list as a single
+    ``edges`` array and are still readable.
+    """
+    cache = np.load(filename)
+    if 'edges' in cache:
+        edge_list = cache['edges']
+    else:
+        edge_list = np.stack([cache['src'], cache['dst'], cache['etype']],
+                             axis=1)
+    return edge_list, cache['n'].item(), cache['nrel'].item()
+
+
 def _load_data(dataset_str='aifb', dataset_path=None):
     """
 
@@ -345,19 +466,12 @@ def _load_data(dataset_str='aifb', dataset_path=None):
     labels_file = os.path.join(dataset_path, 'labels.npz')
     train_idx_file = os.path.join(dataset_path, 'train_idx.npy')
     test_idx_file = os.path.join(dataset_path, 'test_idx.npy')
-    # train_names_file = os.path.join(dataset_path, 'train_names.npy')
-    # test_names_file = os.path.join(dataset_path, 'test_names.npy')
-    # rel_dict_file = os.path.join(dataset_path, 'rel_dict.pkl')
-    # nodes_file = os.path.join(dataset_path, 'nodes.pkl')
 
     if os.path.isfile(edge_file) and os.path.isfile(labels_file) and \
             os.path.isfile(train_idx_file) and os.path.isfile(test_idx_file):
 
         # load precomputed adjacency matrix and labels
-        all_edges = np.load(edge_file)
-        num_node = all_edges['n'].item()
-        edge_list = all_edges['edges']
-        num_rel = all_edges['nrel'].item()
+        edge_list, num_node, num_rel = _load_edge_cache(edge_file)
 
         print('Number of nodes: ', num_node)
         print('Number of edges: ', len(edge_list))
@@ -371,10 +485,6 @@ def _load_data(dataset_str='aifb', dataset_path=None):
         train_idx = np.load(train_idx_file)
         test_idx = np.load(test_idx_file)
 
-        # train_names = np.load(train_names_file)
-        # test_names = np.load(test_names_file)
-        # relations_dict = pkl.load(open(rel_dict_file, 'rb'))
-
     else:
 
         # loading labels of nodes
@@ -382,46 +492,20 @@ def _load_data(dataset_str='aifb', dataset_path=None):
         labels_train_df = pd.read_csv(train_file, sep='\t', encoding='utf8')
         labels_test_df = pd.read_csv(test_file, sep='\t', encoding='utf8')
 
-        with RDFReader(graph_file) as reader:
-
-            relations = reader.relationList()
-            subjects = reader.subjectSet()
-            objects = reader.objectSet()
-
-            nodes = list(subjects.union(objects))
-            num_node = len(nodes)
-            num_rel = len(relations)
-            num_rel = 2 * num_rel + 1 # +1 is for self-relation
-
-            assert num_node < np.iinfo(np.int32).max
-            print('Number of nodes: ', num_node)
-            print('Number of relations: ', num_rel)
+        reader = NTriplesReader(graph_file)
+        num_node = reader.num_nodes
+        num_rel = 2 * reader.num_relations + 1 # +1 is for self-relation
 
-            relations_dict = {rel: i for i, rel in enumerate(list(relations))}
-            nodes_dict = {node: i for i, node in enumerate(nodes)}
-
-            edge_list = []
-            # self relation
-            for i in range(num_node):
-                edge_list.append((i, i, 0))
-
-            for i, (s, p, o) in enumerate(reader.triples()):
-                src = nodes_dict[s]
-                dst = nodes_dict[o]
-                assert src < num_node and dst < num_node
-                rel = relations_dict[p]
-                edge_list.append((src, dst, 2 * rel))
-                edge_list.append((dst, src, 2 * rel + 1))
+        print('Number of nodes: ', num_node)
+        print('Number of relations: ', num_rel)
 
-            # sort indices by destination
-            edge_list = sorted(edge_list, key=lambda x: (x[1], x[0], x[2]))
-            edge_list = np.array(edge_list, dtype=np.int)
-            print('Number of edges: ', len(edge_list))
+        edge_list = _build_edge_list(reader)
+        print('Number of edges: ', len(edge_list))
 
-            np.savez(edge_file, edges=edge_list, n=np.array(num_node), nrel=np.array(num_rel))
+        _save_edge_cache(edge_file, edge_list, num_node, num_rel)
 
-        nodes_u_dict = {np.unicode(to_unicode(key)): val for key, val in
-                        nodes_dict.items()}
+        nodes_u_dict = reader.node_values()
+        del reader
 
         labels_set = set(labels_df[label_header].values.tolist())
         labels_dict = {lab: i for i, lab in enumerate(list(labels_set))}
@@ -434,16 +518,14 @@ def _load_data(dataset_str='aifb', dataset_path=None):
         print('Loading training set')
 
         train_idx = []
-        train_names = []
         for nod, lab in zip(labels_train_df[nodes_header].values,
                             labels_train_df[label_header].values):
-            nod = np.unicode(to_unicode(nod))  # type: unicode
+            nod = to_unicode(nod)
             if nod in nodes_u_dict:
                 labeled_nodes_idx.append(nodes_u_dict[nod])
                 label_idx = labels_dict[lab]
                 labels[labeled_nodes_idx[-1], label_idx] = 1
                 train_idx.append(nodes_u_dict[nod])
-                train_names.append(nod)
             else:
                 print(u'Node not in dictionary, skipped: ',
                       nod.encode('utf-8', errors='replace'))
@@ -451,16 +533,14 @@ def _load_data(dataset_str='aifb', dataset_path=None):
         print('Loading test set')
 
         test_idx = []
-        test_names = []
         for nod, lab in zip(labels_test_df[nodes_header].values,
                             labels_test_df[label_header].values):
-            nod = np.unicode(to_unicode(nod))
+            nod = to_unicode(nod)
             if nod in nodes_u_dict:
                 labeled_nodes_idx.append(nodes_u_dict[nod])
                 label_idx = labels_dict[lab]
                 labels[labeled_nodes_idx[-1], label_idx] = 1
                 test_idx.append(nodes_u_dict[nod])
-                test_names.append(nod)
             else:
                 print(u'Node not in dictionary, skipped: ',
                       nod.encode('utf-8', errors='replace'))
@@ -474,11 +554,6 @@ def _load_data(dataset_str='aifb', dataset_path=None):
         np.save(train_idx_file, train_idx)
         np.save(test_idx_file, test_idx)
 
-        # np.save(train_names_file, train_names)
-        # np.save(test_names_file, test_names)
-
-        # pkl.dump(relations_dict, open(rel_dict_file, 'wb'))
-
     # end if
 
     return num_node, edge_list, num_rel, labels, labeled_nodes_idx, train_idx, test_idx
@@ -518,3 +593,13 @@ def _read_triplets_as_list(filename, entity_dict, relation_dict):
         o = entity_dict[triplet[2]]
         l.append([s, r, o])
     return l
+
+def _read_triplets_as_array(filename, entity_dict, relation_dict, dtype=np.int64):
+    """Read triplets into an integer array of shape (N, 3) without building
+    intermediate Python lists."""
+    ids = array.array('q')
+    for triplet in _read_triplets(filename):
+        ids.append(entity_dict[triplet[0]])
+        ids.append(relation_dict[triplet[1]])
+        ids.append(entity_dict[triplet[2]])
+    return np.frombuffer(ids, dtype=np.int64).reshape(-1, 3).astype(dtype)
@@ -1 +1,2 @@
 from .sampler import NeighborSampler
+from .link_sampler import EdgeNeighborhoodSampler, LinkSample
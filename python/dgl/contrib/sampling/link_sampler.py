@@ -0,0 +1,141 @@
+# This file contains samplers for link prediction.
+
+import numpy as np
+
+from ..._ffi.function import _init_api
+from ...base import DGLError
+from ... import utils
+
+__all__ = ['LinkSample', 'EdgeNeighborhoodSampler']
+
+class LinkSample(object):
+    """A subgraph sampled for link prediction, with its negative edges.
+
+    The node ids of ``src``, ``dst``, ``neg_src`` and ``neg_dst`` are
+    relabeled to ``0 ~ len(nodes) - 1``.
+
+    Attributes
+    ----------
+    nodes : Tensor
+        The parent node id of each node of the subgraph, in ascending order.
+    edges : Tensor
+        The parent edge id of each sampled edge.
+    src : Tensor
+        The source node of each sampled edge.
+    dst : Tensor
+        The destination node of each sampled edge.
+    neg_src : Tensor
+        The source node of each negative edge.
+    neg_dst : Tensor
+        The destination node of each negative edge. Negative edge ``i`` has
+        either the source or the destination of sampled edge
+        ``i % len(edges)`` replaced.
+    """
+    def __init__(self, nodes, edges, src, dst, neg_src, neg_dst):
+        self.nodes = nodes
+        self.edges = edges
+        self.src = src
+        self.dst = dst
+        self.neg_src = neg_src
+        self.neg_dst = neg_dst
+
+class ENSubgraphLoader(object):
+    def __init__(self, g, sample_size, negative_rate, negative_mode,
+                 num_samples, num_workers, seed):
+        self._incidence = None
+        if sample_size > g.number_of_edges():
+            raise DGLError('Cannot sample %d edges out of %d.'
+                           % (sample_size, g.number_of_edges()))
+        if negative_mode not in ('uniform', 'degree'):
+            raise DGLError('Unknown negative sampling mode "%s".' % negative_mode)
+        self._sample_size = sample_size
+        self._negative_rate = negative_rate
+        self._degree_corrupt = negative_mode == 'degree'
+        self._num_samples = num_samples
+        self._num_workers = num_workers
+        if seed is None:
+            seed = np.random.randint(0, 2 ** 62)
+        self._seed = seed
+        self._num_drawn = 0
+        self._samples = []
+        # the undirected incidence of the graph, shared by all the samples
+        self._incidence = _CAPI_DGLEdgeNeighborhoodIncidenceCreate(g._graph._handle)
+
+    def __del__(self):
+        if self._incidence is not None:
+            _CAPI_DGLEdgeNeighborhoodIncidenceFree(self._incidence)
+
+    def _prefetch(self):
+        # the seed of a sample is derived from its index, so the samples do
+        # not depend on the number of workers
+        ret = _CAPI_DGLEdgeNeighborhoodSample(
+            self._incidence, int(self._sample_size), self._num_workers,
+            int(self._negative_rate), self._degree_corrupt, self._seed,
+            self._num_drawn)
+        self._num_drawn += self._num_workers
+        for i in range(self._num_workers):
+            arrays = [utils.toindex(ret(6 * i + k)).tousertensor()
+                      for k in range(6)]
+            self._samples.append(LinkSample(*arrays))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._num_samples is not None:
+            if self._num_samples == 0:
+                raise StopIteration
+            self._num_samples -= 1
+        if len(self._samples) == 0:
+            self._prefetch()
+        return self._samples.pop(0)
+
+    next = __next__
+
+def EdgeNeighborhoodSampler(g, sample_size, negative_rate=1,
+                            negative_mode='uniform', num_samples=None,
+                            num_workers=1, seed=None):
+    '''Create a sampler of edge neighborhoods and negative edges for link
+    prediction.
+
+    Each sample is a set of ``sample_size`` edges grown from a random
+    vertex: every step picks a vertex with probability proportional to its
+    number of unpicked edges, among the vertices incident to the edges
+    picked so far, then picks one of its unpicked edges uniformly. The edge
+    directions are ignored. The nodes of the sampled edges are relabeled to
+    a compact range, and ``negative_rate`` negative edges are generated per
+    sampled edge by replacing its source or destination (with equal
+    probability) with a node of the sample.
+
+    The sampling runs in C. ``num_workers`` samples are drawn in parallel
+    threads at a time. The incidence of the edges is built once when the
+    sampler is created, so edges added to ``g`` afterwards are not sampled.
+
+    Parameters
+    ----------
+    g : DGLGraph
+        The graph where the edges are sampled from.
+    sample_size : int
+        The number of edges of each sample.
+    negative_rate : int, optional
+        The number of negative edges per sampled edge.
+    negative_mode : str, optional
+        How the replacing nodes are chosen: ``'uniform'`` among the nodes of
+        the sample, or ``'degree'`` with probability proportional to their
+        degree in the sample.
+    num_samples : int, optional
+        The number of samples to return. None means unlimited.
+    num_workers : int, optional
+        The number of samples drawn in parallel.
+    seed : int, optional
+        The random seed. The samples only depend on the graph, the seed and
+        the parameters above. None means a random seed.
+
+    Returns
+    -------
+    An iterator of LinkSample.
+    '''
+    return ENSubgraphLoader(g, sample_size, negative_rate, negative_mode,
+                            num_samples, num_workers, seed)
+
+_init_api('dgl.contrib.sampling.link_sampler')
@@ -5,6 +5,7 @@ from . import citation_graph as citegrh
 from .citation_graph import CoraBinary
 from .tree import *
 from .utils import *
+from .edge_list import *
 from .sbm import SBMMixture
 
 def register_data_args(parser):
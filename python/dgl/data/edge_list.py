@@ -0,0 +1,341 @@
+"""Chunked ingestion of edge list files.
+
+The functions in this module read an edge list file in fixed-size blocks so
+that the whole edge list never needs to be held in memory as Python objects.
+Two file formats are supported:
+
+* ``'text'``: one edge per line, the first two columns of each line are the
+  source and destination node ids and other columns are ignored. Columns
+  are separated by ``delimiter`` (any whitespace by default). Lines starting
+  with ``comment`` are skipped.
+* ``'binary'``: a flat array of ``(src, dst)`` pairs of type ``dtype``, i.e.
+  ``src_0, dst_0, src_1, dst_1, ...``.
+"""
+from __future__ import absolute_import
+
+import os
+import json
+import numpy as np
+
+from .._ffi.base import DGLError
+from ..graph_index import create_graph_index
+from .. import utils
+
+__all__ = ['iter_edge_blocks', 'load_edge_list', 'build_csr_store', 'CSRStore']
+
+def _iter_text_blocks(f, block_size, delimiter, comment):
+    while True:
+        lines = []
+        for line in f:
+            if not line.strip() or line.startswith(comment):
+                continue
+            lines.append(line)
+            if len(lines) == block_size:
+                break
+        if len(lines) == 0:
+            return
+        # only the id columns are parsed, so extra columns (e.g. float edge
+        # weights) neither turn the ids into floats nor need to be numbers
+        try:
+            data = np.loadtxt(lines, dtype=np.int64, delimiter=delimiter,
+                              comments=None, usecols=(0, 1), ndmin=2)
+        except ValueError as err:
+            raise DGLError('Each line of an edge list needs two integer node'
+                           ' id columns: %s' % str(err))
+        yield data[:, 0].copy(), data[:, 1].copy()
+        if len(lines) < block_size:
+            return
+
+def _iter_binary_blocks(f, block_size, dtype):
+    while True:
+        data = np.fromfile(f, dtype=dtype, count=2 * block_size)
+        if len(data) == 0:
+            return
+        if len(data) % 2 != 0:
+            raise DGLError('Binary edge list has an odd number of ids.')
+        data = data.reshape(-1, 2).astype(np.int64)
+        yield data[:, 0].copy(), data[:, 1].copy()
+
+def iter_edge_blocks(path, block_size=1 << 20, fmt='text', delimiter=None,
+                     dtype=np.int64, comment='#'):
+    """Iterate over an edge list file in blocks of edges.
+
+    Parameters
+    ----------
+    path : str
+        Path to the edge list file.
+    block_size : int, optional
+        Maximum number of edges in each block.
+    fmt : str, optional
+        Either ``'text'`` or ``'binary'``.
+    delimiter : str, optional
+        Column delimiter of text files. Any whitespace if None.
+    dtype : numpy.dtype, optional
+        Id type of binary files.
+    comment : str, optional
+        Prefix of comment lines in text files.
+
+    Returns
+    -------
+    iterator of (numpy.ndarray, numpy.ndarray)
+        Source and destination node ids (int64) of each block.
+    """
+    if block_size <= 0:
+        raise DGLError('Block size must be positive, got %d.' % block_size)
+    if fmt == 'text':
+        comment = comment.encode('utf-8')
+        with open(path, 'rb') as f:
+            for block in _iter_text_blocks(f, block_size, delimiter, comment):
+                yield block
+    elif fmt == 'binary':
+        with open(path, 'rb') as f:
+            for block in _iter_binary_blocks(f, block_size, dtype):
+                yield block
+    else:
+        raise DGLError('Invalid edge list format: %s' % str(fmt))
+
+def load_edge_list(path, num_nodes=None, multigraph=False, block_size=1 << 20,
+                   fmt='text', delimiter=None, dtype=np.int64, comment='#',
+                   index_dtype='int64'):
+    """Build a graph from an edge list file, one block of edges at a time.
+
+    Edges are added in file order, so the i-th edge of the file has edge
+    id i. Nodes are added as larger ids show up, unless ``num_nodes`` is
+    given.
+
+    Parameters
+    ----------
+    path : str
+        Path to the edge list file.
+    num_nodes : int, optional
+        Number of nodes of the graph. Inferred from the largest node id if
+        None.
+    multigraph : bool, optional
+        Whether the graph is a multigraph.
+    block_size, fmt, delimiter, dtype, comment
+        See :func:`iter_edge_blocks`.
+    index_dtype : str, optional
+        Id type of the graph structure, see :class:`~dgl.DGLGraph`.
+
+    Returns
+    -------
+    DGLGraph
+        The graph.
+    """
+    from ..graph import DGLGraph
+    gi = create_graph_index(multigraph=multigraph, index_dtype=index_dtype)
+    if num_nodes is not None:
+        gi.add_nodes(num_nodes)
+    for src, dst in iter_edge_blocks(path, block_size, fmt, delimiter, dtype,
+                                     comment):
+        if len(src) == 0:
+            continue
+        if min(src.min(), dst.min()) < 0:
+            raise DGLError('Invalid edge list. Nodes must start from 0.')
+        max_nid = max(src.max(), dst.max())
+        if max_nid >= gi.number_of_nodes():
+            if num_nodes is not None:
+                raise DGLError('Node id %d is out of range of %d nodes.'
+                               % (max_nid, num_nodes))
+            gi.add_nodes(int(max_nid) + 1 - gi.number_of_nodes())
+        gi.add_edges(utils.toindex(src), utils.toindex(dst))
+    return DGLGraph(gi, multigraph=multigraph)
+
+def build_csr_store(path, out_dir, num_nodes=None, block_size=1 << 20,
+                    fmt='text', delimiter=None, dtype=np.int64, comment='#'):
+    """Convert an edge list file to a CSR (out-edge) store on disk.
+
+    The conversion streams over the file twice: the first pass counts the
+    out-degree of each node and the second pass scatters each block of
+    edges into memory-mapped arrays. Only the per-node arrays and one block
+    of edges are held in memory.
+
+    The store consists of the following files under ``out_dir``:
+
+    * ``indptr.npy``: int64 array of size ``num_nodes + 1``.
+    * ``indices.npy``: int64 destination node ids, grouped by source node.
+    * ``eids.npy``: int64 edge ids, i.e. the position of each edge in the
+      edge list file.
+    * ``meta.json``: number of nodes and edges.
+
+    Within the out-edges of a node, edges keep their file order.
+
+    Parameters
+    ----------
+    path : str
+        Path to the edge list file.
+    out_dir : str
+        Directory to write the store to. Created if it does not exist.
+    num_nodes : int, optional
+        Number of nodes of the graph. Inferred from the largest node id if
+        None.
+    block_size, fmt, delimiter, dtype, comment
+        See :func:`iter_edge_blocks`.
+
+    Returns
+    -------
+    CSRStore
+        The store opened in read-only mode.
+    """
+    def _blocks():
+        return iter_edge_blocks(path, block_size, fmt, delimiter, dtype, comment)
+
+    # pass 1: out-degrees
+    n_nodes = num_nodes if num_nodes is not None else 0
+    degrees = np.zeros(n_nodes, dtype=np.int64)
+    for src, dst in _blocks():
+        if len(src) == 0:
+            continue
+        if min(src.min(), dst.min()) < 0:
+            raise DGLError('Invalid edge list. Nodes must start from 0.')
+        max_nid = int(max(src.max(), dst.max()))
+        if max_nid >= n_nodes:
+            if num_nodes is not None:
+                raise DGLError('Node id %d is out of range of %d nodes.'
+                               % (max_nid, num_nodes))
+            n_nodes = max_nid + 1
+            if n_nodes > len(degrees):
+                # grow geometrically so that growing costs O(1) per node
+                grown = np.zeros(max(n_nodes, 2 * len(degrees)), dtype=np.int64)
+                grown[:len(degrees)] = degrees
+                degrees = grown
+        # count only the sources in the block, not every node
+        uniq, counts = np.unique(src, return_counts=True)
+        degrees[uniq] += counts
+    degrees = degrees[:n_nodes]
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(degrees, out=indptr[1:])
+    n_edges = int(indptr[-1])
+    del degrees
+
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    np.save(os.path.join(out_dir, 'indptr.npy'), indptr)
+    # empty files cannot be memory-mapped
+    if n_edges == 0:
+        np.save(os.path.join(out_dir, 'indices.npy'), np.zeros(0, dtype=np.int64))
+        np.save(os.path.join(out_dir, 'eids.npy'), np.zeros(0, dtype=np.int64))
+    else:
+        indices = np.lib.format.open_memmap(os.path.join(out_dir, 'indices.npy'),
+                                            mode='w+', dtype=np.int64,
+                                            shape=(n_edges,))
+        eids = np.lib.format.open_memmap(os.path.join(out_dir, 'eids.npy'),
+                                         mode='w+', dtype=np.int64,
+                                         shape=(n_edges,))
+        # pass 2: scatter edges, cursor[v] is the next free slot of node v
+        cursor = indptr[:-1].copy()
+        offset = 0
+        for src, dst in _blocks():
+            if len(src) == 0:
+                continue
+            order = np.argsort(src, kind='stable')
+            sorted_src = src[order]
+            # rank of each edge among the edges of the same source in the block
+            starts = np.searchsorted(sorted_src, sorted_src, side='left')
+            pos = cursor[sorted_src] + (np.arange(len(src)) - starts)
+            indices[pos] = dst[order]
+            eids[pos] = order + offset
+            # advance only the touched sources, a bincount over all nodes
+            # per block would make the pass O(N * blocks)
+            uniq, counts = np.unique(sorted_src, return_counts=True)
+            cursor[uniq] += counts
+            offset += len(src)
+        indices.flush()
+        eids.flush()
+        del indices, eids
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump({'num_nodes': n_nodes, 'num_edges': n_edges}, f)
+    return CSRStore(out_dir)
+
+class CSRStore(object):
+    """A CSR graph structure stored on disk.
+
+    The arrays are memory-mapped, so opening a store is cheap and only the
+    pages that are touched are read.
+
+    Parameters
+    ----------
+    path : str
+        Directory of the store, as written by :func:`build_csr_store`.
+    mmap_mode : str, optional
+        Memory-map mode passed to ``numpy.load``.
+
+    Attributes
+    ----------
+    indptr : numpy.ndarray
+        Row pointers.
+    indices : numpy.ndarray
+        Destination node ids.
+    eids : numpy.ndarray
+        Edge ids (position in the original edge list).
+    """
+    def __init__(self, path, mmap_mode='r'):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        self._num_nodes = meta['num_nodes']
+        self._num_edges = meta['num_edges']
+        self.indptr = np.load(os.path.join(path, 'indptr.npy'), mmap_mode=mmap_mode)
+        if self._num_edges == 0:
+            mmap_mode = None
+        self.indices = np.load(os.path.join(path, 'indices.npy'), mmap_mode=mmap_mode)
+        self.eids = np.load(os.path.join(path, 'eids.npy'), mmap_mode=mmap_mode)
+
+    def number_of_nodes(self):
+        """Return the number of nodes."""
+        return self._num_nodes
+
+    def number_of_edges(self):
+        """Return the number of edges."""
+        return self._num_edges
+
+    def out_edges(self, v):
+        """Return the destination nodes and edge ids of the out-edges of v.
+
+        Parameters
+        ----------
+        v : int
+            The source node.
+
+        Returns
+        -------
+        numpy.ndarray
+            The destination nodes.
+        numpy.ndarray
+            The edge ids.
+        """
+        start, end = self.indptr[v], self.indptr[v + 1]
+        return np.asarray(self.indices[start:end]), np.asarray(self.eids[start:end])
+
+    def to_graph(self, multigraph=False, block_size=1 << 20, index_dtype='int64'):
+        """Build a graph from the store, one block of edges at a time.
+
+        The edges keep the edge ids of the original edge list.
+
+        Parameters
+        ----------
+        multigraph : bool, optional
+            Whether the graph is a multigraph.
+        block_size : int, optional
+            Maximum number of edges added at a time.
+        index_dtype : str, optional
+            Id type of the graph structure, see :class:`~dgl.DGLGraph`.
+
+        Returns
+        -------
+        DGLGraph
+            The graph.
+        """
+        from ..graph import DGLGraph
+        # add edges in edge id order so that the ids are preserved
+        perm = np.empty(self._num_edges, dtype=np.int64)
+        perm[self.eids] = np.arange(self._num_edges)
+        gi = create_graph_index(multigraph=multigraph, index_dtype=index_dtype)
+        gi.add_nodes(self._num_nodes)
+        for start in range(0, self._num_edges, block_size):
+            pos = perm[start:start + block_size]
+            # source of the edge at CSR position p is the row containing p
+            src = np.searchsorted(self.indptr, pos, side='right') - 1
+            dst = np.asarray(self.indices[pos])
+            gi.add_edges(utils.toindex(src), utils.toindex(dst))
+        return DGLGraph(gi, multigraph=multigraph)
@@ -1,8 +1,9 @@
 """Columnar storage for DGLGraph."""
 from __future__ import absolute_import
 
-from collections import MutableMapping, namedtuple
+from collections import MutableMapping, namedtuple, OrderedDict
 
+import mmap
 import sys
 import numpy as np
 
@@ -10,6 +11,7 @@ from . import backend as F
 from .base import DGLError, dgl_warning
 from .init import zero_initializer
 from . import utils
+from .shared_memory import SharedArray
 
 class Scheme(namedtuple('Scheme', ['shape', 'dtype'])):
     """The column scheme.
@@ -66,6 +68,11 @@ class Column(object):
     def shape(self):
         return self.scheme.shape
 
+    @property
+    def context(self):
+        """The context of the column data."""
+        return F.context(self.data)
+
     def __getitem__(self, idx):
         """Return the feature data given the index.
 
@@ -149,17 +156,370 @@ class Column(object):
             raise DGLError("Cannot update column of scheme %s using feature of scheme %s."
                     % (feat_scheme, self.scheme))
 
-        feats = F.copy_to(feats, F.context(self.data))
+        feats = utils.copy_to(feats, self.context, 'Column.extend')
         self.data = F.cat([self.data, feats], dim=0)
 
+    def shallow_copy(self):
+        """Return a new column that shares the same data."""
+        return Column(self.data, self.scheme)
+
+    def share_memory(self):
+        """Move the column data to shared memory for pickling.
+
+        Until the column data is replaced, pickling the column only pickles
+        the handle of the shared memory block. The data is detached from the
+        autograd graph. Only CPU columns are moved. See
+        :mod:`dgl.shared_memory`.
+        """
+        if self.context != F.cpu():
+            return
+        if getattr(self, '_shared', None) is not None \
+                and self._shared[1] is self.data:
+            return
+        shared = SharedArray(F.asnumpy(self.data))
+        self.data = F.zerocopy_from_numpy(shared.array)
+        self._shared = (shared, self.data)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        shared = state.pop('_shared', None)
+        if shared is not None and shared[1] is self.data:
+            # pickle the shared memory handle instead of the data
+            state['data'] = shared[0]
+        return state
+
+    def __setstate__(self, state):
+        # subclasses such as MMapColumn have no data attribute
+        if isinstance(state.get('data'), SharedArray):
+            state['data'] = F.zerocopy_from_numpy(state['data'].array)
+        self.__dict__.update(state)
+
     @staticmethod
     def create(data):
         """Create a new column using the given data."""
         if isinstance(data, Column):
-            return Column(data.data, data.scheme)
+            return data.shallow_copy()
         else:
             return Column(data)
 
+class MMapColumn(Column):
+    """A column whose rows live in a memory-mapped file.
+
+    Only the rows that are read are materialized as tensors, so the column
+    can be much larger than the memory. Rows are read in pages of
+    ``page_size`` consecutive rows, and the recently used pages are kept in
+    an LRU cache of ``cache_pages`` pages.
+
+    Accessing ``data`` materializes the whole column. A column that maps a
+    whole file is pickled as the arguments to map it again, not as its
+    content, so the file must be readable where it is unpickled.
+
+    Parameters
+    ----------
+    path : str or numpy.ndarray
+        Path to a ``.npy`` file or a raw binary file, or an already
+        memory-mapped numpy array.
+    dtype : str, optional
+        The data type of a raw binary file (e.g. ``'float32'``).
+    shape : tuple of int, optional
+        The shape of a raw binary file. The first dimension is inferred if
+        it is -1.
+    mode : str, optional
+        The memory-map mode. Use ``'r+'`` to allow writing to the column.
+    page_size : int, optional
+        Number of rows in one page.
+    cache_pages : int, optional
+        Maximum number of cached pages. Set to 0 to disable the cache.
+    ctx : DGLContext, optional
+        The context of the materialized tensors. CPU by default.
+    """
+    def __init__(self, path, dtype=None, shape=None, mode='r', page_size=1024,
+                 cache_pages=64, ctx=None):
+        if isinstance(path, np.ndarray):
+            array = path
+        elif dtype is None:
+            array = np.load(path, mmap_mode=mode)
+        else:
+            array = np.memmap(path, dtype=dtype, mode=mode)
+            if shape is not None:
+                array = array.reshape(shape)
+        if array.ndim == 0:
+            raise DGLError('Cannot create a column from a scalar array.')
+        if page_size <= 0:
+            raise DGLError('Page size must be positive, got %d.' % page_size)
+        self._array = array
+        self._page_size = page_size
+        self._cache_pages = cache_pages
+        self._cache = OrderedDict()
+        self._ctx = ctx if ctx is not None else F.cpu()
+        self._staging = utils.PinnedBuffer()
+        self.hits = 0
+        self.misses = 0
+        self.scheme = Scheme(tuple(array.shape[1:]),
+                             F.data_type_dict[array.dtype.name])
+
+    def __len__(self):
+        """The column length."""
+        return self._array.shape[0]
+
+    @property
+    def array(self):
+        """The underlying memory-mapped array."""
+        return self._array
+
+    @property
+    def context(self):
+        """The context of the materialized tensors."""
+        return self._ctx
+
+    @property
+    def data(self):
+        """Materialize the whole column as a tensor."""
+        return self._totensor(np.array(self._array))
+
+    def _totensor(self, arr):
+        return utils.copy_to(F.zerocopy_from_numpy(arr), self._ctx,
+                             'MMapColumn.read', staging=self._staging)
+
+    def _get_page(self, pid):
+        page = self._cache.get(pid)
+        if page is not None:
+            self.hits += 1
+            # move to the most recently used end
+            del self._cache[pid]
+            self._cache[pid] = page
+            return page
+        self.misses += 1
+        start = pid * self._page_size
+        page = np.array(self._array[start:start + self._page_size])
+        if self._cache_pages > 0:
+            self._cache[pid] = page
+            if len(self._cache) > self._cache_pages:
+                self._cache.popitem(last=False)
+        return page
+
+    def _read_rows(self, rows):
+        """Read the given rows (numpy int array) into a numpy array."""
+        out = np.empty((len(rows),) + self._array.shape[1:], dtype=self._array.dtype)
+        if self._cache_pages == 0:
+            # sort the reads so the file is scanned sequentially
+            order = np.argsort(rows, kind='stable')
+            out[order] = self._array[rows[order]]
+            return out
+        # gather the rows page by page, in the order of the pages
+        pages = rows // self._page_size
+        order = np.argsort(pages, kind='stable')
+        pids, starts = np.unique(pages[order], return_index=True)
+        bounds = np.append(starts, len(rows))
+        # pages that would not stay in the cache are not loaded in full
+        bypass = len(pids) > self._cache_pages
+        for i, pid in enumerate(pids):
+            sel = order[bounds[i]:bounds[i + 1]]
+            if bypass and pid not in self._cache:
+                self.misses += 1
+                out[sel] = self._array[rows[sel]]
+            else:
+                page = self._get_page(pid)
+                out[sel] = page[rows[sel] - pid * self._page_size]
+        return out
+
+    def _file_args(self):
+        """Return the arguments to reopen the memory map with, or None if
+        the array is not a whole file mapping."""
+        array = self._array
+        top = array
+        while isinstance(top, np.memmap) and isinstance(top.base, np.memmap):
+            top = top.base
+        if (not isinstance(top, np.memmap) or not isinstance(top.base, mmap.mmap)
+                or top.filename is None or not array.flags.c_contiguous
+                or array.ctypes.data != top.ctypes.data):
+            return None
+        # 'w+' would truncate the file
+        mode = 'r+' if top.mode == 'w+' else top.mode
+        return (top.filename, array.dtype.str, mode, top.offset, array.shape)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_cache'] = OrderedDict()
+        state['_staging'] = utils.PinnedBuffer()
+        file_args = self._file_args()
+        if file_args is not None:
+            # reopen the file on unpickling instead of pickling its content
+            del state['_array']
+            state['_file_args'] = file_args
+        return state
+
+    def __setstate__(self, state):
+        file_args = state.pop('_file_args', None)
+        self.__dict__.update(state)
+        if file_args is not None:
+            filename, dtype, mode, offset, shape = file_args
+            self._array = np.memmap(filename, dtype=dtype, mode=mode,
+                                    offset=offset, shape=shape)
+
+    def __getitem__(self, idx):
+        """Return the feature data given the index.
+
+        Parameters
+        ----------
+        idx : slice or utils.Index
+            The index.
+
+        Returns
+        -------
+        Tensor
+            The feature data
+        """
+        if isinstance(idx, slice):
+            return self._totensor(np.array(self._array[idx]))
+        else:
+            rows = idx.tonumpy().astype(np.int64)
+            return self._totensor(self._read_rows(rows))
+
+    def update(self, idx, feats, inplace):
+        """Write the features to the file.
+
+        The write always goes to the underlying file whether ``inplace`` is
+        true or not, so the column must be opened in a writable mode.
+
+        Parameters
+        ----------
+        idx : utils.Index or slice
+            The index.
+        feats : Tensor
+            The new features.
+        inplace : bool
+            Ignored.
+        """
+        if not self._array.flags.writeable:
+            raise DGLError('Cannot update a read-only memory-mapped column.')
+        feat_scheme = infer_scheme(feats)
+        if feat_scheme != self.scheme:
+            raise DGLError("Cannot update column of scheme %s using feature of scheme %s."
+                    % (feat_scheme, self.scheme))
+        if isinstance(idx, utils.Index):
+            idx = idx.tonumpy()
+        self._array[idx] = F.asnumpy(feats)
+        self._cache.clear()
+
+    def extend(self, feats, feat_scheme=None):
+        """Memory-mapped columns have fixed length and cannot be extended."""
+        raise DGLError('Cannot extend a memory-mapped column.')
+
+    def share_memory(self):
+        """Memory-mapped columns are not moved to shared memory."""
+        pass
+
+    def shallow_copy(self):
+        """Return a new column that shares the same file and page cache."""
+        col = MMapColumn.__new__(MMapColumn)
+        col.__dict__.update(self.__dict__)
+        return col
+
+class LazyColumn(Column):
+    """A column of rows of another column, gathered on first access.
+
+    The source column is shallow-copied, so later replacements of the
+    source data are not seen by this column. Writes to this column never go
+    to the source; they mark the column as dirty instead.
+
+    Parameters
+    ----------
+    source : Column
+        The column to gather from.
+    index : utils.Index or slice
+        The rows of the source column.
+    """
+    def __init__(self, source, index):
+        self._source = source.shallow_copy()
+        self._index = index
+        self._data = None
+        self.scheme = source.scheme
+        self.dirty = False
+
+    def __len__(self):
+        """The column length."""
+        if self._data is not None:
+            return F.shape(self._data)[0]
+        elif isinstance(self._index, slice):
+            return self._index.stop - self._index.start
+        else:
+            return len(self._index)
+
+    @property
+    def resolved(self):
+        """Whether the rows have been gathered."""
+        return self._data is not None
+
+    @property
+    def context(self):
+        """The context of the column data."""
+        if self._data is not None:
+            return F.context(self._data)
+        return self._source.context
+
+    def _resolve(self):
+        if self._data is None:
+            self._data = self._source[self._index]
+            # drop the reference so that the source can be freed
+            self._source = None
+
+    @property
+    def data(self):
+        """Gather the rows from the source column on first access."""
+        self._resolve()
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+        self._source = None
+
+    def update(self, idx, feats, inplace):
+        """Update the feature data given the index and mark the column dirty.
+
+        See ``Column.update``.
+        """
+        super(LazyColumn, self).update(idx, feats, inplace)
+        self.dirty = True
+
+    def extend(self, feats, feat_scheme=None):
+        """Extend the feature data and mark the column dirty.
+
+        See ``Column.extend``.
+        """
+        super(LazyColumn, self).extend(feats, feat_scheme)
+        self.dirty = True
+
+    def __getstate__(self):
+        state = super(LazyColumn, self).__getstate__()
+        if state['_data'] is None:
+            # pickle the gathered rows, not the whole source column
+            state['_data'] = self._source[self._index]
+            state['_source'] = None
+        return state
+
+    def shallow_copy(self):
+        """Return a new column that shares the same data.
+
+        The copy of an unresolved column is another unresolved column.
+        """
+        if self._data is None:
+            col = LazyColumn(self._source, self._index)
+        else:
+            col = LazyColumn.__new__(LazyColumn)
+            col.__dict__.update(self.__dict__)
+        col.dirty = self.dirty
+        return col
+
+    def share_memory(self):
+        """Gather the rows and move them to shared memory.
+
+        See ``Column.share_memory``.
+        """
+        self._resolve()
+        super(LazyColumn, self).share_memory()
+
 class Frame(MutableMapping):
     """The columnar storage for node/edge features.
 
@@ -333,7 +693,7 @@ class Frame(MutableMapping):
         feat_placeholders = {}
         for key, col in self._columns.items():
             scheme = col.scheme
-            ctx = F.context(col.data)
+            ctx = col.context
             if self.get_initializer(key) is None:
                 self._warn_and_set_initializer()
             new_data = self.get_initializer(key)(
@@ -369,7 +729,7 @@ class Frame(MutableMapping):
             for key, col in other.items():
                 if key not in self._columns:
                     # the column does not exist; init a new column
-                    self.add_column(key, col.scheme, F.context(col.data))
+                    self.add_column(key, col.scheme, col.context)
                 self._columns[key].extend(col.data, col.scheme)
 
     def append(self, other):
@@ -406,6 +766,14 @@ class Frame(MutableMapping):
         """Return the keys."""
         return self._columns.keys()
 
+    def share_memory(self):
+        """Move all the columns to shared memory for pickling.
+
+        See ``Column.share_memory``.
+        """
+        for col in self._columns.values():
+            col.share_memory()
+
 class FrameRef(MutableMapping):
     """Reference object to a frame on a subset of rows.
 
@@ -534,6 +902,13 @@ class FrameRef(MutableMapping):
         """Return the keys."""
         return self._frame.keys()
 
+    def share_memory(self):
+        """Move the columns of the underlying frame to shared memory.
+
+        See ``Frame.share_memory``.
+        """
+        self._frame.share_memory()
+
     def __getitem__(self, key):
         """Get data from the frame.
 
@@ -594,6 +969,31 @@ class FrameRef(MutableMapping):
         else:
             return col[self.index_or_slice()]
 
+    def select_rows_lazy(self, query):
+        """Return a new frame of the given rows, gathered on first access.
+
+        Each column of the new frame is a :class:`LazyColumn` that gathers
+        its rows from this frame when it is first read, so columns that are
+        never read cost nothing. Use :func:`dirty_columns` to find the
+        columns of the new frame that have been written since.
+
+        Parameters
+        ----------
+        query : utils.Index or slice
+            The rows to be selected.
+
+        Returns
+        -------
+        Frame
+            The new frame.
+        """
+        rows = self._getrows(query)
+        num_rows = query.stop - query.start if isinstance(query, slice) else len(query)
+        frame = Frame(num_rows=num_rows)
+        for key in self.keys():
+            frame._columns[key] = LazyColumn(self._frame[key], rows)
+        return frame
+
     def select_rows(self, query):
         """Return the rows given the query.
 
@@ -825,6 +1225,8 @@ class FrameRef(MutableMapping):
                 query = query.tousertensor()
                 return utils.toindex(query + start)
         else:
+            if isinstance(query, slice):
+                query = utils.toindex(query)
             idxtensor = self.index().tousertensor()
             query = query.tousertensor()
             return utils.toindex(F.gather_row(idxtensor, query))
@@ -834,6 +1236,28 @@ class FrameRef(MutableMapping):
         self._index = None
         self._index_or_slice = None
 
+def dirty_columns(frame):
+    """Return the names of the columns written since the frame was created.
+
+    Columns of :class:`LazyColumn` type are dirty once updated. Any other
+    column has been added or replaced, and is always dirty. In-place
+    modifications of tensors read from a column are not tracked.
+
+    Parameters
+    ----------
+    frame : Frame or FrameRef
+        The frame.
+
+    Returns
+    -------
+    list of str
+        The names of the dirty columns.
+    """
+    if isinstance(frame, FrameRef):
+        frame = frame._frame
+    return [key for key, col in frame._columns.items()
+            if not isinstance(col, LazyColumn) or col.dirty]
+
 def frame_like(other, num_rows):
     """Create a new frame that has the same scheme as the given one.
 
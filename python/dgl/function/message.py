@@ -3,9 +3,14 @@ from __future__ import absolute_import
 
 from .base import BuiltinFunction
 import operator
+import numpy as np
 import dgl.backend as F
+from .. import utils
+from ..base import DGLError, is_all
 
-__all__ = ["src_mul_edge", "copy_src", "copy_edge"]
+__all__ = ["src_mul_edge", "copy_src", "copy_edge", "src_mul_typed_weight",
+           "copy_src_norm", "src_embedding"]
+# the binary message functions, e.g. u_add_v, are generated at the end
 
 
 class MessageFunction(BuiltinFunction):
@@ -41,6 +46,19 @@ def _is_spmv_supported_edge_feat(g, field):
     shape = F.shape(feat)
     return len(shape) == 1 or (len(shape) == 2 and shape[1] == 1)
 
+def _is_spmv_supported_head_feat(g, src_field, edge_field):
+    """Return whether the features are head-batched so that SPMV can be
+    applied to all the heads at once.
+
+    The edge feature should be of shape (E, H) or (E, H, 1, ...), and the
+    source node feature of shape (N, H, ...) with at least the same rank.
+    """
+    sshape = F.shape(g.get_n_repr()[src_field])
+    eshape = F.shape(g.get_e_repr()[edge_field])
+    return (len(eshape) >= 2 and len(sshape) >= len(eshape)
+            and sshape[1] == eshape[1]
+            and all(d == 1 for d in eshape[2:]))
+
 
 class SrcMulEdgeMessageFunction(MessageFunction):
     def __init__(self, mul_op, src_field, edge_field, out_field):
@@ -50,7 +68,10 @@ class SrcMulEdgeMessageFunction(MessageFunction):
         self.out_field = out_field
 
     def is_spmv_supported(self, g):
-        return _is_spmv_supported_edge_feat(g, self.edge_field)
+        if self.mul_op is not operator.mul:
+            return False
+        return (_is_spmv_supported_edge_feat(g, self.edge_field)
+                or _is_spmv_supported_head_feat(g, self.src_field, self.edge_field))
 
     def __call__(self, edges):
         sdata = edges.src[self.src_field]
@@ -73,6 +94,110 @@ class SrcMulEdgeMessageFunction(MessageFunction):
     def use_edge_feature(self):
         return True
 
+def binary_op(op, lhs, rhs):
+    """Apply a binary operator to two feature tensors of the same length.
+
+    The features are broadcast after appending trailing dimensions of size
+    one to the one of lower rank. ``dot`` sums the products over the last
+    dimension, which is kept with size one.
+
+    Parameters
+    ----------
+    op : str
+        One of ``'add'``, ``'sub'``, ``'mul'``, ``'div'`` and ``'dot'``.
+    lhs : Tensor
+        The left operand.
+    rhs : Tensor
+        The right operand.
+
+    Returns
+    -------
+    Tensor
+        The result.
+    """
+    rank = max(F.ndim(lhs), F.ndim(rhs))
+    lhs = F.reshape(lhs, F.shape(lhs) + (1,) * (rank - F.ndim(lhs)))
+    rhs = F.reshape(rhs, F.shape(rhs) + (1,) * (rank - F.ndim(rhs)))
+    if op == 'add':
+        return lhs + rhs
+    elif op == 'sub':
+        return lhs - rhs
+    elif op == 'mul':
+        return lhs * rhs
+    elif op == 'div':
+        return lhs / rhs
+    else:
+        return F.unsqueeze(F.sum(lhs * rhs, rank - 1), rank - 1)
+
+_TARGET_NAMES = {'u' : 'source node', 'v' : 'destination node', 'e' : 'edge'}
+_OP_NAMES = {'add' : 'adding', 'sub' : 'subtracting', 'mul' : 'multiplying',
+             'div' : 'dividing', 'dot' : 'the dot product of'}
+_BINARY_OPS = ['add', 'sub', 'mul', 'div', 'dot']
+
+class BinaryMessageFunction(MessageFunction):
+    """Builtin message function that applies a binary operator to two
+    features of the source node (``'u'``), the destination node (``'v'``)
+    or the edge (``'e'``)."""
+    def __init__(self, op, lhs, rhs, lhs_field, rhs_field, out_field):
+        self.op = op
+        self.lhs = lhs
+        self.rhs = rhs
+        self.lhs_field = lhs_field
+        self.rhs_field = rhs_field
+        self.out_field = out_field
+
+    def is_spmv_supported(self, g):
+        targets = (self.lhs, self.rhs)
+        if sorted(targets) == ['u', 'v']:
+            # linear in the source feature, which is reduced by SPMV before
+            # the operator is applied to the destination feature
+            return self.op != 'div' or self.lhs == 'u'
+        if sorted(targets) == ['e', 'u'] and self.op == 'mul':
+            return (_is_spmv_supported_edge_feat(g, self.edge_field)
+                    or _is_spmv_supported_head_feat(g, self.src_field,
+                                                    self.edge_field))
+        return False
+
+    def _get_data(self, edges, target, field):
+        if target == 'u':
+            return edges.src[field]
+        elif target == 'v':
+            return edges.dst[field]
+        else:
+            return edges.data[field]
+
+    def __call__(self, edges):
+        lhs = self._get_data(edges, self.lhs, self.lhs_field)
+        rhs = self._get_data(edges, self.rhs, self.rhs_field)
+        return {self.out_field : binary_op(self.op, lhs, rhs)}
+
+    def _field_of(self, target):
+        if self.lhs == target:
+            return self.lhs_field
+        elif self.rhs == target:
+            return self.rhs_field
+        return None
+
+    @property
+    def src_field(self):
+        return self._field_of('u')
+
+    @property
+    def dst_field(self):
+        return self._field_of('v')
+
+    @property
+    def edge_field(self):
+        return self._field_of('e')
+
+    @property
+    def name(self):
+        return "%s_%s_%s" % (self.lhs, self.op, self.rhs)
+
+    @property
+    def use_edge_feature(self):
+        return 'e' in (self.lhs, self.rhs)
+
 class CopySrcMessageFunction(MessageFunction):
     def __init__(self, src_field, out_field):
         self.src_field = src_field
@@ -92,6 +217,33 @@ class CopySrcMessageFunction(MessageFunction):
     def use_edge_feature(self):
         return False
 
+class CopySrcNormMessageFunction(MessageFunction):
+    def __init__(self, src_field, out_field, norm):
+        self.src_field = src_field
+        self.out_field = out_field
+        self.norm = norm
+
+    def is_spmv_supported(self, g):
+        # the normalizers are the values of the sparse matrix
+        return True
+
+    def __call__(self, edges):
+        sdata = edges.src[self.src_field]
+        ctx = F.context(sdata)
+        src_norm, dst_norm = edges._g.degree_norm(self.norm, ctx)
+        u, v, _ = edges.edges()
+        w = F.gather_row(src_norm, u) * F.gather_row(dst_norm, v)
+        w = F.reshape(w, (F.shape(w)[0],) + (1,) * (F.ndim(sdata) - 1))
+        return {self.out_field : sdata * w}
+
+    @property
+    def name(self):
+        return "copy_src_norm"
+
+    @property
+    def use_edge_feature(self):
+        return False
+
 class CopyEdgeMessageFunction(MessageFunction):
     def __init__(self, edge_field=None, out_field=None):
         self.edge_field = edge_field
@@ -113,6 +265,136 @@ class CopyEdgeMessageFunction(MessageFunction):
     def use_edge_feature(self):
         return True
 
+class SrcMulTypedWeightMessageFunction(MessageFunction):
+    def __init__(self, src_field, type_field, weight, out_field, edge_field):
+        self.src_field = src_field
+        self.type_field = type_field
+        self.weight = weight
+        self.out_field = out_field
+        self.edge_field = edge_field
+
+    def is_spmv_supported(self, g):
+        # with sum, the product of each (source, type) pair is computed once
+        # and the products are summed with a sparse matrix
+        return (self.edge_field is None
+                or _is_spmv_supported_edge_feat(g, self.edge_field))
+
+    def type_plan(self, graph, name, compute):
+        """Return ``compute(etype)`` for the type column of the graph.
+
+        The result is cached on the graph index under ``name`` and the type
+        field. It is computed again when the graph is mutated or the type
+        column is set to another tensor, but not when the column is written
+        in place.
+        """
+        etype = graph._edge_frame.select_column(self.type_field)
+        plans = graph._graph._cache.setdefault('typed_weight', {})
+        key = (name, self.type_field)
+        if key not in plans or plans[key][0] is not etype:
+            plans[key] = (etype, compute(etype))
+        return plans[key][1]
+
+    def matmul_by_type(self, sdata, rows, bounds):
+        """Multiply the rows of each type with the weight of the type.
+
+        The rows of type ``t`` are ``rows[bounds[t]:bounds[t + 1]]``, and
+        the products are returned in the order of ``rows``.
+        """
+        msgs = []
+        for rel in range(len(bounds) - 1):
+            start, end = int(bounds[rel]), int(bounds[rel + 1])
+            if end > start:
+                weight = F.squeeze(F.narrow_row(self.weight, rel, rel + 1), 0)
+                msgs.append(F.matmul(
+                    F.gather_row(sdata, F.narrow_row(rows, start, end)), weight))
+        return msgs[0] if len(msgs) == 1 else F.cat(msgs, 0)
+
+    def __call__(self, edges):
+        sdata = edges.src[self.src_field]
+        ctx = F.context(sdata)
+        if F.shape(sdata)[0] == 0:
+            out_feat = F.shape(self.weight)[2]
+            return {self.out_field : F.zeros((0, out_feat), F.dtype(sdata), ctx)}
+        def _sort(etype):
+            # group the edges by type with one stable sort
+            etype = F.asnumpy(etype).astype(np.int64)
+            order = np.argsort(etype, kind='stable')
+            bounds = np.concatenate(([0], np.cumsum(np.bincount(etype))))
+            inverse = np.empty_like(order)
+            inverse[order] = np.arange(len(order))
+            return utils.toindex(order), utils.toindex(inverse), bounds
+        eid = edges._edges[2]
+        if is_all(eid) or eid.is_slice(0, edges._g.number_of_edges()):
+            order, inverse, bounds = self.type_plan(edges._g, 'order', _sort)
+        else:
+            order, inverse, bounds = _sort(edges.data[self.type_field])
+        msg = self.matmul_by_type(sdata, order.tousertensor(ctx), bounds)
+        # back to the order of the edges
+        msg = F.gather_row(msg, inverse.tousertensor(ctx))
+        if self.edge_field is not None:
+            edata = edges.data[self.edge_field]
+            msg = msg * F.reshape(edata, (F.shape(edata)[0], 1))
+        return {self.out_field : msg}
+
+    @property
+    def name(self):
+        return "src_mul_typed_weight"
+
+    @property
+    def use_edge_feature(self):
+        return True
+
+class SrcEmbeddingMessageFunction(MessageFunction):
+    def __init__(self, src_field, table, out_field, type_field, edge_field,
+                 sparse_grad):
+        self.src_field = src_field
+        self.table = table
+        self.out_field = out_field
+        self.type_field = type_field
+        self.edge_field = edge_field
+        self.sparse_grad = sparse_grad
+
+    def is_spmv_supported(self, g):
+        # the sparse matrix picks the table rows and sums them
+        return (self.edge_field is None
+                or _is_spmv_supported_edge_feat(g, self.edge_field))
+
+    def flat_table(self):
+        """Return the table as a 2-D tensor, with the rows of each type
+        following each other."""
+        if self.type_field is None:
+            return self.table
+        shape = F.shape(self.table)
+        return F.reshape(self.table, (-1, shape[-1]))
+
+    def rows(self, ids, etype):
+        """Return the table row of each message."""
+        if self.type_field is None:
+            return ids
+        return etype * F.shape(self.table)[1] + ids
+
+    def __call__(self, edges):
+        etype = None
+        if self.type_field is not None:
+            etype = edges.data[self.type_field]
+        rows = self.rows(edges.src[self.src_field], etype)
+        if self.sparse_grad:
+            msg = F.gather_row_sparse_grad(self.flat_table(), rows)
+        else:
+            msg = F.gather_row(self.flat_table(), rows)
+        if self.edge_field is not None:
+            edata = edges.data[self.edge_field]
+            msg = msg * F.reshape(edata, (F.shape(edata)[0], 1))
+        return {self.out_field : msg}
+
+    @property
+    def name(self):
+        return "src_embedding"
+
+    @property
+    def use_edge_feature(self):
+        return self.type_field is not None or self.edge_field is not None
+
 
 def src_mul_edge(src, edge, out):
     """Builtin message function that computes message by multiplying source
@@ -127,6 +409,14 @@ def src_mul_edge(src, edge, out):
     out : str
         The output message field.
 
+    Notes
+    -----
+    With the builtin ``sum`` reducer, the messages are reduced by SPMV if
+    the edge feature is a scalar, or if the features are head-batched: the
+    edge feature of shape ``(E, H)`` or ``(E, H, 1)`` and the source feature
+    of shape ``(N, H, D)``. All the ``H`` heads (e.g. of multi-head
+    attention) are then propagated in one sparse matrix multiplication.
+
     Examples
     --------
     >>> import dgl
@@ -161,6 +451,40 @@ def copy_src(src, out):
     """
     return CopySrcMessageFunction(src, out)
 
+def copy_src_norm(src, out, norm='both'):
+    """Builtin message function that computes message using source node
+    feature scaled by the degree normalizers of the edge.
+
+    The normalizers come from ``DGLGraph.degree_norm`` and are cached on the
+    graph. With the builtin ``sum``, the messages are reduced by one SPMV
+    with the normalized adjacency matrix, so no edge weight feature is
+    needed.
+
+    Parameters
+    ----------
+    src : str
+        The source feature field.
+    out : str
+        The output message field.
+    norm : str, optional
+        ``'right'``, ``'left'`` or ``'both'`` (the default). See
+        ``DGLGraph.degree_norm``.
+
+    Examples
+    --------
+    >>> import dgl
+    >>> message_func = dgl.function.copy_src_norm(src='h', out='m')
+
+    The above example is equivalent to the following user defined function:
+
+    >>> src_norm, dst_norm = g.degree_norm('both')
+    >>> def message_func(edges):
+    >>>     u, v, _ = edges.edges()
+    >>>     w = (src_norm[u] * dst_norm[v]).unsqueeze(1)
+    >>>     return {'m': edges.src['h'] * w}
+    """
+    return CopySrcNormMessageFunction(src, out, norm)
+
 def copy_edge(edge, out):
     """Builtin message function that computes message using edge feature.
 
@@ -182,3 +506,148 @@ def copy_edge(edge, out):
     >>>     return {'m': edges.data['h']}
     """
     return CopyEdgeMessageFunction(edge, out)
+
+def src_mul_typed_weight(src, type, weight, out, edge=None):
+    """Builtin message function that multiplies source node features with
+    the weight matrix of the edge type.
+
+    The edges are grouped by type once, and the source features of each
+    group are multiplied with the weight of the type in one dense matrix
+    multiplication. This avoids materializing a weight matrix per edge.
+    When reduced with the builtin ``sum``, the messages are not materialized
+    either: each used (source, type) pair is multiplied once, and a sparse
+    matrix of the destination nodes by these pairs sums the products. The
+    grouping of the whole graph is cached until the graph is mutated or the
+    type column is set again.
+
+    Parameters
+    ----------
+    src : str
+        The source feature field. The features must be of shape
+        ``(N, in_feat)``.
+    type : str
+        The edge field of the integer edge types, of shape ``(E,)``.
+    weight : Tensor
+        The weight matrices of all the types, of shape
+        ``(num_types, in_feat, out_feat)``.
+    out : str
+        The output message field.
+    edge : str, optional
+        A scalar edge feature field to multiply the messages with, e.g. a
+        normalization constant.
+
+    Examples
+    --------
+    >>> import dgl
+    >>> message_func = dgl.function.src_mul_typed_weight(
+    ...     src='h', type='type', weight=weight, out='m', edge='norm')
+
+    The above example is equivalent to the following user defined function
+    (if using PyTorch):
+
+    >>> def message_func(edges):
+    >>>     w = weight[edges.data['type']]
+    >>>     m = torch.bmm(edges.src['h'].unsqueeze(1), w).squeeze(1)
+    >>>     return {'m': m * edges.data['norm'].view(-1, 1)}
+    """
+    return SrcMulTypedWeightMessageFunction(src, type, weight, out, edge)
+
+def src_embedding(src, table, out, type=None, edge=None, sparse_grad=False):
+    """Builtin message function that looks up the embedding of the source
+    node id in a table.
+
+    The source node ids act as one-hot features multiplied with the table,
+    e.g. the input layer of R-GCN. With the builtin ``sum``, the messages
+    are not materialized: a sparse matrix of the destination nodes by the
+    used table rows is multiplied with these rows.
+
+    Parameters
+    ----------
+    src : str
+        The source feature field of the integer ids, of shape ``(N,)``.
+    table : Tensor
+        The embedding table, of shape ``(num_ids, out_feat)``, or
+        ``(num_types, num_ids, out_feat)`` if ``type`` is given.
+    out : str
+        The output message field.
+    type : str, optional
+        The edge field of the integer edge types, of shape ``(E,)``. Each
+        type has its own table.
+    edge : str, optional
+        A scalar edge feature field to multiply the messages with, e.g. a
+        normalization constant.
+    sparse_grad : bool, optional
+        If True, the gradient of the table only stores the looked up rows.
+        Optimizers have to support sparse gradients if the table is a
+        parameter. Only supported without ``type``.
+
+    Examples
+    --------
+    >>> import dgl
+    >>> message_func = dgl.function.src_embedding(
+    ...     src='id', table=weight, out='m', type='type', edge='norm')
+
+    The above example is equivalent to the following user defined function
+    (if using PyTorch):
+
+    >>> def message_func(edges):
+    >>>     m = weight[edges.data['type'], edges.src['id']]
+    >>>     return {'m': m * edges.data['norm'].view(-1, 1)}
+    """
+    expected_ndim = 2 if type is None else 3
+    if F.ndim(table) != expected_ndim:
+        raise DGLError('Expect a %d-D embedding table, but got shape %s.'
+                       % (expected_ndim, str(F.shape(table))))
+    if sparse_grad and type is not None:
+        raise DGLError('Sparse gradients are not supported for typed tables.')
+    return SrcEmbeddingMessageFunction(src, table, out, type, edge, sparse_grad)
+
+def _gen_binary_message_func(lhs, op, rhs):
+    name = "%s_%s_%s" % (lhs, op, rhs)
+    docstring = """Builtin message function that computes message by %s
+    the %s feature and the %s feature.
+
+    Parameters
+    ----------
+    lhs_field : str
+        The %s feature field.
+    rhs_field : str
+        The %s feature field.
+    out : str
+        The output message field.
+
+    Notes
+    -----
+    The features are broadcast after appending trailing dimensions of size
+    one to the one of lower rank. ``dot`` sums the products over the last
+    dimension, which is kept with size one.
+
+    With the builtin ``sum`` reducer, the messages are not materialized if
+    they are linear in the source feature (any operator between the source
+    and the destination nodes except ``v_div_u``), or if they multiply the
+    source feature with a scalar or head-batched edge feature. The source
+    features are then reduced by SPMV before the operator is applied.
+
+    Examples
+    --------
+    >>> import dgl
+    >>> message_func = dgl.function.%s('a', 'b', 'm')
+    """ % (_OP_NAMES[op], _TARGET_NAMES[lhs], _TARGET_NAMES[rhs],
+           _TARGET_NAMES[lhs], _TARGET_NAMES[rhs], name)
+    def func(lhs_field, rhs_field, out):
+        return BinaryMessageFunction(op, lhs, rhs, lhs_field, rhs_field, out)
+    func.__name__ = name
+    func.__doc__ = docstring
+    return func
+
+def _register_binary_message_funcs():
+    for lhs in ['u', 'v', 'e']:
+        for rhs in ['u', 'v', 'e']:
+            if lhs == rhs:
+                continue
+            for op in _BINARY_OPS:
+                func = _gen_binary_message_func(lhs, op, rhs)
+                globals()[func.__name__] = func
+                __all__.append(func.__name__)
+
+_register_binary_message_funcs()
@@ -4,7 +4,7 @@ from __future__ import absolute_import
 from .. import backend as F
 from .base import BuiltinFunction
 
-__all__ = ["sum", "max"]
+__all__ = ["sum", "max", "min", "mean", "prod"]
 
 class ReduceFunction(BuiltinFunction):
     """Base builtin reduce function class."""
@@ -25,6 +25,11 @@ class ReduceFunction(BuiltinFunction):
         """Return whether the SPMV optimization is supported."""
         raise NotImplementedError
 
+    def is_segment_supported(self):
+        """Return whether the messages can be reduced by segment reduction
+        instead of degree bucketing."""
+        raise NotImplementedError
+
 
 class SimpleReduceFunction(ReduceFunction):
     """Builtin reduce function that aggregates a single field into another
@@ -39,6 +44,12 @@ class SimpleReduceFunction(ReduceFunction):
         # NOTE: only sum is supported right now.
         return self._name == "sum"
 
+    def is_segment_supported(self):
+        # the backend may lack some segment reductions, e.g. max on old
+        # PyTorch; these reducers fall back to degree bucketing
+        return (self._name in ("sum", "max", "min", "mean", "prod")
+                and F.is_enabled("unsorted_1d_segment_" + self._name))
+
     def __call__(self, nodes):
         return {self.out_field : self.op(nodes.mailbox[self.msg_field], 1)}
 
@@ -89,6 +100,88 @@ def max(msg, out):
 
     >>> import torch
     >>> def reduce_func(nodes):
-    >>>     return {'h': torch.max(nodes.mailbox['m'], dim=1)}
+    >>>     return {'h': torch.max(nodes.mailbox['m'], dim=1)[0]}
+
+    The messages are reduced by a segment max, without degree bucketing. The
+    gradient only flows to the first message that attains the maximum.
     """
     return SimpleReduceFunction("max", F.max, msg, out)
+
+def min(msg, out):
+    """Builtin reduce function that aggregates messages by min.
+
+    Parameters
+    ----------
+    msg : str
+        The message field.
+    out : str
+        The output node feature field.
+
+    Examples
+    --------
+    >>> import dgl
+    >>> reduce_func = dgl.function.min(msg='m', out='h')
+
+    The above example is equivalent to the following user defined function
+    (if using PyTorch):
+
+    >>> import torch
+    >>> def reduce_func(nodes):
+    >>>     return {'h': torch.min(nodes.mailbox['m'], dim=1)[0]}
+
+    The messages are reduced by a segment min, without degree bucketing. The
+    gradient only flows to the first message that attains the minimum.
+    """
+    return SimpleReduceFunction("min", F.min, msg, out)
+
+def mean(msg, out):
+    """Builtin reduce function that aggregates messages by mean.
+
+    Parameters
+    ----------
+    msg : str
+        The message field.
+    out : str
+        The output node feature field.
+
+    Examples
+    --------
+    >>> import dgl
+    >>> reduce_func = dgl.function.mean(msg='m', out='h')
+
+    The above example is equivalent to the following user defined function
+    (if using PyTorch):
+
+    >>> import torch
+    >>> def reduce_func(nodes):
+    >>>     return {'h': torch.mean(nodes.mailbox['m'], dim=1)}
+
+    The messages are reduced by a segment mean, without degree bucketing.
+    """
+    return SimpleReduceFunction("mean", F.mean, msg, out)
+
+def prod(msg, out):
+    """Builtin reduce function that aggregates messages by product.
+
+    Parameters
+    ----------
+    msg : str
+        The message field.
+    out : str
+        The output node feature field.
+
+    Examples
+    --------
+    >>> import dgl
+    >>> reduce_func = dgl.function.prod(msg='m', out='h')
+
+    The above example is equivalent to the following user defined function
+    (if using PyTorch):
+
+    >>> import torch
+    >>> def reduce_func(nodes):
+    >>>     return {'h': torch.prod(nodes.mailbox['m'], dim=1)}
+
+    The messages are reduced by a segment product, without degree bucketing.
+    """
+    return SimpleReduceFunction("prod", F.prod, msg, out)
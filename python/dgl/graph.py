@@ -8,16 +8,28 @@ from collections import defaultdict
 import dgl
 from .base import ALL, is_all, DGLError, dgl_warning
 from . import backend as F
-from .frame import FrameRef, Frame
+from .frame import FrameRef, Frame, Column
 from .graph_index import GraphIndex, create_graph_index
 from .runtime import ir, scheduler, Runtime
 from . import utils
 from .view import NodeView, EdgeView
+from .message_store import MessageStore
 from .udf import NodeBatch, EdgeBatch
 
 
 __all__ = ['DGLGraph']
 
+def _filter_blocks(filter_block, num, block_size, num_workers):
+    """Concatenate the id tensors of the blocks of a filter."""
+    blocks = utils.map_blocks(filter_block, num, block_size, num_workers)
+    if len(blocks) == 0:
+        # the predicate is not called on an empty set, so there is no device
+        # to follow
+        return F.zeros((0,), F.int64, F.cpu())
+    elif len(blocks) == 1:
+        return blocks[0]
+    return F.cat(blocks, 0)
+
 class DGLGraph(object):
     """Base graph class.
 
@@ -48,6 +60,11 @@ class DGLGraph(object):
         Whether the graph would be a multigraph (default: False)
     readonly : bool, optional
         Whether the graph structure is read-only (default: False).
+    index_dtype : str, optional
+        Data type of the ids stored in the graph structure, ``'int32'`` or
+        ``'int64'`` (default: ``'int64'``). An ``'int32'`` graph takes half
+        the memory and switches to int64 when it outgrows 2^31 - 1 nodes or
+        edges. Node and edge ids are int64 in the API either way.
 
     Examples
     --------
@@ -175,10 +192,12 @@ class DGLGraph(object):
                  node_frame=None,
                  edge_frame=None,
                  multigraph=False,
-                 readonly=False):
+                 readonly=False,
+                 index_dtype='int64'):
         # graph
         self._readonly=readonly
-        self._graph = create_graph_index(graph_data, multigraph, readonly)
+        self._graph = create_graph_index(graph_data, multigraph, readonly,
+                                         index_dtype)
         # frame
         if node_frame is None:
             self._node_frame = FrameRef(Frame(num_rows=self.number_of_nodes()))
@@ -188,10 +207,8 @@ class DGLGraph(object):
             self._edge_frame = FrameRef(Frame(num_rows=self.number_of_edges()))
         else:
             self._edge_frame = edge_frame
-        # msg graph & frame
-        self._msg_graph = create_graph_index(multigraph=multigraph)
-        self._msg_frame = FrameRef()
-        self.reset_messages()
+        # pending messages
+        self._msg_store = MessageStore()
         # registered functions
         self._message_func = None
         self._reduce_func = None
@@ -243,7 +260,6 @@ class DGLGraph(object):
                 [1., 1., 1., 1.]])
         """
         self._graph.add_nodes(num)
-        self._msg_graph.add_nodes(num)
         if data is None:
             # Initialize feature placeholders if there are features existing
             self._node_frame.add_rows(num)
@@ -382,14 +398,41 @@ class DGLGraph(object):
         self._graph.clear()
         self._node_frame.clear()
         self._edge_frame.clear()
-        self._msg_graph.clear()
-        self._msg_frame.clear()
+        self._msg_store.clear()
 
     def reset_messages(self):
         """Clear all messages."""
-        self._msg_graph.clear()
-        self._msg_frame.clear()
-        self._msg_graph.add_nodes(self.number_of_nodes())
+        self._msg_store.clear()
+
+    def share_memory(self):
+        """Move the graph structure and the node/edge features to shared
+        memory so that pickling the graph only pickles shared memory handles.
+
+        This is useful to send graphs between processes, e.g. returning
+        batched graphs from the workers of a data loader. The receiving
+        process reads the structure and the features directly from the shared
+        memory. Structure and features changed after this call are pickled as
+        usual. Features are detached from the autograd graph, and only CPU
+        features are moved.
+
+        Examples
+        --------
+        In the collate function of a data loader worker:
+
+        >>> bg = dgl.batch(graphs)
+        >>> bg.share_memory()
+        >>> return bg
+
+        Returns
+        -------
+        DGLGraph
+            This graph.
+        """
+        if isinstance(self._graph, GraphIndex):
+            self._graph.share_memory()
+        self._node_frame.share_memory()
+        self._edge_frame.share_memory()
+        return self
 
     def number_of_nodes(self):
         """Return the number of nodes in the graph.
@@ -1012,7 +1055,9 @@ class DGLGraph(object):
             v  = utils.toindex(slice(0, self.number_of_nodes()))
         else:
             v = utils.toindex(v)
-        return self._graph.in_degrees(v).tousertensor()
+        # copy, so the degrees cached on the graph cannot be modified by
+        # the caller
+        return F.tensor(self._graph.in_degrees(v).tonumpy())
 
     def out_degree(self, v):
         """Return the out-degree of node `v`.
@@ -1074,7 +1119,91 @@ class DGLGraph(object):
             v  = utils.toindex(slice(0, self.number_of_nodes()))
         else:
             v = utils.toindex(v)
-        return self._graph.out_degrees(v).tousertensor()
+        # copy, so the degrees cached on the graph cannot be modified by
+        # the caller
+        return F.tensor(self._graph.out_degrees(v).tonumpy())
+
+    def degree_norm(self, norm='both', ctx=F.cpu()):
+        """Return the degree normalizers of the nodes.
+
+        The message along edge ``(u, v)`` of a normalized graph convolution
+        is scaled by ``src_norm[u] * dst_norm[v]``. The normalizers are
+        computed once from the cached degrees and kept until the graph is
+        mutated. Nodes of zero degree get zero normalizers.
+
+        Parameters
+        ----------
+        norm : str, optional
+            ``'right'`` divides by the in-degree of the destination,
+            ``'left'`` by the out-degree of the source, and ``'both'`` (the
+            default) by the square roots of both, as in GCN.
+        ctx : context, optional (default=cpu)
+            The context of the returned tensors.
+
+        Returns
+        -------
+        src_norm : tensor
+            The float32 normalizer of each node as a source.
+        dst_norm : tensor
+            The float32 normalizer of each node as a destination.
+
+        Examples
+        --------
+        The following example uses PyTorch backend.
+
+        >>> G = dgl.DGLGraph()
+        >>> G.add_nodes(3)
+        >>> G.add_edges([0, 0, 1], [1, 2, 2])
+        >>> G.degree_norm('right')
+        (tensor([1., 1., 1.]), tensor([0.0000, 1.0000, 0.5000]))
+
+        See Also
+        --------
+        dgl.function.copy_src_norm
+        """
+        # copy, so the cached normalizers cannot be modified by the caller
+        src_norm, dst_norm = self._graph.degree_norm(norm)
+        return (utils.copy_to(F.tensor(src_norm), ctx, 'degree_norm'),
+                utils.copy_to(F.tensor(dst_norm), ctx, 'degree_norm'))
+
+    def typed_in_degrees(self, etype):
+        """Return, for each edge, the number of in-edges of its destination
+        that have the same type.
+
+        This is the per-relation in-degree :math:`|N_v^r|` used to normalize
+        relational graph convolutions.
+
+        Parameters
+        ----------
+        etype : tensor
+            The integer type of each edge, in the order of the edge ids.
+
+        Returns
+        -------
+        tensor
+            The per-relation in-degree of the destination of each edge.
+
+        Examples
+        --------
+        The following example uses PyTorch backend.
+
+        >>> G = dgl.DGLGraph()
+        >>> G.add_nodes(3)
+        >>> G.add_edges([0, 1, 2], [2, 2, 2])
+        >>> G.typed_in_degrees(torch.tensor([0, 1, 0]))
+        tensor([2, 1, 2])
+        """
+        _, dst, _ = self._graph.edges()
+        dst = dst.tonumpy()
+        etype = F.asnumpy(etype).astype(np.int64)
+        if len(etype) != len(dst):
+            raise DGLError('Expect one type per edge, got %d types for %d edges.'
+                           % (len(etype), len(dst)))
+        # count the (destination, type) pairs
+        key = dst * (etype.max() + 1 if len(etype) > 0 else 1) + etype
+        _, inverse, counts = np.unique(key, return_inverse=True,
+                                       return_counts=True)
+        return utils.toindex(counts[inverse]).tousertensor()
 
     def to_networkx(self, node_attrs=None, edge_attrs=None):
         """Convert to networkx graph.
@@ -1159,7 +1288,6 @@ class DGLGraph(object):
         self._graph.from_networkx(nx_graph)
         self._node_frame.add_rows(self.number_of_nodes())
         self._edge_frame.add_rows(self.number_of_edges())
-        self._msg_graph.add_nodes(self._graph.number_of_nodes())
         # copy attributes
         def _batcher(lst):
             if F.is_tensor(lst[0]):
@@ -1210,7 +1338,6 @@ class DGLGraph(object):
         self._graph.from_scipy_sparse_matrix(a)
         self._node_frame.add_rows(self.number_of_nodes())
         self._edge_frame.add_rows(self.number_of_edges())
-        self._msg_graph.add_nodes(self._graph.number_of_nodes())
 
     def node_attr_schemes(self):
         """Return the node feature schemes.
@@ -1511,7 +1638,7 @@ class DGLGraph(object):
             u = utils.toindex(u)
             num_nodes = len(u)
         for key, val in hu.items():
-            nfeats = F.shape(val)[0]
+            nfeats = len(val) if isinstance(val, Column) else F.shape(val)[0]
             if nfeats != num_nodes:
                 raise DGLError('Expect number of features to match number of nodes (len(u)).'
                                ' Got %d and %d instead.' % (nfeats, num_nodes))
@@ -1603,7 +1730,7 @@ class DGLGraph(object):
             eid = utils.toindex(eid)
             num_edges = len(eid)
         for key, val in he.items():
-            nfeats = F.shape(val)[0]
+            nfeats = len(val) if isinstance(val, Column) else F.shape(val)[0]
             if nfeats != num_edges:
                 raise DGLError('Expect number of features to match number of edges.'
                                ' Got %d and %d instead.' % (nfeats, num_edges))
@@ -1919,8 +2046,7 @@ class DGLGraph(object):
             message_func = self._message_func
 
         if is_all(edges):
-            eid = ALL
-            u, v, _ = self._graph.edges()
+            u, v, eid = self._graph.edges()
         elif isinstance(edges, tuple):
             u, v = edges
             u = utils.toindex(u)
@@ -1936,8 +2062,8 @@ class DGLGraph(object):
                                     message_func=message_func)
             Runtime.run(prog)
 
-        # update message graph and frame
-        self._msg_graph.add_edges(u, v)
+        # register the messages appended to the message frame
+        self._msg_store.add(eid, v, self.number_of_edges())
 
     def recv(self,
              v=ALL,
@@ -1956,7 +2082,8 @@ class DGLGraph(object):
 
         The node features will be updated by the result of the ``reduce_func``.
 
-        Messages are consumed once received.
+        Messages are consumed once received. Messages to nodes other than ``v``
+        stay pending until they are received.
 
         The provided UDF maybe called multiple times so it is recommended to provide
         function with no side effect.
@@ -2024,8 +2151,8 @@ class DGLGraph(object):
             apply_node_func = self._apply_node_func
         assert reduce_func is not None
 
-        if self._msg_frame.num_rows == 0:
-            # no message has ever been sent
+        if len(self._msg_store) == 0:
+            # no pending message
             return
 
         if is_all(v):
@@ -2045,8 +2172,7 @@ class DGLGraph(object):
                                     inplace=inplace)
             Runtime.run(prog)
 
-        # FIXME(minjie): multi send bug
-        self.reset_messages()
+        self._msg_store.consume(v, self.number_of_nodes())
 
     def send_and_recv(self,
                       edges,
@@ -2757,19 +2883,28 @@ class DGLGraph(object):
 
         shared : bool, optional
             Whether the returned line graph shares representations with `self`.
+            If True, the node frame of the line graph is the edge frame of
+            this graph, so the edge features are neither copied nor need to be
+            set again on the line graph.
 
         Returns
         -------
         DGLGraph
-            The line graph of this graph.
+            The line graph of this graph. Node i of the line graph is edge i
+            of this graph.
         """
         graph_data = self._graph.line_graph(backtracking)
         node_frame = self._edge_frame if shared else None
         return DGLGraph(graph_data, node_frame)
 
-    def filter_nodes(self, predicate, nodes=ALL):
+    def filter_nodes(self, predicate, nodes=ALL, block_size=None,
+                     num_workers=0):
         """Return a tensor of node IDs that satisfy the given predicate.
 
+        The predicate can be evaluated on blocks of at most ``block_size``
+        nodes, and only the node features it reads are gathered for each
+        block.
+
         Parameters
         ----------
         predicate : callable
@@ -2780,6 +2915,15 @@ class DGLGraph(object):
             the batch satisfies the predicate.
         nodes : int, iterable or tensor of ints
             The nodes to filter on. Default value is all the nodes.
+        block_size : int or None, optional
+            Maximum number of nodes the predicate is called on at a time.
+            All the nodes are given in one batch if None (default). Only set
+            it if the predicate does not depend on the other nodes of the
+            batch, e.g. through ``x > x.mean()``.
+        num_workers : int, optional
+            Number of threads to evaluate the blocks with (default: 0, i.e.
+            in the calling thread). Only useful if the predicate releases
+            the GIL, as most tensor operations do.
 
         Returns
         -------
@@ -2813,23 +2957,32 @@ class DGLGraph(object):
         filter_edges
         """
         if is_all(nodes):
-            v = utils.toindex(slice(0, self.number_of_nodes()))
+            num = self.number_of_nodes()
         else:
-            v = utils.toindex(nodes)
+            v_all = utils.toindex(nodes).tousertensor()
+            num = len(v_all)
 
-        n_repr = self.get_n_repr(v)
-        nb = NodeBatch(self, v, n_repr)
-        n_mask = predicate(nb)
+        def _filter_block(start, stop):
+            if is_all(nodes):
+                v = utils.toindex(slice(start, stop))
+                rows = slice(start, stop)
+            else:
+                v = rows = utils.toindex(F.narrow_row(v_all, start, stop))
+            nb = NodeBatch(self, v, self._node_frame.select_rows(rows))
+            mask = predicate(nb)
+            return F.gather_row(v.tousertensor(F.context(mask)),
+                                F.nonzero_1d(mask))
 
-        if is_all(nodes):
-            return F.nonzero_1d(n_mask)
-        else:
-            nodes = F.tensor(nodes)
-            return nodes[n_mask]
+        return _filter_blocks(_filter_block, num, block_size, num_workers)
 
-    def filter_edges(self, predicate, edges=ALL):
+    def filter_edges(self, predicate, edges=ALL, block_size=None,
+                     num_workers=0):
         """Return a tensor of edge IDs that satisfy the given predicate.
 
+        The predicate can be evaluated on blocks of at most ``block_size``
+        edges, and only the source, edge and destination features it reads
+        are gathered for each block.
+
         Parameters
         ----------
         predicate : callable
@@ -2841,6 +2994,14 @@ class DGLGraph(object):
         edges : valid edges type
             Edges on which to apply ``func``. See :func:`send` for valid
             edges type. Default value is all the edges.
+        block_size : int or None, optional
+            Maximum number of edges the predicate is called on at a time.
+            All the edges are given in one batch if None (default). Only set
+            it if the predicate does not depend on the other edges of the
+            batch, e.g. through ``x > x.mean()``.
+        num_workers : int, optional
+            Number of threads to evaluate the blocks with (default: 0, i.e.
+            in the calling thread).
 
         Returns
         -------
@@ -2876,28 +3037,34 @@ class DGLGraph(object):
         filter_nodes
         """
         if is_all(edges):
-            eid = ALL
-            u, v, _ = self._graph.edges()
-        elif isinstance(edges, tuple):
-            u, v = edges
-            u = utils.toindex(u)
-            v = utils.toindex(v)
-            # Rewrite u, v to handle edge broadcasting and multigraph.
-            u, v, eid = self._graph.edge_ids(u, v)
+            num = self.number_of_edges()
         else:
-            eid = utils.toindex(edges)
+            if isinstance(edges, tuple):
+                u, v = edges
+                u = utils.toindex(u)
+                v = utils.toindex(v)
+                # Rewrite u, v to handle edge broadcasting and multigraph.
+                _, _, eid_all = self._graph.edge_ids(u, v)
+            else:
+                eid_all = utils.toindex(edges)
+            eid_all = eid_all.tousertensor()
+            num = len(eid_all)
+
+        def _filter_block(start, stop):
+            if is_all(edges):
+                # the endpoints are looked up per block instead of
+                # materializing the whole edge list
+                eid = utils.toindex(slice(start, stop))
+                rows = slice(start, stop)
+            else:
+                eid = rows = utils.toindex(F.narrow_row(eid_all, start, stop))
             u, v, _ = self._graph.find_edges(eid)
-
-        src_data = self.get_n_repr(u)
-        edge_data = self.get_e_repr(eid)
-        dst_data = self.get_n_repr(v)
-        eb = EdgeBatch(self, (u, v, eid),
-                src_data, edge_data, dst_data)
-
-        e_mask = predicate(eb)
-
-        if is_all(edges):
-            return F.nonzero_1d(e_mask)
-        else:
-            edges = F.tensor(edges)
-            return edges[e_mask]
+            eb = EdgeBatch(self, (u, v, eid),
+                           self._node_frame.select_rows(u),
+                           self._edge_frame.select_rows(rows),
+                           self._node_frame.select_rows(v))
+            mask = predicate(eb)
+            return F.gather_row(eid.tousertensor(F.context(mask)),
+                                F.nonzero_1d(mask))
+
+        return _filter_blocks(_filter_block, num, block_size, num_workers)
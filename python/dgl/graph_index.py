@@ -10,6 +10,7 @@ from ._ffi.function import _init_api
 from .base import DGLError, is_all
 from . import backend as F
 from . import utils
+from .shared_memory import SharedArray
 from .immutable_graph_index import create_immutable_graph_index
 
 GraphIndexHandle = ctypes.c_void_p
@@ -84,6 +85,20 @@ class GraphIndex(object):
         """
         return bool(_CAPI_DGLGraphIsMultigraph(self._handle))
 
+    def index_dtype(self):
+        """Return the data type the graph structure stores ids in.
+
+        A graph created with ``index_dtype='int32'`` becomes an int64 one once
+        it has more than 2^31 - 1 nodes or edges. Ids returned by the graph
+        index are int64 regardless.
+
+        Returns
+        -------
+        str
+            Either ``'int32'`` or ``'int64'``.
+        """
+        return 'int%d' % _CAPI_DGLGraphIdBits(self._handle)
+
     def is_readonly(self):
         """Indicate whether the graph index is read-only.
 
@@ -395,6 +410,12 @@ class GraphIndex(object):
         int
             The in degree array.
         """
+        if v.is_slice(0, self.number_of_nodes()):
+            # the degrees of all the nodes are cached until the next mutation
+            if 'in_deg' not in self._cache:
+                self._cache['in_deg'] = utils.toindex(
+                    _CAPI_DGLGraphInDegrees(self._handle, v.todgltensor()))
+            return self._cache['in_deg']
         v_array = v.todgltensor()
         return utils.toindex(_CAPI_DGLGraphInDegrees(self._handle, v_array))
 
@@ -426,9 +447,39 @@ class GraphIndex(object):
         int
             The out degree array.
         """
+        if v.is_slice(0, self.number_of_nodes()):
+            if 'out_deg' not in self._cache:
+                self._cache['out_deg'] = utils.toindex(
+                    _CAPI_DGLGraphOutDegrees(self._handle, v.todgltensor()))
+            return self._cache['out_deg']
         v_array = v.todgltensor()
         return utils.toindex(_CAPI_DGLGraphOutDegrees(self._handle, v_array))
 
+    def degree_norm(self, norm):
+        """Return the degree normalizers of the nodes.
+
+        The result is cached until the next mutation.
+
+        Parameters
+        ----------
+        norm : str
+            The normalization, one of ``'right'``, ``'left'`` and ``'both'``.
+            See ``utils.degree_norm``.
+
+        Returns
+        -------
+        numpy.ndarray
+            The normalizer of each node as a source.
+        numpy.ndarray
+            The normalizer of each node as a destination.
+        """
+        key = 'degree_norm_' + norm
+        if key not in self._cache:
+            all_nodes = utils.toindex(slice(0, self.number_of_nodes()))
+            self._cache[key] = utils.degree_norm(
+                self.in_degrees(all_nodes), self.out_degrees(all_nodes), norm)
+        return self._cache[key]
+
     def node_subgraph(self, v):
         """Return the induced node subgraph.
 
@@ -714,22 +765,46 @@ class GraphIndex(object):
         handle = _CAPI_DGLGraphLineGraph(self._handle, backtracking)
         return GraphIndex(handle)
 
+    def share_memory(self):
+        """Move the edge list to shared memory for pickling.
+
+        Until the graph is mutated, pickling it only pickles the handles of
+        the shared memory blocks instead of the edges. See
+        :mod:`dgl.shared_memory`.
+        """
+        if 'shared' not in self._cache:
+            src, dst, _ = self.edges()
+            self._cache['shared'] = (SharedArray(src.tonumpy()),
+                                     SharedArray(dst.tonumpy()))
+
     def __getstate__(self):
-        src, dst, _ = self.edges()
         n_nodes = self.number_of_nodes()
         multigraph = self.is_multigraph()
+        if 'shared' in self._cache:
+            src, dst = self._cache['shared']
+        else:
+            src, dst, _ = self.edges()
 
-        return n_nodes, multigraph, src, dst
+        return n_nodes, multigraph, src, dst, self.index_dtype()
 
     def __setstate__(self, state):
-        """The pickle state of GraphIndex is defined as a triplet
-        (number_of_nodes, multigraph, src_nodes, dst_nodes)
+        """The pickle state of GraphIndex is defined as a tuple
+        (number_of_nodes, multigraph, src_nodes, dst_nodes, index_dtype)
+
+        The nodes are either utils.Index or SharedArray. States pickled
+        without the index dtype are int64 graphs.
         """
-        n_nodes, multigraph, src, dst = state
+        n_nodes, multigraph, src, dst = state[:4]
+        index_dtype = state[4] if len(state) > 4 else 'int64'
 
-        self._handle = _CAPI_DGLGraphCreate(multigraph)
+        self._handle = _CAPI_DGLGraphCreate(multigraph, _id_bits(index_dtype))
         self._cache = {}
 
+        if isinstance(src, SharedArray):
+            # the edges are read directly from the shared memory
+            src = utils.toindex(src.array)
+            dst = utils.toindex(dst.array)
+
         self.clear()
         self.add_nodes(n_nodes)
         self.add_edges(src, dst)
@@ -873,7 +948,18 @@ def disjoint_partition(graph, num_or_size_splits):
         graphs.append(GraphIndex(handle))
     return graphs
 
-def create_graph_index(graph_data=None, multigraph=False, readonly=False):
+def _id_bits(index_dtype):
+    """Return the number of bits of the given index dtype."""
+    if index_dtype == 'int32':
+        return 32
+    elif index_dtype == 'int64':
+        return 64
+    else:
+        raise DGLError('Index dtype must be int32 or int64, but got: %s'
+                       % str(index_dtype))
+
+def create_graph_index(graph_data=None, multigraph=False, readonly=False,
+                       index_dtype='int64'):
     """Create a graph index object.
 
     Parameters
@@ -882,7 +968,16 @@ def create_graph_index(graph_data=None, multigraph=False, readonly=False):
         Data to initialize graph. Same as networkx's semantics.
     multigraph : bool, optional
         Whether the graph is multigraph (default is False)
+    readonly : bool, optional
+        Whether to create an immutable graph index if possible.
+    index_dtype : str, optional
+        Data type of the ids stored in the graph structure, ``'int32'`` or
+        ``'int64'`` (default). ``'int32'`` halves the memory of the structure
+        of graphs with less than 2^31 nodes and edges; the graph switches to
+        int64 automatically when it grows beyond that. Ignored by immutable
+        graph indices.
     """
+    id_bits = _id_bits(index_dtype)
     if isinstance(graph_data, GraphIndex):
         return graph_data
 
@@ -895,7 +990,7 @@ def create_graph_index(graph_data=None, multigraph=False, readonly=False):
         if gi is not None:
             return gi
 
-    handle = _CAPI_DGLGraphCreate(multigraph)
+    handle = _CAPI_DGLGraphCreate(multigraph, id_bits)
     gi = GraphIndex(handle)
 
     if graph_data is None:
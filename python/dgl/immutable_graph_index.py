@@ -74,6 +74,16 @@ class ImmutableGraphIndex(object):
         # Immutable graph doesn't support multi-edge.
         return False
 
+    def index_dtype(self):
+        """Return the data type the graph structure stores ids in.
+
+        Returns
+        -------
+        str
+            Always ``'int64'``.
+        """
+        return 'int64'
+
     def is_readonly(self):
         """Indicate whether the graph index is read-only.
 
@@ -426,6 +436,29 @@ class ImmutableGraphIndex(object):
             v_array = v.tousertensor()
             return utils.toindex(F.gather_row(deg, v_array))
 
+    def degree_norm(self, norm):
+        """Return the degree normalizers of the nodes.
+
+        Parameters
+        ----------
+        norm : str
+            The normalization, one of ``'right'``, ``'left'`` and ``'both'``.
+            See ``utils.degree_norm``.
+
+        Returns
+        -------
+        numpy.ndarray
+            The normalizer of each node as a source.
+        numpy.ndarray
+            The normalizer of each node as a destination.
+        """
+        key = 'degree_norm_' + norm
+        if key not in self._cache:
+            all_nodes = utils.toindex(slice(0, self.number_of_nodes()))
+            self._cache[key] = utils.degree_norm(
+                self.in_degrees(all_nodes), self.out_degrees(all_nodes), norm)
+        return self._cache[key]
+
     def node_subgraph(self, v):
         """Return the induced node subgraph.
 
@@ -0,0 +1,163 @@
+"""Store of the messages that are sent but not yet received."""
+from __future__ import absolute_import
+
+import numpy as np
+
+from .frame import Frame, FrameRef
+from . import utils
+
+__all__ = ['MessageStore']
+
+class MessageStore(object):
+    """Messages sent along edges and not yet received.
+
+    The message features are the rows of :attr:`frame`. The store keeps the
+    edge id and the destination of every row in flat arrays, plus an index
+    of the pending rows grouped by destination that is rebuilt lazily after
+    each change.
+
+    Each edge has at most one pending message: sending along an edge again
+    replaces its message (the last writer wins). Receiving consumes the
+    messages of the receiving nodes only. Rows of replaced or consumed
+    messages are dropped once they outnumber the pending ones, so the frame
+    does not grow in a send/recv loop.
+
+    Attributes
+    ----------
+    frame : FrameRef
+        The message features.
+    """
+    def __init__(self):
+        self.frame = FrameRef()
+        # edge id of each row; -1 if the message was replaced or consumed
+        self._row_eid = np.zeros((0,), dtype=np.int64)
+        # destination node of each row
+        self._row_dst = np.zeros((0,), dtype=np.int64)
+        # pending row of each edge; -1 if none
+        self._edge_row = np.zeros((0,), dtype=np.int64)
+        self._num_pending = 0
+        # (number of nodes, indptr, pending rows sorted by destination)
+        self._dst_index = None
+
+    def __len__(self):
+        """Return the number of pending messages."""
+        return self._num_pending
+
+    def clear(self):
+        """Drop all the messages."""
+        self.frame.clear()
+        self._row_eid = np.zeros((0,), dtype=np.int64)
+        self._row_dst = np.zeros((0,), dtype=np.int64)
+        self._edge_row = np.zeros((0,), dtype=np.int64)
+        self._num_pending = 0
+        self._dst_index = None
+
+    def add(self, eid, dst, num_edges):
+        """Register the messages just appended to the frame.
+
+        Parameters
+        ----------
+        eid : utils.Index
+            The edge id of each appended row.
+        dst : utils.Index
+            The destination node of each appended row.
+        num_edges : int
+            The number of edges of the graph.
+        """
+        eid = eid.tonumpy()
+        dst = dst.tonumpy()
+        num_msgs = len(eid)
+        rows = np.arange(len(self._row_eid), len(self._row_eid) + num_msgs)
+        if len(self._edge_row) < num_edges:
+            self._edge_row = np.concatenate([
+                self._edge_row,
+                np.full((num_edges - len(self._edge_row),), -1, dtype=np.int64)])
+        # the last message of each edge in this batch wins
+        uniq, pos = np.unique(eid[::-1], return_index=True)
+        last = num_msgs - 1 - pos
+        row_eid = np.full((num_msgs,), -1, dtype=np.int64)
+        row_eid[last] = uniq
+        # replace the earlier messages of the edges
+        old = self._edge_row[uniq]
+        old = old[old >= 0]
+        self._row_eid[old] = -1
+        self._edge_row[uniq] = rows[last]
+        self._row_eid = np.concatenate([self._row_eid, row_eid])
+        self._row_dst = np.concatenate([self._row_dst, dst])
+        self._num_pending += len(uniq) - len(old)
+        self._dst_index = None
+        self._maybe_compact()
+
+    def in_messages(self, nodes, num_nodes):
+        """Return the pending messages to the given nodes.
+
+        Parameters
+        ----------
+        nodes : utils.Index
+            The destination nodes. Duplicates are ignored.
+        num_nodes : int
+            The number of nodes of the graph.
+
+        Returns
+        -------
+        utils.Index
+            The edge id of each message.
+        utils.Index
+            The destination node of each message.
+        utils.Index
+            The row of each message in :attr:`frame`.
+        """
+        if self._dst_index is None or self._dst_index[0] != num_nodes:
+            pending = np.nonzero(self._row_eid >= 0)[0]
+            dst = self._row_dst[pending]
+            indptr = np.zeros((num_nodes + 1,), dtype=np.int64)
+            np.cumsum(np.bincount(dst, minlength=num_nodes), out=indptr[1:])
+            self._dst_index = (num_nodes, indptr,
+                               pending[np.argsort(dst, kind='stable')])
+        _, indptr, sorted_rows = self._dst_index
+        nodes = np.unique(nodes.tonumpy())
+        start = indptr[nodes]
+        count = indptr[nodes + 1] - start
+        # concatenate the ranges [start, start + count) of all the nodes
+        shift = np.repeat(start - (np.cumsum(count) - count), count)
+        mid = sorted_rows[np.arange(count.sum()) + shift]
+        return (utils.toindex(self._row_eid[mid]),
+                utils.toindex(self._row_dst[mid]),
+                utils.toindex(mid))
+
+    def consume(self, nodes, num_nodes):
+        """Drop the pending messages to the given nodes.
+
+        Parameters
+        ----------
+        nodes : utils.Index
+            The destination nodes.
+        num_nodes : int
+            The number of nodes of the graph.
+        """
+        if self._num_pending == 0:
+            return
+        _, _, mid = self.in_messages(nodes, num_nodes)
+        mid = mid.tonumpy()
+        self._edge_row[self._row_eid[mid]] = -1
+        self._row_eid[mid] = -1
+        self._num_pending -= len(mid)
+        self._dst_index = None
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        """Drop the rows of replaced and consumed messages if they are the
+        majority."""
+        if self._num_pending == 0:
+            self.frame.clear()
+            self._row_eid = np.zeros((0,), dtype=np.int64)
+            self._row_dst = np.zeros((0,), dtype=np.int64)
+            self._dst_index = None
+        elif len(self._row_eid) > 2 * self._num_pending:
+            pending = np.nonzero(self._row_eid >= 0)[0]
+            self.frame = FrameRef(Frame(
+                self.frame.select_rows(utils.toindex(pending))))
+            self._row_eid = self._row_eid[pending]
+            self._row_dst = self._row_dst[pending]
+            self._edge_row[self._row_eid] = np.arange(len(pending))
+            self._dst_index = None
@@ -1 +1,2 @@
 from .gcn import GraphConvolutionLayer
+from .softmax import EdgeSoftmax, edge_softmax
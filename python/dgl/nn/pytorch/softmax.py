@@ -0,0 +1,86 @@
+"""Softmax over the incoming edges of each node."""
+import torch as th
+
+from ...base import DGLError
+
+__all__ = ['EdgeSoftmax', 'edge_softmax']
+
+def _segment_index(dst, score):
+    # broadcast the destination of each edge to the shape of the scores
+    return dst.view((-1,) + (1,) * (score.dim() - 1)).expand_as(score)
+
+class EdgeSoftmax(th.autograd.Function):
+    """Autograd function of :func:`edge_softmax`.
+
+    The forward pass subtracts the maximum score over the in-edges of each
+    destination before the exponentiation, so large scores do not overflow.
+    Only the result is saved for the backward pass, which computes
+    ``out * (grad - sum(grad * out))`` with the sum over the same in-edges.
+    """
+    @staticmethod
+    def forward(ctx, score, dst, num_nodes):
+        idx = _segment_index(dst, score)
+        shape = (num_nodes,) + tuple(score.shape[1:])
+        smax = score.new_full(shape, -float('inf')).scatter_reduce_(
+            0, idx, score, 'amax', include_self=False)
+        out = th.exp(score - smax.gather(0, idx))
+        ssum = score.new_zeros(shape).scatter_add_(0, idx, out)
+        out = out / ssum.gather(0, idx)
+        ctx.num_nodes = num_nodes
+        ctx.save_for_backward(out, dst)
+        return out
+
+    @staticmethod
+    def backward(ctx, grad_out):
+        out, dst = ctx.saved_tensors
+        idx = _segment_index(dst, out)
+        shape = (ctx.num_nodes,) + tuple(out.shape[1:])
+        sds = out * grad_out
+        accum = out.new_zeros(shape).scatter_add_(0, idx, sds)
+        grad_score = sds - out * accum.gather(0, idx)
+        return grad_score, None, None
+
+def edge_softmax(graph, score):
+    """Normalize the edge scores by a softmax over the in-edges of each node.
+
+    For an edge :math:`(u, v)`, the result is
+
+    .. math::
+        \\frac{\\exp(s_{uv})}{\\sum_{w \\in N(v)} \\exp(s_{wv})}
+
+    computed with segment max and sum operations grouped by the destination
+    node, instead of per-bucket reduce functions. Each column of the scores
+    (e.g. each attention head) is normalized independently. The result can
+    be stored as an edge feature and used by builtin message functions such
+    as ``fn.src_mul_edge``, so that attention is computed with SPMV.
+
+    Parameters
+    ----------
+    graph : DGLGraph
+        The graph.
+    score : Tensor
+        The score of each edge, in the order of the edge ids. The shape is
+        ``(E,)`` or ``(E, *)``.
+
+    Returns
+    -------
+    Tensor
+        The normalized scores, of the same shape as ``score``.
+
+    Examples
+    --------
+    >>> g.edata['a'] = edge_softmax(g, g.edata['s'])
+    >>> g.update_all(fn.src_mul_edge(src='h', edge='a', out='m'),
+    ...              fn.sum(msg='m', out='h'))
+
+    Notes
+    -----
+    The segment max needs ``Tensor.scatter_reduce_``, which is available
+    from PyTorch 1.12.
+    """
+    if not hasattr(th.Tensor, 'scatter_reduce_'):
+        raise DGLError('edge_softmax requires PyTorch 1.12 or later'
+                       ' (Tensor.scatter_reduce_), but got %s.' % th.__version__)
+    _, dst, _ = graph._graph.edges()
+    dst = dst.tousertensor(score.device)
+    return EdgeSoftmax.apply(score, dst, graph.number_of_nodes())
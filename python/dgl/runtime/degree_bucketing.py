@@ -1,6 +1,11 @@
 """Module for degree bucketing schedulers"""
 from __future__ import absolute_import
 
+from collections import OrderedDict
+import zlib
+
+import numpy as np
+
 from .._ffi.function import _init_api
 from ..base import is_all, ALL
 from .. import backend as F
@@ -11,6 +16,40 @@ from .. import utils
 from . import ir
 from .ir import var as var
 
+# Maximal number of bucketing plans cached on a graph for calls on subsets of
+# its edges.
+_MAX_CACHED_PLANS = 16
+
+class ContentKey(object):
+    """Cache key of a bucketing plan by its destination and recv nodes.
+
+    The hash is a CRC32 digest of the ids and their lengths, so the key does
+    not hold a copy of the ids as bytes. The ids themselves are compared only
+    when the hashes match, so a plan is never reused for other nodes.
+
+    Parameters
+    ----------
+    dst_nodes : utils.Index
+        The dst node of each message.
+    recv_nodes : utils.Index
+        The nodes that perform recv.
+    """
+    def __init__(self, dst_nodes, recv_nodes):
+        self._ids = (dst_nodes.tonumpy(), recv_nodes.tonumpy())
+        self._hash = hash(tuple((len(ids), zlib.crc32(np.ascontiguousarray(ids)))
+                                for ids in self._ids))
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if not isinstance(other, ContentKey) or self._hash != other._hash:
+            return False
+        return all(np.array_equal(a, b) for a, b in zip(self._ids, other._ids))
+
+    def __ne__(self, other):
+        return not self == other
+
 def gen_degree_bucketing_schedule(
         graph,
         reduce_udf,
@@ -19,7 +58,8 @@ def gen_degree_bucketing_schedule(
         recv_nodes,
         var_nf,
         var_mf,
-        var_out):
+        var_out,
+        cache_key=None):
     """Create degree bucketing schedule.
 
     The messages will be divided by their receivers into buckets. Each bucket
@@ -49,10 +89,14 @@ def gen_degree_bucketing_schedule(
         The variable for message frame.
     var_out : var.FEAT_DICT
         The variable for output feature dicts.
+    cache_key : hashable, optional
+        If given, the bucketing plan is cached on the graph index under this
+        key and reused until the graph is mutated. The key must identify the
+        message ids, destination nodes and recv nodes.
     """
-    buckets = _degree_bucketing_schedule(message_ids, dst_nodes, recv_nodes)
-    # generate schedule
-    unique_dst, degs, buckets, msg_ids, zero_deg_nodes = buckets
+    plan = _get_bucketing_plan(graph, message_ids, dst_nodes, recv_nodes,
+                               cache_key)
+    degs, buckets, msg_ids, zero_deg_nodes, order = plan
     # loop over each bucket
     idx_list = []
     fd_list = []
@@ -78,12 +122,42 @@ def gen_degree_bucketing_schedule(
         idx_list.append(var_0deg)
         fd_list.append(zero_feat)
     # merge buckets according to the ascending order of the node ids.
-    all_idx = F.cat([idx.data.tousertensor() for idx in idx_list], dim=0)
-    _, order = F.sort_1d(all_idx)
-    var_order = var.IDX(utils.toindex(order))
+    var_order = var.IDX(order)
     reduced_feat = ir.MERGE_ROW(var_order, fd_list)
     ir.WRITE_DICT_(var_out, reduced_feat)
 
+def _get_bucketing_plan(graph, message_ids, dst_nodes, recv_nodes, cache_key):
+    """Return the bucketing plan, from the graph index cache if possible.
+
+    The plan is a tuple of the bucket degrees, node ids, message ids and
+    zero-degree nodes (see :func:`_process_buckets`) plus the order to merge
+    the per-bucket results in. The cached plans are dropped together with
+    the other cached data of the graph index whenever the graph is mutated.
+    """
+    if cache_key is None:
+        return _compute_bucketing_plan(message_ids, dst_nodes, recv_nodes)
+    plans = graph._graph._cache.setdefault('degree_bucketing', OrderedDict())
+    if cache_key in plans:
+        # move to the end as the most recently used
+        plan = plans.pop(cache_key)
+    else:
+        plan = _compute_bucketing_plan(message_ids, dst_nodes, recv_nodes)
+    plans[cache_key] = plan
+    if len(plans) > _MAX_CACHED_PLANS:
+        plans.popitem(last=False)
+    return plan
+
+def _compute_bucketing_plan(message_ids, dst_nodes, recv_nodes):
+    """Compute the bucketing plan. See :func:`_get_bucketing_plan`."""
+    buckets = _degree_bucketing_schedule(message_ids, dst_nodes, recv_nodes)
+    _, degs, buckets, msg_ids, zero_deg_nodes = buckets
+    idx_list = list(buckets)
+    if zero_deg_nodes is not None:
+        idx_list.append(zero_deg_nodes)
+    all_idx = F.cat([idx.tousertensor() for idx in idx_list], dim=0)
+    _, order = F.sort_1d(all_idx)
+    return degs, buckets, msg_ids, zero_deg_nodes, utils.toindex(order)
+
 def _degree_bucketing_schedule(mids, dsts, v):
     """Return the bucketing by degree scheduling for destination nodes of
     messages
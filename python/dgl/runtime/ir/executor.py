@@ -3,11 +3,13 @@ from __future__ import absolute_import
 from abc import abstractmethod
 import functools
 import operator
+import numpy as np
 
 from ...base import DGLError
 from ... import backend as F
 from ...frame import FrameRef, Frame
 from ... import utils
+from ...function.message import binary_op
 
 from .program import get_current_prog
 from . import var
@@ -26,6 +28,10 @@ class OpCode(object):
     MERGE_ROW = 7
     UPDATE_DICT = 8
     NEW_DICT = 9
+    SEGMENT_REDUCE = 10
+    BINARY_OP = 11
+    SPMV_EMBED = 12
+    SPMV_TYPED = 13
     # mutable op (no return)
     # remember the name is suffixed with "_"
     WRITE_ = 21
@@ -53,11 +59,14 @@ class Executor(object):
         raise NotImplementedError
 
 class NodeUDFExecutor(Executor):
-    def __init__(self, fn, fdnode, fdmail, ret):
+    def __init__(self, fn, fdnode, fdmail, ret, to_frame=True):
         self.fn = fn
         self.fdnode = fdnode
         self.fdmail = fdmail
         self.ret = ret
+        # if False, the returned dict is kept as is, e.g. to be written
+        # column by column with WRITE_DICT_
+        self.to_frame = to_frame
 
     def opcode(self):
         return OpCode.NODE_UDF
@@ -79,7 +88,7 @@ class NodeUDFExecutor(Executor):
         else:
             mail_data = self.fdmail.data
             udf_ret = fn_data(node_data, mail_data)
-        self.ret.data = FrameRef(Frame(udf_ret))
+        self.ret.data = FrameRef(Frame(udf_ret)) if self.to_frame else udf_ret
 
 IR_REGISTRY[OpCode.NODE_UDF] = {
     'name' : 'NODE_UDF',
@@ -87,19 +96,21 @@ IR_REGISTRY[OpCode.NODE_UDF] = {
     'ret_type' : VarType.FEAT_DICT,
     'executor_cls' : NodeUDFExecutor,
 }
-def NODE_UDF(fn, fdnode, fdmail=None, ret=None):
+def NODE_UDF(fn, fdnode, fdmail=None, ret=None, to_frame=True):
     reg = IR_REGISTRY[OpCode.NODE_UDF]
     ret = var.new(reg['ret_type']) if ret is None else ret
-    get_current_prog().issue(reg['executor_cls'](fn, fdnode, fdmail, ret))
+    get_current_prog().issue(reg['executor_cls'](fn, fdnode, fdmail, ret, to_frame))
     return ret
 
 class EdgeUDFExecutor(Executor):
-    def __init__(self, fn, fdsrc, fdedge, fddst, ret):
+    def __init__(self, fn, fdsrc, fdedge, fddst, ret, to_frame=True):
         self.fn = fn
         self.fdsrc = fdsrc
         self.fdedge = fdedge
         self.fddst = fddst
         self.ret = ret
+        # see NodeUDFExecutor
+        self.to_frame = to_frame
 
     def opcode(self):
         return OpCode.EDGE_UDF
@@ -116,7 +127,7 @@ class EdgeUDFExecutor(Executor):
         edge_data = self.fdedge.data
         dst_data = self.fddst.data
         udf_ret = fn_data(src_data, edge_data, dst_data)
-        self.ret.data = FrameRef(Frame(udf_ret))
+        self.ret.data = FrameRef(Frame(udf_ret)) if self.to_frame else udf_ret
 
 IR_REGISTRY[OpCode.EDGE_UDF] = {
     'name' : 'EDGE_UDF',
@@ -124,10 +135,11 @@ IR_REGISTRY[OpCode.EDGE_UDF] = {
     'ret_type' : VarType.FEAT_DICT,
     'executor_cls' : EdgeUDFExecutor,
 }
-def EDGE_UDF(fn, fdsrc, fdedge, fddst, ret=None):
+def EDGE_UDF(fn, fdsrc, fdedge, fddst, ret=None, to_frame=True):
     reg = IR_REGISTRY[OpCode.EDGE_UDF]
     ret = var.new(reg['ret_type']) if ret is None else ret
-    get_current_prog().issue(reg['executor_cls'](fn, fdsrc, fdedge, fddst, ret))
+    get_current_prog().issue(reg['executor_cls'](fn, fdsrc, fdedge, fddst, ret,
+                                                 to_frame))
     return ret
 
 class ReadExecutor(Executor):
@@ -214,7 +226,11 @@ class ReadRowExecutor(Executor):
     def run(self):
         fd_data = self.fd.data
         row_data = self.row.data  # idx
-        self.ret.data = fd_data[row_data]
+        rows = fd_data[row_data]
+        if isinstance(rows, utils.LazyDict):
+            # all the readers of the result share each gathered column
+            rows = rows.memoized()
+        self.ret.data = rows
 
 IR_REGISTRY[OpCode.READ_ROW] = {
     'name' : 'READ_ROW',
@@ -224,8 +240,15 @@ IR_REGISTRY[OpCode.READ_ROW] = {
 }
 def READ_ROW(fd, row, ret=None):
     reg = IR_REGISTRY[OpCode.READ_ROW]
-    ret = var.new(reg['ret_type']) if ret is None else ret
-    get_current_prog().issue(reg['executor_cls'](fd, row, ret))
+    prog = get_current_prog()
+    if ret is None:
+        # reuse an identical read that has not been invalidated by a write
+        key = (OpCode.READ_ROW, fd, row)
+        if key in prog.read_cache:
+            return prog.read_cache[key]
+        ret = var.new(reg['ret_type'])
+        prog.read_cache[key] = ret
+    prog.issue(reg['executor_cls'](fd, row, ret))
     return ret
 
 class SPMVExecutor(Executor):
@@ -244,28 +267,7 @@ class SPMVExecutor(Executor):
         return self.ret
 
     def run(self):
-        spA_ctxobj = self.spA.data
-        B = self.B.data
-        ctx = F.context(B)
-        spA = spA_ctxobj.get(ctx)
-        if F.ndim(B) == 1:
-            # B is a vector, append a (1,) dim at the end
-            B = F.unsqueeze(B, 1)
-            C = F.spmm(spA, B)
-            C = F.squeeze(C, 1)
-        elif F.ndim(B) > 2:
-            # Flatten the dim 1:~
-            B_shape = F.shape(B)
-            feat_shape = B_shape[1:]
-            tmp_B_shape = (B_shape[0],
-                    functools.reduce(operator.mul, feat_shape, 1))
-            B = F.reshape(B, tmp_B_shape)
-            C = F.spmm(spA, B)
-            C_shape = (F.shape(C)[0],) + feat_shape
-            C = F.reshape(C, C_shape)
-        else:
-            C = F.spmm(spA, B)
-        self.ret.data = C
+        self.ret.data = _cached_spmm(self.spA.data, self.B.data)
 
 IR_REGISTRY[OpCode.SPMV] = {
     'name' : 'SPMV',
@@ -298,36 +300,72 @@ class SPMVWithDataExecutor(Executor):
     def run(self):
         spA_ctxobj = self.spA.data
         A_data = self.A_data.data
-        if F.ndim(A_data) > 1:
-            # A_data is of shape (E, 1). Squeeze the last dim.
-            A_data = F.squeeze(A_data, 1)
         B = self.B.data
 
         ctx = F.context(B)
         spA = spA_ctxobj.get(ctx)
-        spidx = F.sparse_matrix_indices(spA)
-        shape = F.shape(spA)
-        # shuffle index is not used
-        spA, _ = F.sparse_matrix(A_data, spidx, shape)
-
-        if F.ndim(B) == 1:
-            # B is a vector, append a (1,) dim at the end
-            B = F.unsqueeze(B, 1)
-            C = F.spmm(spA, B)
-            C = F.squeeze(C, 1)
-        elif F.ndim(B) > 2:
-            # Flatten the dim 1:~
-            B_shape = F.shape(B)
-            feat_shape = B_shape[1:]
-            tmp_B_shape = (B_shape[0],
-                    functools.reduce(operator.mul, feat_shape, 1))
-            B = F.reshape(B, tmp_B_shape)
-            C = F.spmm(spA, B)
-            C_shape = (F.shape(C)[0],) + feat_shape
-            C = F.reshape(C, C_shape)
-        else:
-            C = F.spmm(spA, B)
-        self.ret.data = C
+        A_shape = F.shape(A_data)
+        num_heads = functools.reduce(operator.mul, A_shape[1:], 1)
+        if num_heads > 1:
+            # A_data is of shape (E, H) or (E, H, 1, ...).
+            self.ret.data = _head_batched_spmm(spA, A_data, B, num_heads)
+            return
+        if F.ndim(A_data) > 1:
+            # A_data is of shape (E, 1, ...). Squeeze the trailing dims.
+            A_data = F.reshape(A_data, (A_shape[0],))
+        self.ret.data = _cached_spmm(spA_ctxobj, B, A_data)
+
+def _cached_spmm(spA_ctxobj, B, A_data=None):
+    """Multiply the sparse matrix with B, whose dims after the first one are
+    flattened.
+
+    The matrix and its transpose (for the backward pass) are the sorted
+    formats cached with the matrix, so they are not converted again. If
+    A_data is given, it replaces the data of the matrix, in the order of the
+    nonzeros of the matrix.
+    """
+    spA, perm, spAt, perm_t = spA_ctxobj.get_sorted(F.context(B))
+    data = data_t = None
+    if A_data is not None:
+        data = F.gather_row(A_data, perm)
+        data_t = F.gather_row(A_data, perm_t)
+    B_shape = F.shape(B)
+    C = F.spmm(spA, F.reshape(B, (B_shape[0], -1)), spAt, data, data_t)
+    return F.reshape(C, (F.shape(C)[0],) + tuple(B_shape[1:]))
+
+def _sparse_matrix_coo(spA, ctx):
+    """Return the row and column of each nonzero of the sparse matrix, in
+    the order of its data."""
+    spidx = F.sparse_matrix_indices(spA)
+    if spidx[0] == 'coo':
+        return spidx[1][0], spidx[1][1]
+    indptr = F.asnumpy(spidx[2])
+    row = np.repeat(np.arange(len(indptr) - 1, dtype=np.int64), np.diff(indptr))
+    return utils.copy_to(F.zerocopy_from_numpy(row), ctx, 'SPMV'), spidx[1]
+
+def _head_batched_spmm(spA, A_data, B, num_heads):
+    """Multiply each head of B by the adjmat weighted by that head.
+
+    The (M, N) adjmat with the (E, H) data is expanded to a (M * H, N * H)
+    matrix whose entry (v * H + h, u * H + h) is the data of head h of edge
+    (v, u). B of shape (N, H, ...) is then a (N * H, D) matrix without
+    any copy, and all the heads are computed by one spmm.
+    """
+    num_rows, num_cols = F.shape(spA)
+    row, col = _sparse_matrix_coo(spA, F.context(B))
+    heads = F.unsqueeze(utils.copy_to(F.arange(0, num_heads), F.context(B),
+                                      'SPMV_WITH_DATA'), 0)
+    row = F.reshape(F.unsqueeze(row, 1) * num_heads + heads, (1, -1))
+    col = F.reshape(F.unsqueeze(col, 1) * num_heads + heads, (1, -1))
+    nnz = F.shape(A_data)[0] * num_heads
+    spA, _ = F.sparse_matrix(F.reshape(A_data, (nnz,)),
+                             ('coo', F.cat([row, col], dim=0)),
+                             (num_rows * num_heads, num_cols * num_heads))
+    B_shape = F.shape(B)
+    feat_shape = B_shape[2:]
+    feat_size = functools.reduce(operator.mul, feat_shape, 1)
+    C = F.spmm(spA, F.reshape(B, (B_shape[0] * num_heads, feat_size)))
+    return F.reshape(C, (num_rows, num_heads) + feat_shape)
 
 IR_REGISTRY[OpCode.SPMV_WITH_DATA] = {
     'name' : 'SPMV_WITH_DATA',
@@ -341,6 +379,111 @@ def SPMV_WITH_DATA(spA, A_data, B, ret=None):
     get_current_prog().issue(reg['executor_cls'](spA, A_data, B, ret))
     return ret
 
+class SPMVEmbedExecutor(Executor):
+    def __init__(self, spA, mfn, ids, etype, A_data, ret):
+        self.spA = spA
+        self.mfn = mfn
+        self.ids = ids
+        self.etype = etype
+        self.A_data = A_data
+        self.ret = ret
+
+    def opcode(self):
+        return OpCode.SPMV_EMBED
+
+    def arg_vars(self):
+        return [v for v in [self.spA, self.mfn, self.ids, self.etype, self.A_data]
+                if v is not None]
+
+    def ret_var(self):
+        return self.ret
+
+    def run(self):
+        mfn = self.mfn.data
+        table = mfn.flat_table()
+        ctx = F.context(table)
+        spA = self.spA.data.get(ctx)
+        num_rows = F.shape(spA)[0]
+        row, col = _sparse_matrix_coo(spA, ctx)
+        etype = self.etype.data if self.etype is not None else None
+        rows = mfn.rows(F.gather_row(self.ids.data, col), etype)
+        # the sparse matrix only has the columns of the used table rows
+        rows = utils.copy_to(rows, F.cpu(), 'SPMV_EMBED')
+        used, inverse = np.unique(F.asnumpy(rows), return_inverse=True)
+        used = utils.copy_to(F.zerocopy_from_numpy(used.astype(np.int64)), ctx,
+                             'SPMV_EMBED')
+        inverse = utils.copy_to(
+            F.zerocopy_from_numpy(inverse.reshape(-1).astype(np.int64)), ctx,
+            'SPMV_EMBED')
+        if mfn.sparse_grad:
+            table = F.gather_row_sparse_grad(table, used)
+        else:
+            table = F.gather_row(table, used)
+        if self.A_data is not None:
+            A_data = F.reshape(self.A_data.data, (F.shape(row)[0],))
+        else:
+            A_data = F.ones((F.shape(row)[0],), F.dtype(table), ctx)
+        spA, _ = F.sparse_matrix(A_data, ('coo', F.stack([row, inverse], 0)),
+                                 (num_rows, F.shape(table)[0]))
+        self.ret.data = F.spmm(spA, table)
+
+IR_REGISTRY[OpCode.SPMV_EMBED] = {
+    'name' : 'SPMV_EMBED',
+    'args_type' : [VarType.SPMAT, VarType.FUNC, VarType.FEAT, VarType.FEAT,
+                   VarType.FEAT],
+    'ret_type' : VarType.FEAT,
+    'executor_cls' : SPMVEmbedExecutor,
+}
+def SPMV_EMBED(spA, mfn, ids, etype=None, A_data=None, ret=None):
+    reg = IR_REGISTRY[OpCode.SPMV_EMBED]
+    ret = var.new(reg['ret_type']) if ret is None else ret
+    get_current_prog().issue(reg['executor_cls'](spA, mfn, ids, etype, A_data, ret))
+    return ret
+
+class SPMVTypedExecutor(Executor):
+    def __init__(self, spA, mfn, B, rows, bounds, A_data, ret):
+        self.spA = spA
+        self.mfn = mfn
+        self.B = B
+        self.rows = rows
+        self.bounds = bounds
+        self.A_data = A_data
+        self.ret = ret
+
+    def opcode(self):
+        return OpCode.SPMV_TYPED
+
+    def arg_vars(self):
+        return [v for v in [self.spA, self.mfn, self.B, self.rows, self.bounds,
+                            self.A_data] if v is not None]
+
+    def ret_var(self):
+        return self.ret
+
+    def run(self):
+        B = self.B.data
+        rows = self.rows.data.tousertensor(F.context(B))
+        # the products of the used (source, type) pairs, in the order of the
+        # columns of the sparse matrix
+        table = self.mfn.data.matmul_by_type(B, rows, self.bounds.data.tonumpy())
+        A_data = None
+        if self.A_data is not None:
+            A_data = F.reshape(self.A_data.data, (F.shape(self.A_data.data)[0],))
+        self.ret.data = _cached_spmm(self.spA.data, table, A_data)
+
+IR_REGISTRY[OpCode.SPMV_TYPED] = {
+    'name' : 'SPMV_TYPED',
+    'args_type' : [VarType.SPMAT, VarType.FUNC, VarType.FEAT, VarType.IDX,
+                   VarType.IDX, VarType.FEAT],
+    'ret_type' : VarType.FEAT,
+    'executor_cls' : SPMVTypedExecutor,
+}
+def SPMV_TYPED(spA, mfn, B, rows, bounds, A_data=None, ret=None):
+    reg = IR_REGISTRY[OpCode.SPMV_TYPED]
+    ret = var.new(reg['ret_type']) if ret is None else ret
+    get_current_prog().issue(reg['executor_cls'](spA, mfn, B, rows, bounds, A_data, ret))
+    return ret
+
 class MergeRowExecutor(Executor):
     def __init__(self, order, fd_list, ret):
         self.order = order
@@ -460,6 +603,72 @@ def NEW_DICT(fd_init, idx, fd_scheme, ret=None):
     get_current_prog().issue(reg['executor_cls'](fd_init, idx, fd_scheme, ret))
     return ret
 
+class SegmentReduceExecutor(Executor):
+    def __init__(self, reducer, msg, seg_id, out_nodes, ret):
+        self.reducer = reducer
+        self.msg = msg
+        self.seg_id = seg_id
+        self.out_nodes = out_nodes
+        self.ret = ret
+
+    def opcode(self):
+        return OpCode.SEGMENT_REDUCE
+
+    def arg_vars(self):
+        return [self.reducer, self.msg, self.seg_id, self.out_nodes]
+
+    def ret_var(self):
+        return self.ret
+
+    def run(self):
+        reducer = getattr(F, 'unsorted_1d_segment_' + self.reducer.data)
+        msg = self.msg.data
+        seg_id = self.seg_id.data.tousertensor(F.context(msg))
+        self.ret.data = reducer(msg, seg_id, len(self.out_nodes.data), 0)
+
+IR_REGISTRY[OpCode.SEGMENT_REDUCE] = {
+    'name' : 'SEGMENT_REDUCE',
+    'args_type' : [VarType.STR, VarType.FEAT, VarType.IDX, VarType.IDX],
+    'ret_type' : VarType.FEAT,
+    'executor_cls' : SegmentReduceExecutor,
+}
+def SEGMENT_REDUCE(reducer, msg, seg_id, out_nodes, ret=None):
+    reg = IR_REGISTRY[OpCode.SEGMENT_REDUCE]
+    ret = var.new(reg['ret_type']) if ret is None else ret
+    get_current_prog().issue(reg['executor_cls'](reducer, msg, seg_id, out_nodes, ret))
+    return ret
+
+class BinaryOpExecutor(Executor):
+    def __init__(self, op, lhs, rhs, ret):
+        self.op = op
+        self.lhs = lhs
+        self.rhs = rhs
+        self.ret = ret
+
+    def opcode(self):
+        return OpCode.BINARY_OP
+
+    def arg_vars(self):
+        return [self.op, self.lhs, self.rhs]
+
+    def ret_var(self):
+        return self.ret
+
+    def run(self):
+        self.ret.data = binary_op(self.op.data, self.lhs.data, self.rhs.data)
+
+IR_REGISTRY[OpCode.BINARY_OP] = {
+    'name' : 'BINARY_OP',
+    'args_type' : [VarType.STR, VarType.FEAT, VarType.FEAT],
+    'ret_type' : VarType.FEAT,
+    'executor_cls' : BinaryOpExecutor,
+}
+def BINARY_OP(op, lhs, rhs, ret=None):
+    reg = IR_REGISTRY[OpCode.BINARY_OP]
+    ret = var.new(reg['ret_type']) if ret is None else ret
+    get_current_prog().issue(reg['executor_cls'](op, lhs, rhs, ret))
+    return ret
+
 class Write_Executor(Executor):
     def __init__(self, fd, row, col, val):
         self.fd = fd
@@ -9,9 +9,19 @@ class Prog(object):
     def __init__(self):
         self.execs = []
         self.varcount = 0
+        # results of the row reads issued since the last mutation
+        self.read_cache = {}
 
     def issue(self, exe):
         self.execs.append(exe)
+        if exe.ret_var() is None and self.read_cache:
+            # a mutable op changes its first argument; drop the cached reads
+            # of the same feature dict
+            target = exe.arg_vars()[0]
+            for key in list(self.read_cache):
+                fd = key[1]
+                if fd is target or fd.data is None or fd.data is target.data:
+                    del self.read_cache[key]
 
     def pprint_exe(self, exe):
         argstr = ', '.join([str(av) for av in exe.arg_vars()])
@@ -13,6 +13,7 @@ from . import ir
 from .ir import var as var
 from . import degree_bucketing as db
 from . import spmv
+from . import segment
 
 __all__ = [
             "schedule_send",
@@ -46,12 +47,12 @@ def schedule_send(graph, u, v, eid, message_func):
     # vars
     nf = var.FEAT_DICT(graph._node_frame)
     ef = var.FEAT_DICT(graph._edge_frame)
-    mf = var.FEAT_DICT(graph._msg_frame)
+    mf = var.FEAT_DICT(graph._msg_store.frame)
     u = var.IDX(u)
     v = var.IDX(v)
     eid = var.IDX(eid)
     msg = _gen_send(graph, nf, ef, u, v, eid, message_func)
-    # TODO: handle duplicate messages
+    # the message store replaces the earlier messages of the edges
     ir.APPEND_ROW_(mf, msg)
 
 def schedule_recv(graph,
@@ -74,7 +75,7 @@ def schedule_recv(graph,
     inplace: bool
         If True, the update will be done in place
     """
-    src, dst, mid = graph._msg_graph.in_edges(recv_nodes)
+    eid, dst, mid = graph._msg_store.in_messages(recv_nodes, graph.number_of_nodes())
     if len(mid) == 0:
         # All recv nodes are 0-degree nodes; downgrade to apply nodes.
         if apply_func is not None:
@@ -86,7 +87,7 @@ def schedule_recv(graph,
         recv_nodes = utils.toindex(recv_nodes)
         var_recv_nodes = var.IDX(recv_nodes, name='recv_nodes')
         # reduce
-        reduced_feat = _gen_reduce(graph, reduce_func, (src, dst, mid), recv_nodes)
+        reduced_feat = _gen_reduce(graph, reduce_func, (eid, dst, mid), recv_nodes)
         # apply
         final_feat = _apply_with_accum(graph, var_recv_nodes, var_nf, reduced_feat, apply_func)
         if inplace:
@@ -130,7 +131,8 @@ def schedule_snr(graph,
     var_recv_nodes = var.IDX(recv_nodes, name='recv_nodes')
     # generate send and reduce schedule
     uv_getter = lambda : (var_u, var_v)
-    adj_creator = lambda : spmv.build_adj_matrix_uv(graph, (u, v), recv_nodes)
+    adj_creator = lambda norm=None : spmv.build_adj_matrix_uv(
+        graph, (u, v), recv_nodes, norm)
     inc_creator = lambda : spmv.build_inc_matrix_dst(v, recv_nodes)
     reduced_feat = _gen_send_reduce(
             graph, message_func, reduce_func,
@@ -177,12 +179,13 @@ def schedule_update_all(graph,
         def uv_getter():
             src, dst, _ = graph._graph.edges()
             return var.IDX(src), var.IDX(dst)
-        adj_creator = lambda : spmv.build_adj_matrix_graph(graph)
+        adj_creator = lambda norm=None : spmv.build_adj_matrix_graph(graph, norm)
         inc_creator = lambda : spmv.build_inc_matrix_graph(graph)
         reduced_feat = _gen_send_reduce(
                 graph, message_func, reduce_func,
                 var_eid, var_recv_nodes,
-                uv_getter, adj_creator, inc_creator)
+                uv_getter, adj_creator, inc_creator,
+                bucketing_key='update_all')
         # generate optional apply
         final_feat = _apply_with_accum(graph, var_recv_nodes, var_nf, reduced_feat, apply_func)
         ir.WRITE_DICT_(var_nf, final_feat)
@@ -209,12 +212,19 @@ def schedule_apply_nodes(graph,
     A list of executors for DGL Runtime
     """
     var_nf = var.FEAT_DICT(graph._node_frame, name='nf')
-    var_v = var.IDX(v)
-    v_nf = ir.READ_ROW(var_nf, var_v)
     def _afunc_wrapper(node_data):
         nb = NodeBatch(graph, v, node_data)
         return apply_func(nb)
     afunc = var.FUNC(_afunc_wrapper)
+    if not inplace and _is_whole_frame(graph._node_frame, v):
+        # bind the UDF to the columns and replace them by reference with
+        # the returned tensors; an inplace update writes into the columns
+        # instead
+        applied_feat = ir.NODE_UDF(afunc, var_nf, to_frame=False)
+        ir.WRITE_DICT_(var_nf, applied_feat)
+        return
+    var_v = var.IDX(v)
+    v_nf = ir.READ_ROW(var_nf, var_v)
     applied_feat = ir.NODE_UDF(afunc, v_nf)
     if inplace:
         ir.WRITE_ROW_INPLACE_(var_nf, var_v, applied_feat)
@@ -255,12 +265,19 @@ def schedule_apply_edges(graph,
     # schedule apply edges
     fdsrc = ir.READ_ROW(var_nf, var_u)
     fddst = ir.READ_ROW(var_nf, var_v)
-    fdedge = ir.READ_ROW(var_ef, var_eid)
     def _efunc_wrapper(src_data, edge_data, dst_data):
         eb = EdgeBatch(graph, (u, v, eid),
                 src_data, edge_data, dst_data)
         return apply_func(eb)
     _efunc = var.FUNC(_efunc_wrapper)
+    if not inplace and _is_whole_frame(graph._edge_frame, eid):
+        # bind the UDF to the edge columns and replace them by reference
+        # with the returned tensors; an inplace update writes into the
+        # columns instead
+        new_fdedge = ir.EDGE_UDF(_efunc, fdsrc, var_ef, fddst, to_frame=False)
+        ir.WRITE_DICT_(var_ef, new_fdedge)
+        return
+    fdedge = ir.READ_ROW(var_ef, var_eid)
     new_fdedge = ir.EDGE_UDF(_efunc, fdsrc, fdedge, fddst)
     if inplace:
         ir.WRITE_ROW_INPLACE_(var_ef, var_eid, new_fdedge)
@@ -340,7 +357,8 @@ def schedule_pull(graph,
         var_eid = var.IDX(eid)
         # generate send and reduce schedule
         uv_getter = lambda : (var_u, var_v)
-        adj_creator = lambda : spmv.build_adj_matrix_uv(graph, (u, v), pull_nodes)
+        adj_creator = lambda norm=None : spmv.build_adj_matrix_uv(
+            graph, (u, v), pull_nodes, norm)
         inc_creator = lambda : spmv.build_inc_matrix_dst(v, pull_nodes)
         reduced_feat = _gen_send_reduce(
                 graph, message_func, reduce_func,
@@ -353,6 +371,12 @@ def schedule_pull(graph,
         else:
             ir.WRITE_ROW_(var_nf, var_pull_nodes, final_feat)
 
+def _is_whole_frame(frame, idx):
+    """Return whether the index selects all the rows of a frame that owns
+    its columns, so that the columns can be read and replaced directly."""
+    return (isinstance(idx, utils.Index) and idx.is_slice(0, frame.num_rows)
+            and frame.is_span_whole_column())
+
 def _check_builtin_func_list(func_list):
     """Check whether func_list only contains builtin functions."""
     for fn in func_list:
@@ -436,7 +460,7 @@ def _gen_reduce(graph, reduce_func, edge_tuples, recv_nodes):
     tmpframe = FrameRef(frame_like(graph._node_frame._frame, len(recv_nodes)))
 
     # vars
-    msg = var.FEAT_DICT(graph._msg_frame, 'msg')
+    msg = var.FEAT_DICT(graph._msg_store.frame, 'msg')
     nf = var.FEAT_DICT(graph._node_frame, 'nf')
     out = var.FEAT_DICT(data=tmpframe)
 
@@ -445,8 +469,14 @@ def _gen_reduce(graph, reduce_func, edge_tuples, recv_nodes):
         # analyze e2v spmv
         spmv_rfunc, rfunc = spmv.analyze_e2v_spmv(graph, rfunc)
         # FIXME: refactor this when fixing the multi-recv bug
-        inc = spmv.build_inc_matrix_eid(graph._msg_frame.num_rows, mid, dst, recv_nodes)
+        inc = spmv.build_inc_matrix_eid(graph._msg_store.frame.num_rows, mid, dst, recv_nodes)
         spmv.gen_e2v_spmv_schedule(inc, spmv_rfunc, msg, out)
+        # analyze e2v segment reduction
+        segment_rfunc, rfunc = segment.analyze_e2v_segment(graph, rfunc)
+        if len(segment_rfunc) > 0:
+            var_mid = var.IDX(mid)
+            segment.gen_e2v_segment_schedule(dst, recv_nodes, segment_rfunc,
+                                             ir.READ_ROW(msg, var_mid), out)
 
         if len(rfunc) == 0:
             # All mfunc and rfunc has been processed.
@@ -468,7 +498,8 @@ def _gen_send_reduce(
         var_reduce_nodes,
         uv_getter,
         adj_creator,
-        inc_creator):
+        inc_creator,
+        bucketing_key=None):
     """Generate send and reduce schedule.
 
     This guarantees that the returned reduced features are batched
@@ -489,9 +520,14 @@ def _gen_send_reduce(
     uv_getter : callable
         A function that returns a pair of var.IDX (u, v) for the triggered edges.
     adj_creator : callable
-        A function that returns the adjmat and the shuffle index.
+        A function that returns the adjmat and the shuffle index. It takes
+        an optional ``norm`` argument for the degree-normalized adjmat.
     inc_creator : callable
         A function that returns the incmat and the shuffle index.
+    bucketing_key : hashable, optional
+        The key to cache the degree bucketing plan on the graph under. If
+        None, the plan is cached by the content of the destination and
+        reduce nodes, so later calls on the same edges reuse it.
 
     Returns
     -------
@@ -523,8 +559,8 @@ def _gen_send_reduce(
         # builtin message + builtin reducer
         # analyze v2v spmv
         spmv_pairs, mfunc, rfunc = spmv.analyze_v2v_spmv(graph, mfunc, rfunc)
-        adj = adj_creator()
-        spmv.gen_v2v_spmv_schedule(adj, spmv_pairs, var_nf, var_ef, var_eid, var_out)
+        spmv.gen_v2v_spmv_schedule(graph, adj_creator, spmv_pairs, var_nf,
+                                   var_ef, var_eid, var_out, var_reduce_nodes)
 
         if len(mfunc) == 0:
             # All mfunc and rfunc have been converted to v2v spmv.
@@ -548,6 +584,10 @@ def _gen_send_reduce(
         spmv_rfunc, rfunc = spmv.analyze_e2v_spmv(graph, rfunc)
         inc = inc_creator()
         spmv.gen_e2v_spmv_schedule(inc, spmv_rfunc, var_mf, var_out)
+        # analyze e2v segment reduction
+        segment_rfunc, rfunc = segment.analyze_e2v_segment(graph, rfunc)
+        segment.gen_e2v_segment_schedule(var_v.data, reduce_nodes,
+                                         segment_rfunc, var_mf, var_out)
 
         if len(rfunc) == 0:
             # All mfunc and rfunc has been processed.
@@ -558,9 +598,12 @@ def _gen_send_reduce(
 
     # gen degree bucketing schedule for UDF recv
     mid = utils.toindex(slice(0, len(var_v.data)))  # message id is from 0~|dst|
+    if bucketing_key is None:
+        # the plan only depends on the dst and reduce nodes
+        bucketing_key = db.ContentKey(var_v.data, reduce_nodes)
     db.gen_degree_bucketing_schedule(graph, rfunc,
             mid, var_v.data, reduce_nodes,
-            var_nf, var_mf, var_out)
+            var_nf, var_mf, var_out, cache_key=bucketing_key)
     return var_out
 
 def _gen_send(graph, nf, ef, u, v, eid, mfunc):
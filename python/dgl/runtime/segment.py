@@ -0,0 +1,77 @@
+"""Module for segment reduction rules."""
+from __future__ import absolute_import
+
+from .. import utils
+
+from . import ir
+from .ir import var as var
+
+def analyze_e2v_segment(graph, rfunc):
+    """Analyze if segment reduction from edge space to node space can be
+    applied.
+
+    Parameters
+    ----------
+    graph: DGLGraph
+        DGLGraph to use
+    rfunc : list of dgl.function.BuiltinFunction
+        The reduce function list.
+
+    Returns
+    -------
+    segment_rfunc : list
+        A list of segment-reduction applicable reduce builtins.
+    rfunc_left : list
+        A list of reduce builtins that are not applicable
+    """
+    segment_rfunc = []
+    rfunc_left = []
+    for rfn in rfunc:
+        if rfn.is_segment_supported():
+            segment_rfunc.append(rfn)
+        else:
+            rfunc_left.append(rfn)
+    return segment_rfunc, rfunc_left
+
+def gen_e2v_segment_schedule(dst, reduce_nodes, segment_rfunc, mf, out):
+    """
+    dst : utils.Index
+        The destination node of each message.
+    reduce_nodes : utils.Index
+        The nodes to reduce messages, in the *unique-ascending* order.
+    segment_rfunc : list of builtin reducers
+    mf : var.Var
+        Variable for message frame.
+    out : var.Var
+        Variable for output reduced features.
+    """
+    if len(segment_rfunc) == 0:
+        return
+    seg_id = var.IDX(build_segment_id(dst, reduce_nodes))
+    var_nodes = var.IDX(reduce_nodes)
+    for rfn in segment_rfunc:
+        ftmsg = ir.READ_COL(mf, var.STR(rfn.msg_field))
+        ftdst = ir.SEGMENT_REDUCE(var.STR(rfn.name), ftmsg, seg_id, var_nodes)
+        ir.WRITE_COL_(out, var.STR(rfn.out_field), ftdst)
+
+def build_segment_id(dst, reduce_nodes):
+    """Return the position of the destination of each message in the
+    reduce nodes.
+
+    Parameters
+    ----------
+    dst : utils.Index
+        The destination node of each message.
+    reduce_nodes : utils.Index
+        The nodes to reduce messages, in the *unique-ascending* order.
+
+    Returns
+    -------
+    utils.Index
+        The segment id of each message.
+    """
+    if reduce_nodes.is_slice(0, len(reduce_nodes)):
+        # the reduce nodes are all the nodes
+        return dst
+    _, old2new = utils.build_relabel_map(reduce_nodes, sorted=True)
+    return utils.toindex(old2new[dst.tousertensor()])
@@ -1,9 +1,13 @@
 """Module for SPMV rules."""
 from __future__ import absolute_import
 
+import numpy as np
+
 from ..base import DGLError
 from .. import backend as F
 from .. import utils
+from ..function.message import (BinaryMessageFunction, SrcEmbeddingMessageFunction,
+                                SrcMulTypedWeightMessageFunction)
 
 from . import ir
 from .ir import var as var
@@ -80,9 +84,15 @@ def analyze_e2v_spmv(graph, rfunc):
             rfunc_left.append(rfn)
     return spmv_rfunc, rfunc_left
 
-def gen_v2v_spmv_schedule(adj, spmv_pairs, nf, ef, eid, out):
+def gen_v2v_spmv_schedule(graph, adj_creator, spmv_pairs, nf, ef, eid, out,
+                          reduce_nodes):
     """
-    adj : tuple (sparse matrix, utils.Index)
+    graph : DGLGraph
+        The graph
+    adj_creator : callable
+        A function that returns the adjmat and the shuffle index. It takes
+        an optional ``norm`` argument to return the adjmat whose values are
+        the degree normalizers of the edges.
     spmv_pairs : list of pair
     nf : var.Var
         input node features
@@ -92,18 +102,124 @@ def gen_v2v_spmv_schedule(adj, spmv_pairs, nf, ef, eid, out):
         eid index
     out : var.Var
         output node features
+    reduce_nodes : var.Var
+        the nodes to reduce messages, in the order of the output rows
     """
-    adjmat, shuffle_idx = adj
-    adj_var = var.SPMAT(adjmat)
-    if shuffle_idx is not None:
-        new_eid = utils.reorder_index(eid.data, shuffle_idx)
-        eid = var.IDX(new_eid)
+    # adjmat vars, keyed by the normalization
+    adj_vars = {}
+    def _get_adj_var(norm):
+        if norm not in adj_vars:
+            adjmat, shuffle_idx = adj_creator(norm=norm)
+            adj_vars[norm] = (var.SPMAT(adjmat), shuffle_idx)
+        return adj_vars[norm]
+    # the number of messages of each reduce node, for the add and sub of
+    # the destination features
+    degree = []
+    def _get_degree(src_field):
+        if len(degree) == 0:
+            feat = nf.data[src_field]
+            n = F.shape(feat)[0]
+            ones = var.FEAT(F.ones((n,), dtype=F.dtype(feat), ctx=F.context(feat)))
+            degree.append(ir.SPMV(_get_adj_var(None)[0], ones))
+        return degree[0]
+    # masks of the reduce nodes with and without messages, or None if all
+    # of them have messages
+    zero_deg_masks = []
+    def _get_zero_deg_masks(dst_field):
+        if len(zero_deg_masks) == 0:
+            adjmat = _get_adj_var(None)[0].data.get(F.cpu())
+            spidx = F.sparse_matrix_indices(adjmat)
+            if spidx[0] == 'coo':
+                deg = np.bincount(F.asnumpy(spidx[1][0]),
+                                  minlength=F.shape(adjmat)[0])
+            else:
+                deg = np.diff(F.asnumpy(spidx[2]))
+            masks = None
+            if np.any(deg == 0):
+                feat = nf.data[dst_field]
+                masks = tuple(
+                    var.FEAT(utils.copy_to(F.astype(F.zerocopy_from_numpy(m),
+                                                    F.dtype(feat)),
+                                           F.context(feat), 'SPMV'))
+                    for m in [deg > 0, deg == 0])
+            zero_deg_masks.append(masks)
+        return zero_deg_masks[0]
+    # the edge ids in the order of the nonzeros of the adjmat
+    shuffled_eid = []
+    def _get_eid():
+        if len(shuffled_eid) == 0:
+            _, shuffle_idx = _get_adj_var(None)
+            if shuffle_idx is not None:
+                shuffled_eid.append(var.IDX(utils.reorder_index(eid.data, shuffle_idx)))
+            else:
+                shuffled_eid.append(eid)
+        return shuffled_eid[0]
+    def _read_edge_col(field):
+        if field is None:
+            return None
+        # the functions share the row read, and thus each gathered column
+        return ir.READ_COL(ir.READ_ROW(ef, _get_eid()), var.STR(field))
+    def _get_typed_adj(mfn):
+        adj_var, _ = _get_adj_var(None)
+        def _build(etype):
+            etype = utils.copy_to(etype, F.cpu(), 'SPMV')
+            etype = F.asnumpy(F.gather_row(etype, _get_eid().data.tousertensor()))
+            return build_typed_adj_matrix(adj_var.data, etype)
+        if eid.data.is_slice(0, graph.number_of_edges()):
+            # the matrix of the whole graph is cached
+            return mfn.type_plan(graph, 'spmv', _build)
+        return _build(graph._edge_frame.select_column(mfn.type_field))
     for mfn, rfn in spmv_pairs:
-        if mfn.use_edge_feature:
-            ftedge = ir.READ(ef, eid, var.STR(mfn.edge_field))
+        if isinstance(mfn, SrcMulTypedWeightMessageFunction):
+            # multiply each used (source, type) pair once, and sum the
+            # products with one sparse matrix
+            typed_adj, shuffle_idx, used_src, bounds = _get_typed_adj(mfn)
+            if mfn.edge_field is None or shuffle_idx is None:
+                ftedge = _read_edge_col(mfn.edge_field)
+            else:
+                typed_eid = var.IDX(utils.reorder_index(_get_eid().data, shuffle_idx))
+                ftedge = ir.READ_COL(ir.READ_ROW(ef, typed_eid), var.STR(mfn.edge_field))
+            ftsrc = ir.READ_COL(nf, var.STR(mfn.src_field))
+            ftdst = ir.SPMV_TYPED(var.SPMAT(typed_adj), var.FUNC(mfn), ftsrc,
+                                  var.IDX(used_src), var.IDX(bounds), ftedge)
+        elif isinstance(mfn, SrcEmbeddingMessageFunction):
+            # pick and sum the table rows with one sparse matrix
+            adj_var, _ = _get_adj_var(None)
+            ftid = ir.READ_COL(nf, var.STR(mfn.src_field))
+            ftdst = ir.SPMV_EMBED(adj_var, var.FUNC(mfn), ftid,
+                                  _read_edge_col(mfn.type_field),
+                                  _read_edge_col(mfn.edge_field))
+        elif mfn.use_edge_feature:
+            adj_var, _ = _get_adj_var(None)
+            ftedge = _read_edge_col(mfn.edge_field)
             ftsrc = ir.READ_COL(nf, var.STR(mfn.src_field))
             ftdst = ir.SPMV_WITH_DATA(adj_var, ftedge, ftsrc)
+        elif isinstance(mfn, BinaryMessageFunction):
+            # reduce the source features, then apply the operator with the
+            # destination features
+            adj_var, _ = _get_adj_var(None)
+            ftsrc = ir.READ_COL(nf, var.STR(mfn.src_field))
+            ftsrc = ir.SPMV(adj_var, ftsrc)
+            ftdst = ir.READ_COL(ir.READ_ROW(nf, reduce_nodes), var.STR(mfn.dst_field))
+            masks = _get_zero_deg_masks(mfn.dst_field)
+            if masks is not None:
+                # nodes without messages get 0 (as with the reducers of
+                # materialized messages), so their destination feature is
+                # replaced by 1 to avoid 0 / 0 and inf * 0
+                has_msg, no_msg = masks
+                ftdst = ir.BINARY_OP(var.STR('add'),
+                                     ir.BINARY_OP(var.STR('mul'), ftdst, has_msg),
+                                     no_msg)
+            if mfn.op in ('add', 'sub'):
+                # the destination feature is in each of the messages
+                ftdst = ir.BINARY_OP(var.STR('mul'),
+                                     _get_degree(mfn.src_field), ftdst)
+            if mfn.lhs == 'u':
+                ftdst = ir.BINARY_OP(var.STR(mfn.op), ftsrc, ftdst)
+            else:
+                ftdst = ir.BINARY_OP(var.STR(mfn.op), ftdst, ftsrc)
         else:
+            adj_var, _ = _get_adj_var(getattr(mfn, 'norm', None))
             ftsrc = ir.READ_COL(nf, var.STR(mfn.src_field))
             ftdst = ir.SPMV(adj_var, ftsrc)
         # save for merge
@@ -125,24 +241,87 @@ def gen_e2v_spmv_schedule(inc, spmv_rfunc, mf, out):
         ftdst = ir.SPMV(inc_var, ftmsg)
         ir.WRITE_COL_(out, var.STR(rfn.out_field), ftdst)
 
-def build_adj_matrix_graph(graph):
+def build_adj_matrix_graph(graph, norm=None):
     """Build adjacency matrix of the whole graph.
 
     Parameters
     ----------
     graph : DGLGraph
         The graph
+    norm : str, optional
+        If given, the value of each edge (u, v) is the degree normalizer
+        ``src_norm[u] * dst_norm[v]`` (see ``DGLGraph.degree_norm``) instead
+        of one.
+
+    The matrix is cached on the graph, with its sorted formats for SPMV.
 
     Returns
     -------
-    utils.CtxCachedObject
+    utils.CtxCachedSparseMatrix
         Get be used to get adjacency matrix on the provided ctx.
     utils.Index
         A index for data shuffling due to sparse format change. Return None
         if shuffle is not required.
     """
-    adjmat, shuffle_idx = graph._graph.adjacency_matrix(transpose=False, ctx=F.cpu())
-    return utils.CtxCachedObject(lambda ctx : F.copy_to(adjmat, ctx)), shuffle_idx
+    gidx = graph._graph
+    if norm is not None:
+        key = 'adj_norm_' + norm
+        if key not in gidx._cache:
+            u, v, _ = gidx.edges()
+            all_nodes = utils.toindex(slice(0, graph.number_of_nodes()))
+            gidx._cache[key] = build_adj_matrix_uv(graph, (u, v), all_nodes, norm)
+        return gidx._cache[key]
+    if 'adj' not in gidx._cache:
+        adjmat, shuffle_idx = gidx.adjacency_matrix(transpose=False, ctx=F.cpu())
+        gidx._cache['adj'] = (utils.CtxCachedSparseMatrix(
+            lambda ctx : F.copy_to(adjmat, ctx)), shuffle_idx)
+    return gidx._cache['adj']
+
+def build_typed_adj_matrix(adjmat, etype):
+    """Build the adjacency matrix of the destination nodes by the used
+    (source, type) pairs, for the builtin ``src_mul_typed_weight``.
+
+    The pairs are sorted by type, then by source node, so the products of
+    each type are computed by one dense matrix multiplication.
+
+    Parameters
+    ----------
+    adjmat : utils.CtxCachedSparseMatrix
+        The adjacency matrix of the destination nodes by the source nodes.
+    etype : numpy.ndarray
+        The type of each nonzero of the adjacency matrix, in their order.
+
+    Returns
+    -------
+    utils.CtxCachedSparseMatrix
+        The matrix, whose nonzeros are in the order of those of adjmat.
+    utils.Index
+        A index for data shuffling due to sparse format change. Return None
+        if shuffle is not required.
+    utils.Index
+        The source node of each pair.
+    utils.Index
+        The pairs of type ``t`` are in the range ``[bounds[t], bounds[t + 1])``.
+    """
+    spmat = adjmat.get(F.cpu())
+    num_rows, num_cols = F.shape(spmat)
+    spidx = F.sparse_matrix_indices(spmat)
+    if spidx[0] == 'coo':
+        row, col = F.asnumpy(spidx[1][0]), F.asnumpy(spidx[1][1])
+    else:
+        indptr = F.asnumpy(spidx[2])
+        row = np.repeat(np.arange(num_rows, dtype=np.int64), np.diff(indptr))
+        col = F.asnumpy(spidx[1])
+    pairs = etype.astype(np.int64) * num_cols + col
+    used, inverse = np.unique(pairs, return_inverse=True)
+    num_types = int(used[-1] // num_cols) + 1 if len(used) > 0 else 0
+    bounds = np.searchsorted(used // num_cols, np.arange(num_types + 1))
+    idx = F.zerocopy_from_numpy(np.stack([row, inverse.reshape(-1)]).astype(np.int64))
+    dat = F.ones((len(row),), dtype=F.float32, ctx=F.cpu())
+    mat, shuffle_idx = F.sparse_matrix(dat, ('coo', idx), (num_rows, len(used)))
+    shuffle_idx = utils.toindex(shuffle_idx) if shuffle_idx is not None else None
+    return (utils.CtxCachedSparseMatrix(lambda ctx : F.copy_to(mat, ctx)),
+            shuffle_idx, utils.toindex(used % num_cols), utils.toindex(bounds))
 
 def _build_adj_matrix_index_uv(graph, edges, reduce_nodes):
     """Build adj matrix index and shape using the given (u, v) edges.
@@ -185,7 +364,7 @@ def _build_adj_matrix_index_uv(graph, edges, reduce_nodes):
     idx = F.cat([row, col], dim=0)
     return ('coo', idx), (m, n)
 
-def build_adj_matrix_uv(graph, edges, reduce_nodes):
+def build_adj_matrix_uv(graph, edges, reduce_nodes, norm=None):
     """Build adj matrix using the given (u, v) edges and target nodes.
 
     The matrix is of shape (len(reduce_nodes), n), where n is the number of nodes
@@ -201,10 +380,14 @@ def build_adj_matrix_uv(graph, edges, reduce_nodes):
     reduce_nodes : utils.Index
         The nodes to reduce messages, which will be target dimension
         of the adjmat. The nodes include unique(v) and zero-degree-nodes.
+    norm : str, optional
+        If given, the value of each edge (u, v) is the degree normalizer
+        ``src_norm[u] * dst_norm[v]`` (see ``DGLGraph.degree_norm``) instead
+        of one.
 
     Returns
     -------
-    utils.CtxCachedObject
+    utils.CtxCachedSparseMatrix
         Get be used to get adjacency matrix and on the provided ctx.
     utils.Index
         A index for data shuffling due to sparse format change. Return None
@@ -213,15 +396,22 @@ def build_adj_matrix_uv(graph, edges, reduce_nodes):
     sp_idx, shape = _build_adj_matrix_index_uv(graph, edges, reduce_nodes)
     u, v = edges
     nnz = len(u)
-    # FIXME(minjie): data type
-    dat = F.ones((nnz,), dtype=F.float32, ctx=F.cpu())
+    if norm is None:
+        # FIXME(minjie): data type
+        dat = F.ones((nnz,), dtype=F.float32, ctx=F.cpu())
+    else:
+        src_norm, dst_norm = graph._graph.degree_norm(norm)
+        dat = src_norm[u.tonumpy()] * dst_norm[v.tonumpy()]
+        dat = F.zerocopy_from_numpy(dat)
     mat, shuffle_idx = F.sparse_matrix(dat, sp_idx, shape)
     shuffle_idx = utils.toindex(shuffle_idx) if shuffle_idx is not None else None
-    return utils.CtxCachedObject(lambda ctx : F.copy_to(mat, ctx)), shuffle_idx
+    return utils.CtxCachedSparseMatrix(lambda ctx : F.copy_to(mat, ctx)), shuffle_idx
 
 def build_inc_matrix_graph(graph):
     """Build incidence matrix.
 
+    The matrix is cached on the graph, with its sorted formats for SPMV.
+
     Parameters
     ----------
     graph : DGLGraph
@@ -229,15 +419,19 @@ def build_inc_matrix_graph(graph):
 
     Returns
     -------
-    utils.CtxCachedObject
+    utils.CtxCachedSparseMatrix
         Get be used to get incidence matrix on the provided ctx.
     utils.Index
         A index for data shuffling due to sparse format change. Return None
         if shuffle is not required.
     """
-    incmat, _ = graph._graph.incidence_matrix(type='in', ctx=F.cpu())
-    # inc mat will not use data tensor so conversion index is not needed
-    return utils.CtxCachedObject(lambda ctx : F.copy_to(incmat, ctx)), None
+    gidx = graph._graph
+    if 'inc_in' not in gidx._cache:
+        incmat, _ = gidx.incidence_matrix(type='in', ctx=F.cpu())
+        # inc mat will not use data tensor so conversion index is not needed
+        gidx._cache['inc_in'] = (utils.CtxCachedSparseMatrix(
+            lambda ctx : F.copy_to(incmat, ctx)), None)
+    return gidx._cache['inc_in']
 
 def build_inc_matrix_eid(m, eid, dst, reduce_nodes):
     """Build incidence matrix using edge id and edge dst nodes.
@@ -283,7 +477,7 @@ def build_inc_matrix_eid(m, eid, dst, reduce_nodes):
 
     Returns
     -------
-    utils.CtxCachedObject
+    utils.CtxCachedSparseMatrix
         Get be used to get incidence matrix on the provided ctx.
     utils.Index
         A index for data shuffling due to sparse format change. Return None
@@ -304,7 +498,7 @@ def build_inc_matrix_eid(m, eid, dst, reduce_nodes):
     dat = F.ones((nnz,), dtype=F.float32, ctx=F.cpu())
     mat, _ = F.sparse_matrix(dat, ('coo', idx), (n, m))
     # inc mat will not use data tensor so conversion index is not needed
-    return utils.CtxCachedObject(lambda ctx : F.copy_to(mat, ctx)), None
+    return utils.CtxCachedSparseMatrix(lambda ctx : F.copy_to(mat, ctx)), None
 
 def build_inc_matrix_dst(dst, reduce_nodes):
     """Build incidence matrix using only edge destinations.
@@ -336,7 +530,7 @@ def build_inc_matrix_dst(dst, reduce_nodes):
 
     Returns
     -------
-    utils.CtxCachedObject
+    utils.CtxCachedSparseMatrix
         Get be used to get incidence matrix on the provided ctx.
     utils.Index
         A index for data shuffling due to sparse format change. Return None
@@ -0,0 +1,102 @@
+"""Numpy arrays in shared memory that are pickled by handle.
+
+A :class:`SharedArray` pickles to the name, shape and data type of its shared
+memory block rather than to its content. Graph structures and frame columns
+use it (see ``DGLGraph.share_memory``) so that graphs sent between processes,
+e.g. from the workers of a data loader, are not copied through the pickle
+stream.
+
+The memory block is handed over with the pickle: the process that unpickles
+the array maps the block and removes its name, and the memory is freed once
+every process has dropped its arrays over the block. Each pickled block can
+thus be unpickled only once; pickling the same array again hands over a copy
+in a new block. A block that is never pickled is removed with the array that
+created it. A block that is pickled but never unpickled stays registered
+with the ``multiprocessing`` resource tracker of the process that created
+it, which removes it when that process tree exits.
+"""
+from __future__ import absolute_import
+
+import numpy as np
+
+from .base import DGLError
+
+def _shared_memory():
+    try:
+        from multiprocessing import shared_memory
+    except ImportError:
+        raise DGLError('Shared memory requires python>=3.8.')
+    return shared_memory
+
+class _Block(object):
+    """Exposes a mapped shared memory block to numpy.
+
+    The arrays over the block keep this object alive, and the block is
+    closed once the last of them is gone. The arrays do not hold a buffer
+    export of the mapping, so closing it then does not fail.
+    """
+    def __init__(self, shm, shape, dtype):
+        self._shm = shm
+        address = np.frombuffer(shm.buf, dtype=np.uint8).ctypes.data
+        self.__array_interface__ = {
+            'data' : (address, False),
+            'shape' : tuple(shape),
+            'typestr' : np.dtype(dtype).str,
+            'version' : 3,
+        }
+
+    def __del__(self):
+        self._shm.close()
+
+class SharedArray(object):
+    """A numpy array in shared memory.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The data to be copied into a new shared memory block.
+
+    Attributes
+    ----------
+    array : numpy.ndarray
+        The array backed by the shared memory block. The block stays mapped
+        as long as this array (or any view of it) is alive.
+    """
+    def __init__(self, data):
+        data = np.ascontiguousarray(data)
+        # zero-size blocks are not allowed
+        self._shm = _shared_memory().SharedMemory(create=True,
+                                                  size=max(data.nbytes, 1))
+        self.name = self._shm.name
+        self._owner = True
+        self.array = np.asarray(_Block(self._shm, data.shape, data.dtype))
+        self.array[...] = data
+
+    def __del__(self):
+        if getattr(self, '_owner', False):
+            self._shm.unlink()
+
+    def __reduce__(self):
+        # the receiver takes over the block
+        if self._owner:
+            self._owner = False
+            name = self.name
+        else:
+            # the block has been handed over already; hand over a copy
+            copy = SharedArray(self.array)
+            copy._owner = False
+            name = copy.name
+        return _attach_shared_array, (name, self.array.shape,
+                                      self.array.dtype.str)
+
+def _attach_shared_array(name, shape, dtype):
+    shm = _shared_memory().SharedMemory(name=name)
+    # the mapping stays valid after the name is removed; removing it also
+    # drops the block from the resource tracker
+    shm.unlink()
+    arr = SharedArray.__new__(SharedArray)
+    arr.name = name
+    arr._shm = shm
+    arr._owner = False
+    arr.array = np.asarray(_Block(shm, shape, dtype))
+    return arr
@@ -4,7 +4,7 @@ from __future__ import absolute_import
 import networkx as nx
 
 from . import backend as F
-from .frame import Frame, FrameRef
+from .frame import FrameRef, dirty_columns
 from .graph import DGLGraph
 from . import utils
 from .graph_index import map_to_subgraph_nid
@@ -20,6 +20,8 @@ class DGLSubGraph(DGLGraph):
       s/he will get nothing.
     * If the subgraph already has its own node/edge features, ``copy_from_parent``
       will override them.
+    * ``copy_from_parent`` is lazy: a feature is only gathered from the parent
+      graph when it is first accessed on the subgraph.
     * Any update on the subgraph's node/edge features will not be seen
       by the parent graph. As such, the memory consumption is of the order
       of the subgraph size.
@@ -104,28 +106,41 @@ class DGLSubGraph(DGLGraph):
     def copy_to_parent(self, inplace=False):
         """Write node/edge features to the parent graph.
 
+        Only the features that have been set or updated on the subgraph
+        since ``copy_from_parent`` are written. Features that are only read,
+        as well as in-place modifications of the tensors read, are not
+        written back.
+
         Parameters
         ----------
         inplace : bool
             If true, use inplace write (no gradient but faster)
         """
+        node_data = {key : self._node_frame[key]
+                     for key in dirty_columns(self._node_frame)}
         self._parent._node_frame.update_rows(
-                self._parent_nid, self._node_frame, inplace=inplace)
-        if self._parent._edge_frame.num_rows != 0:
+                self._parent_nid, node_data, inplace=inplace)
+        edge_data = {key : self._edge_frame[key]
+                     for key in dirty_columns(self._edge_frame)}
+        if self._parent._edge_frame.num_rows != 0 and len(edge_data) != 0:
             self._parent._edge_frame.update_rows(
-                    self._get_parent_eid(), self._edge_frame, inplace=inplace)
+                    self._get_parent_eid(), edge_data, inplace=inplace)
 
     def copy_from_parent(self):
         """Copy node/edge features from the parent graph.
 
-        All old features will be removed.
+        All old features will be removed. The features are gathered from the
+        parent graph on first access, so features that are never used on the
+        subgraph are not copied. Features replaced or updated out-of-place
+        on the parent graph afterwards are not seen by the subgraph, but
+        in-place updates made before a feature is first accessed are.
         """
         if self._parent._node_frame.num_rows != 0:
-            self._node_frame = FrameRef(Frame(
-                self._parent._node_frame[self._parent_nid]))
+            self._node_frame = FrameRef(
+                self._parent._node_frame.select_rows_lazy(self._parent_nid))
         if self._parent._edge_frame.num_rows != 0:
-            self._edge_frame = FrameRef(Frame(
-                self._parent._edge_frame[self._get_parent_eid()]))
+            self._edge_frame = FrameRef(
+                self._parent._edge_frame.select_rows_lazy(self._get_parent_eid()))
 
     def map_to_subgraph_nid(self, parent_vids):
         """Map the node Ids in the parent graph to the node Ids in the subgraph.
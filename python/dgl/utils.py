@@ -3,14 +3,167 @@ from __future__ import absolute_import, division
 
 from collections import Mapping, Iterable
 from functools import wraps
+from multiprocessing.pool import ThreadPool
 import numpy as np
 
 from .base import DGLError
 from . import backend as F
 from . import ndarray as nd
 
+_COPY_STATS = {}
+_GATHER_STATS = {'hits' : 0, 'bytes_saved' : 0}
+
+def record_copy(api, nbytes):
+    """Record that ``nbytes`` bytes were copied by the given API.
+
+    Parameters
+    ----------
+    api : str
+        Name of the API that performed the copy.
+    nbytes : int
+        Number of bytes copied.
+    """
+    count, total = _COPY_STATS.get(api, (0, 0))
+    _COPY_STATS[api] = (count + 1, total + nbytes)
+
+def copy_stats():
+    """Return the data copy statistics.
+
+    The copies of the tensors made through ``copy_to`` and the index
+    conversions are counted. The sparse matrices of SPMV, which are copied
+    once per device and cached, are not.
+
+    Returns
+    -------
+    dict of str to (int, int)
+        Map from API name to the number of copies and the total number of
+        bytes copied by that API since the last ``reset_copy_stats``.
+    """
+    return dict(_COPY_STATS)
+
+def reset_copy_stats():
+    """Reset the data copy statistics."""
+    _COPY_STATS.clear()
+
+def record_gather_hit(data):
+    """Record that a gathered column was reused instead of gathered again.
+
+    Parameters
+    ----------
+    data : Tensor
+        The reused column.
+    """
+    _GATHER_STATS['hits'] += 1
+    if F.is_tensor(data):
+        _GATHER_STATS['bytes_saved'] += tensor_nbytes(data)
+
+def gather_stats():
+    """Return the statistics of the reused row gathers.
+
+    Returns
+    -------
+    dict of str to int
+        ``'hits'`` is the number of times a memoized gathered column was
+        reused, and ``'bytes_saved'`` the total number of bytes those
+        gathers would have copied, since the last ``reset_gather_stats``.
+    """
+    return dict(_GATHER_STATS)
+
+def reset_gather_stats():
+    """Reset the gather statistics."""
+    _GATHER_STATS['hits'] = 0
+    _GATHER_STATS['bytes_saved'] = 0
+
+def tensor_nbytes(data):
+    """Return the number of bytes of a backend tensor."""
+    itemsize = np.dtype(F.reverse_data_type_dict[F.dtype(data)]).itemsize
+    return int(np.prod(F.shape(data))) * itemsize
+
+def copy_to(data, ctx, api, staging=None):
+    """Copy the tensor to the given context, unless it is already there.
+
+    Parameters
+    ----------
+    data : Tensor
+        The tensor.
+    ctx : DGLContext
+        The target context.
+    api : str
+        Name of the calling API, used in the copy statistics.
+    staging : PinnedBuffer, optional
+        If given, host-to-device copies are staged through this buffer and
+        do not wait for the device. Useful if ``data`` is a temporary host
+        buffer. The staging copy is recorded under ``api + '.pin'``.
+
+    Returns
+    -------
+    Tensor
+        The tensor on the given context.
+    """
+    if F.context(data) == ctx:
+        return data
+    nbytes = tensor_nbytes(data)
+    record_copy(api, nbytes)
+    if (staging is not None and F.context(data) == F.cpu()
+            and F.is_enabled('copy_to_async')):
+        record_copy(api + '.pin', nbytes)
+        return staging.copy_to(data, ctx)
+    return F.copy_to(data, ctx)
+
+class PinnedBuffer(object):
+    """A reusable page-locked host buffer to stage host-to-device copies.
+
+    The buffer grows to the largest tensor it has staged and is reused by
+    the following copies. A copy returns before the device has received the
+    data, and the next copy waits for it before overwriting the buffer.
+    """
+    def __init__(self):
+        self._buffer = None   # pinned uint8 tensor
+        self._view = None     # numpy view of the buffer
+        self._pending = None  # context of the copy in flight
+
+    def copy_to(self, data, ctx):
+        """Copy a CPU tensor to the given context through the buffer.
+
+        Parameters
+        ----------
+        data : Tensor
+            The tensor on CPU.
+        ctx : DGLContext
+            The target context.
+
+        Returns
+        -------
+        Tensor
+            The tensor on the given context.
+        """
+        arr = F.zerocopy_to_numpy(data)
+        if self._pending is not None:
+            F.synchronize(self._pending)
+            self._pending = None
+        if self._view is None or len(self._view) < arr.nbytes:
+            # grow geometrically so that the buffer is rarely reallocated
+            size = arr.nbytes
+            if self._view is not None:
+                size = max(size, 2 * len(self._view))
+            self._buffer = F.pin_memory(
+                F.zeros((size,), F.data_type_dict['uint8'], F.cpu()))
+            self._view = F.zerocopy_to_numpy(self._buffer)
+        staged = self._view[:arr.nbytes].view(arr.dtype).reshape(arr.shape)
+        np.copyto(staged, arr)
+        out = F.copy_to_async(F.zerocopy_from_numpy(staged), ctx)
+        self._pending = ctx
+        return out
+
 class Index(object):
-    """Index class that can be easily converted to list/tensor."""
+    """Index class that can be easily converted to list/tensor.
+
+    The numpy array, the user tensors and the dgl NDArray of an index share
+    the same buffer whenever possible. A numpy int64 vector or a user tensor
+    given as the data is used without copying, so it should not be modified
+    afterwards; ``tonumpy`` returns a read-only view of such an array.
+    Copies (e.g. to another device) are recorded in ``copy_stats``.
+    """
     def __init__(self, data):
         self._initialize_data(data)
 
@@ -45,6 +198,11 @@ class Index(object):
     def _dispatch(self, data):
         """Store data based on its type."""
         if F.is_tensor(data):
+            if F.dtype(data) == F.int32:
+                # e.g. ids of a 32-bit graph stored by the user; indices are
+                # always int64 at the graph index boundary
+                record_copy('Index', tensor_nbytes(data))
+                data = F.astype(data, F.int64)
             if not (F.dtype(data) == F.int64):
                 raise DGLError('Index data must be an int64 vector, but got: %s' % str(data))
             if len(F.shape(data)) > 1:
@@ -55,6 +213,9 @@ class Index(object):
             else:
                 self._user_tensor_data[F.context(data)] = data
         elif isinstance(data, nd.NDArray):
+            if data.dtype == 'int32' and len(data.shape) == 1:
+                record_copy('Index', 4 * len(data))
+                data = nd.array(data.asnumpy().astype(np.int64), ctx=data.ctx)
             if not (data.dtype == 'int64' and len(data.shape) == 1):
                 raise DGLError('Index data must be 1D int64 vector, but got: %s' % str(data))
             self._dgl_tensor_data = data
@@ -66,21 +227,31 @@ class Index(object):
                 self._pydata = np.array([int(data)]).astype(np.int64)
             except:
                 try:
-                    data = np.array(data).astype(np.int64)
+                    # numpy int64 vectors are used as is without a copy
+                    data = np.ascontiguousarray(data, dtype=np.int64)
                     if data.ndim != 1:
                         raise DGLError('Index data must be 1D int64 vector,'
                                        ' but got: %s' % str(data))
-                    self._pydata = data
                 except:
                     raise DGLError('Error index data: %s' % str(data))
+                self._user_tensor_data[F.cpu()] = F.zerocopy_from_numpy(data)
+                # the array may be the user's, so it is not written through
+                # the index
+                self._pydata = data.view()
+                self._pydata.flags.writeable = False
+                return
             self._user_tensor_data[F.cpu()] = F.zerocopy_from_numpy(self._pydata)
 
     def tonumpy(self):
         """Convert to a numpy ndarray."""
         if self._pydata is None:
-            if self._dgl_tensor_data is not None:
+            if (self._dgl_tensor_data is not None
+                    and self._dgl_tensor_data.ctx != nd.cpu()):
+                # only cpu arrays can be viewed by numpy
+                record_copy('Index.tonumpy', 8 * len(self._dgl_tensor_data))
                 self._pydata = self._dgl_tensor_data.asnumpy()
             else:
+                # zero copy through the cpu user tensor
                 data = self.tousertensor()
                 self._pydata = F.zerocopy_to_numpy(data)
         elif isinstance(self._pydata, slice):
@@ -97,14 +268,15 @@ class Index(object):
             if self._dgl_tensor_data is not None:
                 # zero copy from dgl tensor
                 dl = self._dgl_tensor_data.to_dlpack()
-                self._user_tensor_data[F.cpu()] = F.zerocopy_from_dlpack(dl)
+                data = F.zerocopy_from_dlpack(dl)
+                self._user_tensor_data[F.context(data)] = data
             else:
                 # zero copy from numpy array
                 self._user_tensor_data[F.cpu()] = F.zerocopy_from_numpy(self.tonumpy())
         if ctx not in self._user_tensor_data:
             # copy from cpu to another device
             data = next(iter(self._user_tensor_data.values()))
-            self._user_tensor_data[ctx] = F.copy_to(data, ctx)
+            self._user_tensor_data[ctx] = copy_to(data, ctx, 'Index.tousertensor')
         return self._user_tensor_data[ctx]
 
     def todgltensor(self):
@@ -130,15 +302,35 @@ def toindex(x):
     return x if isinstance(x, Index) else Index(x)
 
 class LazyDict(Mapping):
-    """A readonly dictionary that does not materialize the storage."""
-    def __init__(self, fn, keys):
+    """A readonly dictionary that does not materialize the storage.
+
+    If ``memoize`` is True, each value is computed on its first access only
+    and kept for the lifetime of the dictionary. Reuses are recorded in
+    ``gather_stats``.
+    """
+    def __init__(self, fn, keys, memoize=False):
         self._fn = fn
         self._keys = keys
+        self._cache = {} if memoize else None
 
     def __getitem__(self, key):
         if not key in self._keys:
             raise KeyError(key)
-        return self._fn(key)
+        if self._cache is None:
+            return self._fn(key)
+        if key in self._cache:
+            val = self._cache[key]
+            record_gather_hit(val)
+        else:
+            val = self._fn(key)
+            self._cache[key] = val
+        return val
+
+    def memoized(self):
+        """Return a memoizing dictionary over the same values."""
+        if self._cache is not None:
+            return self
+        return LazyDict(self._fn, self._keys, memoize=True)
 
     def __contains__(self, key):
         return key in self._keys
@@ -281,6 +473,46 @@ class CtxCachedObject(object):
             self._ctx_dict[ctx] = self._generator(ctx)
         return self._ctx_dict[ctx]
 
+class CtxCachedSparseMatrix(CtxCachedObject):
+    """A CtxCachedObject of a sparse matrix, which also caches the formats
+    used by SPMV.
+
+    Parameters
+    ----------
+    generator : callable
+        A callable function that can create the sparse matrix given ctx as
+        the only argument.
+    """
+    def __init__(self, generator):
+        super(CtxCachedSparseMatrix, self).__init__(generator)
+        self._sorted = CtxCachedObject(self._sort)
+
+    def _sort(self, ctx):
+        spmat_t, perm_t = F.sparse_matrix_transpose(self.get(ctx))
+        spmat, perm = F.sparse_matrix_transpose(spmat_t)
+        return spmat, F.gather_row(perm_t, perm), spmat_t, perm_t
+
+    def get_sorted(self, ctx):
+        """Return the matrix and its transpose with the nonzeros sorted.
+
+        Parameters
+        ----------
+        ctx : context
+            The context.
+
+        Returns
+        -------
+        SparseMatrix
+            The matrix.
+        Tensor
+            The permutation of the nonzeros of the matrix.
+        SparseMatrix
+            The transposed matrix.
+        Tensor
+            The permutation of the nonzeros of the transposed matrix.
+        """
+        return self._sorted.get(ctx)
+
 def ctx_cached_member(func):
     """Convenient class member function wrapper to cache the function result.
 
@@ -315,6 +547,46 @@ def cached_member(func):
             return func(self)
     return wrapper
 
+def degree_norm(in_deg, out_deg, norm):
+    """Compute the normalizers of the source and the destination nodes.
+
+    The message along edge ``(u, v)`` is scaled by ``src_norm[u] *
+    dst_norm[v]``. Nodes of zero degree get zero normalizers.
+
+    Parameters
+    ----------
+    in_deg : utils.Index
+        The in-degrees of all the nodes.
+    out_deg : utils.Index
+        The out-degrees of all the nodes.
+    norm : str
+        ``'right'`` divides by the in-degree of the destination, ``'left'``
+        by the out-degree of the source, and ``'both'`` by the square roots
+        of both (the symmetric normalization of GCN).
+
+    Returns
+    -------
+    numpy.ndarray
+        The float32 normalizer of each node as a source.
+    numpy.ndarray
+        The float32 normalizer of each node as a destination.
+    """
+    def _pow(deg, exp):
+        deg = deg.tonumpy().astype(np.float32)
+        ret = np.zeros_like(deg)
+        nonzero = deg > 0
+        ret[nonzero] = deg[nonzero] ** exp
+        return ret
+    ones = np.ones((len(in_deg),), dtype=np.float32)
+    if norm == 'right':
+        return ones, _pow(in_deg, -1)
+    elif norm == 'left':
+        return _pow(out_deg, -1), ones
+    elif norm == 'both':
+        return _pow(out_deg, -0.5), _pow(in_deg, -0.5)
+    else:
+        raise DGLError('Unknown degree normalization "%s".' % norm)
+
 def is_dict_like(obj):
     return isinstance(obj, Mapping)
 
@@ -352,3 +624,38 @@ def reorder_index(idx, order):
 def is_iterable(obj):
     """Return true if the object is an iterable."""
     return isinstance(obj, Iterable)
+
+def map_blocks(fn, num, block_size, num_workers=0):
+    """Apply a function to consecutive blocks of rows.
+
+    Parameters
+    ----------
+    fn : callable
+        A function of signature ``fn(start, stop)`` that processes the rows
+        in ``[start, stop)``.
+    num : int
+        Total number of rows.
+    block_size : int or None
+        Maximum number of rows per block. All rows form one block if None.
+    num_workers : int, optional
+        Number of threads to process the blocks with. The blocks are
+        processed in the calling thread if less than 2.
+
+    Returns
+    -------
+    list
+        The results of ``fn`` in the order of the blocks.
+    """
+    if block_size is None:
+        block_size = max(num, 1)
+    elif block_size <= 0:
+        raise DGLError('Block size must be positive, got %d.' % block_size)
+    bounds = [(start, min(start + block_size, num))
+              for start in range(0, num, block_size)]
+    if num_workers < 2 or len(bounds) < 2:
+        return [fn(start, stop) for start, stop in bounds]
+    pool = ThreadPool(min(num_workers, len(bounds)))
+    try:
+        return pool.map(lambda bound: fn(*bound), bounds)
+    finally:
+        pool.close()
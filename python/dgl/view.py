@@ -48,6 +48,9 @@ class NodeDataView(MutableMapping):
         self._nodes = nodes
 
     def __getitem__(self, key):
+        if is_all(self._nodes):
+            # read the column only, without reading the others
+            return self._graph._node_frame[key]
         return self._graph.get_n_repr(self._nodes)[key]
 
     def __setitem__(self, key, val):
@@ -110,6 +113,9 @@ class EdgeDataView(MutableMapping):
         self._edges = edges
 
     def __getitem__(self, key):
+        if is_all(self._edges):
+            # read the column only, without reading the others
+            return self._graph._edge_frame[key]
         return self._graph.get_e_repr(self._edges)[key]
 
     def __setitem__(self, key, val):
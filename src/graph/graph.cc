@@ -12,13 +12,47 @@
 #include "../c_api_common.h"
 
 namespace dgl {
+namespace {
+// Out-degree from which a vertex gets an edge lookup index. Below it, a
+// linear scan of the successors is as fast as a binary search.
+const size_t kEdgeIndexMinDegree = 64;
+// Batched lookups smaller than this are not worth spawning threads.
+const int64_t kParallelLookupMinSize = 1024;
+}  // namespace
+
+constexpr dgl_id_t IdVector::kMaxNarrowId;
+
+void Graph::ReserveIds(uint64_t num_vertices, uint64_t num_edges) {
+  if (id_bits_ == 64
+      || (num_vertices <= IdVector::kMaxNarrowId && num_edges <= IdVector::kMaxNarrowId)) {
+    return;
+  }
+  for (auto* adj : {&adjlist_, &reverse_adjlist_}) {
+    for (EdgeList& el : *adj) {
+      el.succ.Widen();
+      el.edge_id.Widen();
+      el.sorted.Widen();
+    }
+  }
+  all_edges_src_.Widen();
+  all_edges_dst_.Widen();
+  id_bits_ = 64;
+}
+
 void Graph::AddVertices(uint64_t num_vertices) {
   CHECK(!read_only_) << "Graph is read-only. Mutations are not allowed.";
-  adjlist_.resize(adjlist_.size() + num_vertices);
-  reverse_adjlist_.resize(reverse_adjlist_.size() + num_vertices);
+  ReserveIds(adjlist_.size() + num_vertices, num_edges_);
+  adjlist_.resize(adjlist_.size() + num_vertices, EdgeList(id_bits_ == 64));
+  reverse_adjlist_.resize(reverse_adjlist_.size() + num_vertices, EdgeList(id_bits_ == 64));
 }
 
 void Graph::AddEdge(dgl_id_t src, dgl_id_t dst) {
+  ReserveIds(NumVertices(), num_edges_ + 1);
+  AddEdgeInternal(src, dst);
+  MarkEdgeIndexStale(src);
+}
+
+void Graph::AddEdgeInternal(dgl_id_t src, dgl_id_t dst) {
   CHECK(!read_only_) << "Graph is read-only. Mutations are not allowed.";
   CHECK(HasVertex(src) && HasVertex(dst))
     << "Invalid vertices: src=" << src << " dst=" << dst;
@@ -42,21 +76,115 @@ void Graph::AddEdges(IdArray src_ids, IdArray dst_ids) {
   const auto dstlen = dst_ids->shape[0];
   const int64_t* src_data = static_cast<int64_t*>(src_ids->data);
   const int64_t* dst_data = static_cast<int64_t*>(dst_ids->data);
+  ReserveIds(NumVertices(), num_edges_ + std::max(srclen, dstlen));
   if (srclen == 1) {
     // one-many
     for (int64_t i = 0; i < dstlen; ++i) {
-      AddEdge(src_data[0], dst_data[i]);
+      AddEdgeInternal(src_data[0], dst_data[i]);
     }
+    SyncEdgeIndex(src_data[0]);
   } else if (dstlen == 1) {
     // many-one
     for (int64_t i = 0; i < srclen; ++i) {
-      AddEdge(src_data[i], dst_data[0]);
+      AddEdgeInternal(src_data[i], dst_data[0]);
+    }
+    for (int64_t i = 0; i < srclen; ++i) {
+      SyncEdgeIndex(src_data[i]);
     }
   } else {
     // many-many
     CHECK(srclen == dstlen) << "Invalid src and dst id array.";
+    if (num_edges_ == 0) {
+      // bulk load (e.g. unpickling); size the adjacency lists up front
+      std::vector<uint64_t> out_deg(adjlist_.size(), 0), in_deg(adjlist_.size(), 0);
+      for (int64_t i = 0; i < srclen; ++i) {
+        CHECK(HasVertex(src_data[i]) && HasVertex(dst_data[i]))
+          << "Invalid vertices: src=" << src_data[i] << " dst=" << dst_data[i];
+        ++out_deg[src_data[i]];
+        ++in_deg[dst_data[i]];
+      }
+      for (size_t v = 0; v < adjlist_.size(); ++v) {
+        adjlist_[v].succ.reserve(out_deg[v]);
+        adjlist_[v].edge_id.reserve(out_deg[v]);
+        reverse_adjlist_[v].succ.reserve(in_deg[v]);
+        reverse_adjlist_[v].edge_id.reserve(in_deg[v]);
+      }
+      all_edges_src_.reserve(srclen);
+      all_edges_dst_.reserve(srclen);
+    }
     for (int64_t i = 0; i < srclen; ++i) {
-      AddEdge(src_data[i], dst_data[i]);
+      AddEdgeInternal(src_data[i], dst_data[i]);
+    }
+    // update the lookup index once per touched vertex
+    for (int64_t i = 0; i < srclen; ++i) {
+      SyncEdgeIndex(src_data[i]);
+    }
+  }
+}
+
+void Graph::SyncEdgeIndex(dgl_id_t vid) {
+  EdgeList& el = adjlist_[vid];
+  const size_t old_size = el.sorted.size();
+  if (old_size == el.succ.size()
+      || (old_size == 0 && el.succ.size() < kEdgeIndexMinDegree)) {
+    return;
+  }
+  el.sorted.reserve(el.succ.size());
+  for (size_t k = old_size; k < el.succ.size(); ++k) {
+    el.sorted.push_back(k);
+  }
+  const auto& succ = el.succ;
+  auto cmp = [&succ] (dgl_id_t a, dgl_id_t b) { return succ[a] < succ[b]; };
+  // both sort and merge are stable so ties stay in position order
+  el.sorted.MergeTail(old_size, cmp);
+}
+
+void Graph::SyncAllEdgeIndex() {
+  for (dgl_id_t v = 0; v < adjlist_.size(); ++v) {
+    SyncEdgeIndex(v);
+  }
+}
+
+void Graph::MarkEdgeIndexStale(dgl_id_t vid) {
+  const EdgeList& el = adjlist_[vid];
+  // only the first edge the index misses marks the vertex
+  const bool first_missed = el.sorted.empty()
+    ? el.succ.size() == kEdgeIndexMinDegree
+    : el.succ.size() == el.sorted.size() + 1;
+  if (first_missed) {
+    stale_index_.push_back(vid);
+  }
+}
+
+void Graph::SyncStaleEdgeIndex() const {
+  std::lock_guard<std::mutex> lock(index_mutex_.mutex);
+  if (stale_index_.empty()) {
+    return;
+  }
+  // the index is a cache of the out-edges, so updating it keeps the graph
+  // logically const
+  Graph* self = const_cast<Graph*>(this);
+  for (const dgl_id_t vid : stale_index_) {
+    self->SyncEdgeIndex(vid);
+  }
+  stale_index_.clear();
+}
+
+template <typename Fn>
+void Graph::VisitEdgesBetween(dgl_id_t src, dgl_id_t dst, Fn fn) const {
+  const EdgeList& el = adjlist_[src];
+  if (el.sorted.empty()) {
+    for (size_t k = 0; k < el.succ.size(); ++k) {
+      if (el.succ[k] == dst) {
+        fn(el.edge_id[k]);
+      }
+    }
+  } else {
+    const auto& succ = el.succ;
+    auto it = std::lower_bound(el.sorted.begin(), el.sorted.end(), dst,
+        [&succ] (dgl_id_t pos, dgl_id_t v) { return succ[pos] < v; });
+    for (; it != el.sorted.end() && succ[*it] == dst; ++it) {
+      fn(el.edge_id[*it]);
     }
   }
 }
@@ -74,40 +202,43 @@ BoolArray Graph::HasVertices(IdArray vids) const {
   return rst;
 }
 
-// O(E)
 bool Graph::HasEdgeBetween(dgl_id_t src, dgl_id_t dst) const {
+  SyncStaleEdgeIndex();
+  return HasEdgeBetweenImpl(src, dst);
+}
+
+// O(log(deg)) with the edge lookup index, O(deg) otherwise
+bool Graph::HasEdgeBetweenImpl(dgl_id_t src, dgl_id_t dst) const {
   if (!HasVertex(src) || !HasVertex(dst)) return false;
-  const auto& succ = adjlist_[src].succ;
-  return std::find(succ.begin(), succ.end(), dst) != succ.end();
+  const EdgeList& el = adjlist_[src];
+  if (el.sorted.empty()) {
+    return std::find(el.succ.begin(), el.succ.end(), dst) != el.succ.end();
+  }
+  const auto& succ = el.succ;
+  auto it = std::lower_bound(el.sorted.begin(), el.sorted.end(), dst,
+      [&succ] (dgl_id_t pos, dgl_id_t v) { return succ[pos] < v; });
+  return it != el.sorted.end() && succ[*it] == dst;
 }
 
-// O(E*k) pretty slow
 BoolArray Graph::HasEdgesBetween(IdArray src_ids, IdArray dst_ids) const {
   CHECK(IsValidIdArray(src_ids)) << "Invalid src id array.";
   CHECK(IsValidIdArray(dst_ids)) << "Invalid dst id array.";
   const auto srclen = src_ids->shape[0];
   const auto dstlen = dst_ids->shape[0];
   const auto rstlen = std::max(srclen, dstlen);
+  CHECK((srclen == dstlen) || (srclen == 1) || (dstlen == 1))
+    << "Invalid src and dst id array.";
   BoolArray rst = BoolArray::Empty({rstlen}, src_ids->dtype, src_ids->ctx);
   int64_t* rst_data = static_cast<int64_t*>(rst->data);
   const int64_t* src_data = static_cast<int64_t*>(src_ids->data);
   const int64_t* dst_data = static_cast<int64_t*>(dst_ids->data);
-  if (srclen == 1) {
-    // one-many
-    for (int64_t i = 0; i < dstlen; ++i) {
-      rst_data[i] = HasEdgeBetween(src_data[0], dst_data[i])? 1 : 0;
-    }
-  } else if (dstlen == 1) {
-    // many-one
-    for (int64_t i = 0; i < srclen; ++i) {
-      rst_data[i] = HasEdgeBetween(src_data[i], dst_data[0])? 1 : 0;
-    }
-  } else {
-    // many-many
-    CHECK(srclen == dstlen) << "Invalid src and dst id array.";
-    for (int64_t i = 0; i < srclen; ++i) {
-      rst_data[i] = HasEdgeBetween(src_data[i], dst_data[i])? 1 : 0;
-    }
+  // one-many and many-one connections broadcast the single endpoint
+  const int64_t src_stride = (srclen == 1) ? 0 : 1;
+  const int64_t dst_stride = (dstlen == 1) ? 0 : 1;
+  SyncStaleEdgeIndex();
+#pragma omp parallel for if (rstlen >= kParallelLookupMinSize)
+  for (int64_t i = 0; i < rstlen; ++i) {
+    rst_data[i] = HasEdgeBetweenImpl(src_data[i * src_stride], dst_data[i * dst_stride])? 1 : 0;
   }
   return rst;
 }
@@ -118,7 +249,7 @@ IdArray Graph::Predecessors(dgl_id_t vid, uint64_t radius) const {
   CHECK(radius >= 1) << "invalid radius: " << radius;
   std::set<dgl_id_t> vset;
 
-  for (auto& it : reverse_adjlist_[vid].succ)
+  for (dgl_id_t it : reverse_adjlist_[vid].succ)
     vset.insert(it);
 
   const int64_t len = vset.size();
@@ -135,7 +266,7 @@ IdArray Graph::Successors(dgl_id_t vid, uint64_t radius) const {
   CHECK(radius >= 1) << "invalid radius: " << radius;
   std::set<dgl_id_t> vset;
 
-  for (auto& it : adjlist_[vid].succ)
+  for (dgl_id_t it : adjlist_[vid].succ)
     vset.insert(it);
 
   const int64_t len = vset.size();
@@ -150,13 +281,9 @@ IdArray Graph::Successors(dgl_id_t vid, uint64_t radius) const {
 IdArray Graph::EdgeId(dgl_id_t src, dgl_id_t dst) const {
   CHECK(HasVertex(src) && HasVertex(dst)) << "invalid edge: " << src << " -> " << dst;
 
-  const auto& succ = adjlist_[src].succ;
   std::vector<dgl_id_t> edgelist;
-
-  for (size_t i = 0; i < succ.size(); ++i) {
-    if (succ[i] == dst)
-      edgelist.push_back(adjlist_[src].edge_id[i]);
-  }
+  SyncStaleEdgeIndex();
+  VisitEdgesBetween(src, dst, [&edgelist] (dgl_id_t eid) { edgelist.push_back(eid); });
 
   // FIXME: signed?  Also it seems that we are using int64_t everywhere...
   const int64_t len = edgelist.size();
@@ -184,24 +311,30 @@ Graph::EdgeArray Graph::EdgeIds(IdArray src_ids, IdArray dst_ids) const {
   const int64_t dst_stride = (dstlen == 1 && srclen != 1) ? 0 : 1;
   const int64_t* src_data = static_cast<int64_t*>(src_ids->data);
   const int64_t* dst_data = static_cast<int64_t*>(dst_ids->data);
+  const int64_t npairs = std::max(srclen, dstlen);
 
-  std::vector<dgl_id_t> src, dst, eid;
-
-  for (i = 0, j = 0; i < srclen && j < dstlen; i += src_stride, j += dst_stride) {
-    const dgl_id_t src_id = src_data[i], dst_id = dst_data[j];
+  for (i = 0; i < npairs; ++i) {
+    const dgl_id_t src_id = src_data[i * src_stride], dst_id = dst_data[i * dst_stride];
     CHECK(HasVertex(src_id) && HasVertex(dst_id)) <<
         "invalid edge: " << src_id << " -> " << dst_id;
-    const auto& succ = adjlist_[src_id].succ;
-    for (size_t k = 0; k < succ.size(); ++k) {
-      if (succ[k] == dst_id) {
-        src.push_back(src_id);
-        dst.push_back(dst_id);
-        eid.push_back(adjlist_[src_id].edge_id[k]);
-      }
-    }
   }
 
-  int64_t rstlen = src.size();
+  // two passes: count the edges of each pair, then fill them in at the
+  // offsets given by the prefix sum of the counts
+  SyncStaleEdgeIndex();
+  std::vector<int64_t> offsets(npairs + 1, 0);
+#pragma omp parallel for if (npairs >= kParallelLookupMinSize)
+  for (i = 0; i < npairs; ++i) {
+    int64_t count = 0;
+    VisitEdgesBetween(src_data[i * src_stride], dst_data[i * dst_stride],
+                      [&count] (dgl_id_t) { ++count; });
+    offsets[i + 1] = count;
+  }
+  for (j = 0; j < npairs; ++j) {
+    offsets[j + 1] += offsets[j];
+  }
+
+  const int64_t rstlen = offsets[npairs];
   IdArray rst_src = IdArray::Empty({rstlen}, src_ids->dtype, src_ids->ctx);
   IdArray rst_dst = IdArray::Empty({rstlen}, src_ids->dtype, src_ids->ctx);
   IdArray rst_eid = IdArray::Empty({rstlen}, src_ids->dtype, src_ids->ctx);
@@ -209,9 +342,17 @@ Graph::EdgeArray Graph::EdgeIds(IdArray src_ids, IdArray dst_ids) const {
   int64_t* rst_dst_data = static_cast<int64_t*>(rst_dst->data);
   int64_t* rst_eid_data = static_cast<int64_t*>(rst_eid->data);
 
-  std::copy(src.begin(), src.end(), rst_src_data);
-  std::copy(dst.begin(), dst.end(), rst_dst_data);
-  std::copy(eid.begin(), eid.end(), rst_eid_data);
+#pragma omp parallel for if (npairs >= kParallelLookupMinSize)
+  for (i = 0; i < npairs; ++i) {
+    const dgl_id_t src_id = src_data[i * src_stride], dst_id = dst_data[i * dst_stride];
+    int64_t pos = offsets[i];
+    VisitEdgesBetween(src_id, dst_id, [&] (dgl_id_t eid) {
+        rst_src_data[pos] = src_id;
+        rst_dst_data[pos] = dst_id;
+        rst_eid_data[pos] = eid;
+        ++pos;
+      });
+  }
 
   return EdgeArray{rst_src, rst_dst, rst_eid};
 }
@@ -366,8 +507,8 @@ Graph::EdgeArray Graph::Edges(bool sorted) const {
     int64_t* src_ptr = static_cast<int64_t*>(src->data);
     int64_t* dst_ptr = static_cast<int64_t*>(dst->data);
     int64_t* eid_ptr = static_cast<int64_t*>(eid->data);
-    std::copy(all_edges_src_.begin(), all_edges_src_.end(), src_ptr);
-    std::copy(all_edges_dst_.begin(), all_edges_dst_.end(), dst_ptr);
+    all_edges_src_.CopyTo(src_ptr);
+    all_edges_dst_.CopyTo(dst_ptr);
     for (uint64_t eid = 0; eid < num_edges_; ++eid) {
       eid_ptr[eid] = eid;
     }
@@ -416,6 +557,7 @@ Subgraph Graph::VertexSubgraph(IdArray vids) const {
     oldv2newv[vid_data[i]] = i;
   }
   Subgraph rst;
+  rst.graph = Graph(false, id_bits_);
   rst.induced_vertices = vids;
   rst.graph.AddVertices(len);
   for (int64_t i = 0; i < len; ++i) {
@@ -426,10 +568,12 @@ Subgraph Graph::VertexSubgraph(IdArray vids) const {
       if (oldv2newv.count(oldsucc)) {
         const dgl_id_t newsucc = oldv2newv[oldsucc];
         edges.push_back(adjlist_[oldvid].edge_id[j]);
-        rst.graph.AddEdge(newvid, newsucc);
+        rst.graph.AddEdgeInternal(newvid, newsucc);
       }
     }
   }
+  // index the edges once, instead of merging one edge at a time
+  rst.graph.SyncAllEdgeIndex();
   rst.induced_edges = IdArray::Empty({static_cast<int64_t>(edges.size())}, vids->dtype, vids->ctx);
   std::copy(edges.begin(), edges.end(), static_cast<int64_t*>(rst.induced_edges->data));
   return rst;
@@ -453,14 +597,16 @@ Subgraph Graph::EdgeSubgraph(IdArray eids) const {
   }
 
   Subgraph rst;
+  rst.graph = Graph(false, id_bits_);
   rst.induced_edges = eids;
   rst.graph.AddVertices(nodes.size());
 
   for (int64_t i = 0; i < len; ++i) {
     dgl_id_t src_id = all_edges_src_[eid_data[i]];
     dgl_id_t dst_id = all_edges_dst_[eid_data[i]];
-    rst.graph.AddEdge(oldv2newv[src_id], oldv2newv[dst_id]);
+    rst.graph.AddEdgeInternal(oldv2newv[src_id], oldv2newv[dst_id]);
   }
+  rst.graph.SyncAllEdgeIndex();
 
   rst.induced_vertices = IdArray::Empty(
       {static_cast<int64_t>(nodes.size())}, eids->dtype, eids->ctx);
@@ -58,10 +58,18 @@ PackedFunc ConvertSubgraphToPackedFunc(const Subgraph& sg) {
 DGL_REGISTER_GLOBAL("graph_index._CAPI_DGLGraphCreate")
 .set_body([] (DGLArgs args, DGLRetValue* rv) {
     bool multigraph = static_cast<bool>(args[0]);
-    GraphHandle ghandle = new Graph(multigraph);
+    int id_bits = args[1];
+    GraphHandle ghandle = new Graph(multigraph, id_bits);
     *rv = ghandle;
   });
 
+DGL_REGISTER_GLOBAL("graph_index._CAPI_DGLGraphIdBits")
+.set_body([] (DGLArgs args, DGLRetValue* rv) {
+    GraphHandle ghandle = args[0];
+    const Graph* gptr = static_cast<Graph*>(ghandle);
+    *rv = gptr->IdBits();
+  });
+
 DGL_REGISTER_GLOBAL("graph_index._CAPI_DGLGraphFree")
 .set_body([] (DGLArgs args, DGLRetValue* rv) {
     GraphHandle ghandle = args[0];
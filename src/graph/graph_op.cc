@@ -15,31 +15,101 @@ inline bool IsValidIdArray(const IdArray& arr) {
 }  // namespace
 
 Graph GraphOp::LineGraph(const Graph* g, bool backtracking) {
-  Graph lg;
-  lg.AddVertices(g->NumEdges());
-  for (size_t i = 0; i < g->all_edges_src_.size(); ++i) {
-    const auto u = g->all_edges_src_[i];
-    const auto v = g->all_edges_dst_[i];
-    for (size_t j = 0; j < g->adjlist_[v].succ.size(); ++j) {
-      if (backtracking || (!backtracking && g->adjlist_[v].succ[j] != u)) {
-        lg.AddEdge(i, g->adjlist_[v].edge_id[j]);
+  // The line graph is built in CSR order: the out-edges of line graph node i
+  // are the out-edges of dst(i) in g, and get consecutive edge ids. A counting
+  // pass sizes every list so that the fill pass can run in parallel.
+  const int64_t num_nodes = g->NumEdges();
+  const auto& src = g->all_edges_src_;
+  const auto& dst = g->all_edges_dst_;
+  auto is_backtracking = [&] (int64_t i, dgl_id_t succ) {
+    return !backtracking && succ == src[i];
+  };
+
+  // pass 1: out-degrees and their prefix sum
+  std::vector<uint64_t> indptr(num_nodes + 1, 0);
+#pragma omp parallel for
+  for (int64_t i = 0; i < num_nodes; ++i) {
+    const auto& succ = g->adjlist_[dst[i]].succ;
+    uint64_t deg = succ.size();
+    if (!backtracking) {
+      deg -= std::count(succ.begin(), succ.end(), src[i]);
+    }
+    indptr[i + 1] = deg;
+  }
+  for (int64_t i = 0; i < num_nodes; ++i) {
+    indptr[i + 1] += indptr[i];
+  }
+  const uint64_t num_edges = indptr[num_nodes];
+
+  Graph lg(false, g->IdBits());
+  lg.ReserveIds(num_nodes, num_edges);
+  lg.AddVertices(num_nodes);
+  lg.num_edges_ = num_edges;
+  lg.all_edges_src_.resize(num_edges);
+  lg.all_edges_dst_.resize(num_edges);
+
+  // pass 2: out-edge lists and edge arrays
+#pragma omp parallel for
+  for (int64_t i = 0; i < num_nodes; ++i) {
+    const Graph::EdgeList& el = g->adjlist_[dst[i]];
+    Graph::EdgeList& out = lg.adjlist_[i];
+    out.succ.reserve(indptr[i + 1] - indptr[i]);
+    out.edge_id.reserve(indptr[i + 1] - indptr[i]);
+    uint64_t eid = indptr[i];
+    for (size_t k = 0; k < el.succ.size(); ++k) {
+      if (is_backtracking(i, el.succ[k])) {
+        continue;
       }
+      out.succ.push_back(el.edge_id[k]);
+      out.edge_id.push_back(eid);
+      lg.all_edges_src_.Set(eid, i);
+      lg.all_edges_dst_.Set(eid, el.edge_id[k]);
+      ++eid;
     }
+    lg.SyncEdgeIndex(i);
+  }
+
+  // in-edge lists, in edge id order
+  std::vector<uint64_t> in_deg(num_nodes, 0);
+  for (uint64_t e = 0; e < num_edges; ++e) {
+    ++in_deg[lg.all_edges_dst_[e]];
+  }
+  for (int64_t j = 0; j < num_nodes; ++j) {
+    lg.reverse_adjlist_[j].succ.reserve(in_deg[j]);
+    lg.reverse_adjlist_[j].edge_id.reserve(in_deg[j]);
+  }
+  for (uint64_t e = 0; e < num_edges; ++e) {
+    Graph::EdgeList& in = lg.reverse_adjlist_[lg.all_edges_dst_[e]];
+    in.succ.push_back(lg.all_edges_src_[e]);
+    in.edge_id.push_back(e);
   }
 
   return lg;
 }
 
 Graph GraphOp::DisjointUnion(std::vector<const Graph*> graphs) {
-  Graph rst;
+  // the union is stored in 32 bits only if all the inputs are
+  int id_bits = 32;
+  for (const Graph* gr : graphs) {
+    id_bits = std::max(id_bits, gr->IdBits());
+  }
+  Graph rst(false, id_bits);
+  uint64_t num_nodes = 0, num_edges = 0;
+  for (const Graph* gr : graphs) {
+    num_nodes += gr->NumVertices();
+    num_edges += gr->NumEdges();
+  }
+  rst.ReserveIds(num_nodes, num_edges);
   uint64_t cumsum = 0;
   for (const Graph* gr : graphs) {
     rst.AddVertices(gr->NumVertices());
     for (uint64_t i = 0; i < gr->NumEdges(); ++i) {
-      rst.AddEdge(gr->all_edges_src_[i] + cumsum, gr->all_edges_dst_[i] + cumsum);
+      rst.AddEdgeInternal(gr->all_edges_src_[i] + cumsum, gr->all_edges_dst_[i] + cumsum);
     }
     cumsum += gr->NumVertices();
   }
+  // index the edges once, instead of merging one edge at a time
+  rst.SyncAllEdgeIndex();
   return rst;
 }
 
@@ -63,7 +133,7 @@ std::vector<Graph> GraphOp::DisjointPartitionBySizes(const Graph* graph, IdArray
   CHECK_EQ(cumsum[len], graph->NumVertices())
     << "Sum of the given sizes must equal to the number of nodes.";
   dgl_id_t node_offset = 0, edge_offset = 0;
-  std::vector<Graph> rst(len);
+  std::vector<Graph> rst(len, Graph(false, graph->IdBits()));
   for (int64_t i = 0; i < len; ++i) {
     // copy adj
     rst[i].adjlist_.insert(rst[i].adjlist_.end(),
@@ -76,15 +146,15 @@ std::vector<Graph> GraphOp::DisjointPartitionBySizes(const Graph* graph, IdArray
     size_t num_edges = 0;
     for (auto& elist : rst[i].adjlist_) {
       for (size_t j = 0; j < elist.succ.size(); ++j) {
-        elist.succ[j] -= node_offset;
-        elist.edge_id[j] -= edge_offset;
+        elist.succ.Set(j, elist.succ[j] - node_offset);
+        elist.edge_id.Set(j, elist.edge_id[j] - edge_offset);
       }
       num_edges += elist.succ.size();
     }
     for (auto& elist : rst[i].reverse_adjlist_) {
       for (size_t j = 0; j < elist.succ.size(); ++j) {
-        elist.succ[j] -= node_offset;
-        elist.edge_id[j] -= edge_offset;
+        elist.succ.Set(j, elist.succ[j] - node_offset);
+        elist.edge_id.Set(j, elist.edge_id[j] - edge_offset);
       }
     }
     // copy edges
@@ -0,0 +1,358 @@
+/*!
+ *  Copyright (c) 2018 by Contributors
+ * \file graph/sampler.cc
+ * \brief Edge neighborhood and negative sampling for link prediction
+ */
+#include <dgl/graph.h>
+#include <algorithm>
+#include <unordered_map>
+#include <vector>
+#include "../c_api_common.h"
+
+using dgl::runtime::DGLArgs;
+using dgl::runtime::DGLArgValue;
+using dgl::runtime::DGLRetValue;
+using dgl::runtime::PackedFunc;
+using dgl::runtime::NDArray;
+
+namespace dgl {
+namespace sampling {
+namespace {
+
+/*!
+ * \brief Hash a 64-bit counter into a pseudo random number (SplitMix64).
+ *
+ * Random numbers are derived from (seed, counter) pairs, so the result of a
+ * call does not depend on the number of threads.
+ */
+inline uint64_t Hash(uint64_t x) {
+  x += 0x9e3779b97f4a7c15ULL;
+  x = (x ^ (x >> 30)) * 0xbf58476d1ce4e5b9ULL;
+  x = (x ^ (x >> 27)) * 0x94d049bb133111ebULL;
+  return x ^ (x >> 31);
+}
+
+/*! \brief Sequential random number stream. */
+class RandomStream {
+ public:
+  explicit RandomStream(uint64_t seed) : state_(Hash(seed)) {}
+
+  /*! \return a random integer in [0, n) */
+  uint64_t RandInt(uint64_t n) {
+    state_ = Hash(state_);
+    return state_ % n;
+  }
+
+ private:
+  uint64_t state_;
+};
+
+/*! \brief Fenwick tree over non-negative integer weights. */
+class FenwickTree {
+ public:
+  explicit FenwickTree(int64_t n) : tree_(n + 1, 0) {
+    for (log_ = 1; (int64_t{1} << log_) <= n; ++log_) {}
+  }
+
+  void Add(int64_t i, int64_t delta) {
+    total_ += delta;
+    for (++i; i < static_cast<int64_t>(tree_.size()); i += i & (-i)) {
+      tree_[i] += delta;
+    }
+  }
+
+  int64_t Total() const {
+    return total_;
+  }
+
+  /*! \return the smallest i such that the sum of the weights up to i is
+   *  larger than target */
+  int64_t Find(int64_t target) const {
+    int64_t pos = 0;
+    for (int b = log_; b >= 0; --b) {
+      const int64_t next = pos + (int64_t{1} << b);
+      if (next < static_cast<int64_t>(tree_.size()) && tree_[next] <= target) {
+        pos = next;
+        target -= tree_[next];
+      }
+    }
+    return pos;
+  }
+
+ private:
+  std::vector<int64_t> tree_;
+  int64_t total_ = 0;
+  int log_;
+};
+
+/*!
+ * \brief The edges incident to each vertex, ignoring the edge direction.
+ *
+ * Edge e has two slots, 2e for its source and 2e+1 for its destination.
+ * Slots are stored per vertex in CSR order. It is built once per sampler
+ * and shared by all the samples, which only read it.
+ */
+struct Incidence {
+  std::vector<dgl_id_t> src, dst;
+  std::vector<int64_t> indptr;
+  std::vector<int64_t> slots;
+  /*! \brief the position of each slot in slots */
+  std::vector<int64_t> slot_pos;
+  /*! \brief the vertices with at least one incident edge */
+  std::vector<dgl_id_t> nonisolated;
+
+  explicit Incidence(const Graph& graph) {
+    const auto edges = graph.Edges(false);
+    const int64_t num_edges = graph.NumEdges();
+    const int64_t num_nodes = graph.NumVertices();
+    const int64_t* src_data = static_cast<int64_t*>(edges.src->data);
+    const int64_t* dst_data = static_cast<int64_t*>(edges.dst->data);
+    const int64_t* eid_data = static_cast<int64_t*>(edges.id->data);
+    src.resize(num_edges);
+    dst.resize(num_edges);
+    for (int64_t i = 0; i < num_edges; ++i) {
+      src[eid_data[i]] = src_data[i];
+      dst[eid_data[i]] = dst_data[i];
+    }
+    indptr.assign(num_nodes + 1, 0);
+    for (int64_t e = 0; e < num_edges; ++e) {
+      ++indptr[src[e] + 1];
+      ++indptr[dst[e] + 1];
+    }
+    for (int64_t v = 0; v < num_nodes; ++v) {
+      indptr[v + 1] += indptr[v];
+    }
+    std::vector<int64_t> fill(indptr.begin(), indptr.end() - 1);
+    slots.resize(2 * num_edges);
+    for (int64_t e = 0; e < num_edges; ++e) {
+      slots[fill[src[e]]++] = 2 * e;
+      slots[fill[dst[e]]++] = 2 * e + 1;
+    }
+    slot_pos.resize(2 * num_edges);
+    for (int64_t p = 0; p < 2 * num_edges; ++p) {
+      slot_pos[slots[p]] = p;
+    }
+    for (int64_t v = 0; v < num_nodes; ++v) {
+      if (indptr[v + 1] > indptr[v]) {
+        nonisolated.push_back(v);
+      }
+    }
+  }
+
+  int64_t NumEdges() const {
+    return src.size();
+  }
+
+  int64_t Degree(dgl_id_t v) const {
+    return indptr[v + 1] - indptr[v];
+  }
+
+  dgl_id_t Endpoint(int64_t slot) const {
+    return (slot & 1) ? dst[slot >> 1] : src[slot >> 1];
+  }
+};
+
+/*! \brief One sampled subgraph with its negative edges. */
+struct LinkSample {
+  std::vector<dgl_id_t> nodes;
+  std::vector<dgl_id_t> eid;
+  std::vector<dgl_id_t> src, dst;
+  std::vector<dgl_id_t> neg_src, neg_dst;
+};
+
+/*!
+ * \brief Sample edges by growing a neighborhood.
+ *
+ * Each step picks a vertex with probability proportional to its number of
+ * unpicked incident edges among the vertices seen so far (any vertex with
+ * unpicked edges, uniformly, if none is left), then picks one of its
+ * unpicked edges uniformly. Both endpoints become seen.
+ *
+ * The unpicked slots of a vertex are kept in front of its slots by swaps.
+ * The swapped positions and the vertex counts that differ from the shared
+ * incidence are kept in hash maps, so a sample costs O(sample_size) time
+ * and memory instead of O(|V| + |E|), unless it runs out of vertices with
+ * unpicked edges next to the seen ones and most vertices are exhausted.
+ */
+std::vector<dgl_id_t> SampleEdgeNeighborhood(
+    const Incidence& inc, int64_t sample_size, uint64_t seed) {
+  std::unordered_map<int64_t, int64_t> slot_at, pos_of, alive;
+  // seen vertices are numbered in the order they are seen
+  std::unordered_map<dgl_id_t, int64_t> seen;
+  std::vector<dgl_id_t> seen_order;
+  FenwickTree seen_weight(2 * sample_size);
+  auto get_slot = [&] (int64_t p) {
+    const auto it = slot_at.find(p);
+    return it == slot_at.end() ? inc.slots[p] : it->second;
+  };
+  auto get_pos = [&] (int64_t slot) {
+    const auto it = pos_of.find(slot);
+    return it == pos_of.end() ? inc.slot_pos[slot] : it->second;
+  };
+  auto num_alive = [&] (dgl_id_t v) {
+    const auto it = alive.find(v);
+    return it == alive.end() ? inc.Degree(v) : it->second;
+  };
+  auto remove_slot = [&] (int64_t slot) {
+    const dgl_id_t w = inc.Endpoint(slot);
+    const int64_t n = num_alive(w);
+    const int64_t last = inc.indptr[w] + n - 1;
+    const int64_t p = get_pos(slot);
+    const int64_t last_slot = get_slot(last);
+    slot_at[p] = last_slot;
+    pos_of[last_slot] = p;
+    slot_at[last] = slot;
+    pos_of[slot] = last;
+    alive[w] = n - 1;
+    const auto it = seen.find(w);
+    if (it != seen.end()) {
+      seen_weight.Add(it->second, -1);
+    }
+  };
+  auto see = [&] (dgl_id_t v) {
+    if (seen.find(v) == seen.end()) {
+      seen[v] = seen_order.size();
+      seen_order.push_back(v);
+      seen_weight.Add(seen[v], num_alive(v));
+    }
+  };
+
+  RandomStream rng(seed);
+  std::vector<dgl_id_t> edges(sample_size);
+  for (int64_t i = 0; i < sample_size; ++i) {
+    dgl_id_t v;
+    if (seen_weight.Total() > 0) {
+      v = seen_order[seen_weight.Find(rng.RandInt(seen_weight.Total()))];
+    } else {
+      // uniform among the vertices with unpicked edges, by rejection over
+      // the non-isolated ones; fall back to listing them if most are done
+      const auto& cand = inc.nonisolated;
+      v = cand[rng.RandInt(cand.size())];
+      for (int t = 0; t < 64 && num_alive(v) == 0; ++t) {
+        v = cand[rng.RandInt(cand.size())];
+      }
+      if (num_alive(v) == 0) {
+        std::vector<dgl_id_t> left;
+        for (const dgl_id_t u : cand) {
+          if (num_alive(u) > 0) {
+            left.push_back(u);
+          }
+        }
+        v = left[rng.RandInt(left.size())];
+      }
+    }
+    see(v);
+    const int64_t slot = get_slot(inc.indptr[v] + rng.RandInt(num_alive(v)));
+    const dgl_id_t e = slot >> 1;
+    remove_slot(2 * e);
+    remove_slot(2 * e + 1);
+    see(inc.Endpoint(slot ^ 1));
+    edges[i] = e;
+  }
+  return edges;
+}
+
+/*! \brief Relabel the sampled edges and corrupt them into negative edges. */
+void MakeLinkSample(const Incidence& inc, std::vector<dgl_id_t> eid,
+                    int64_t negative_rate, bool degree_corrupt, uint64_t seed,
+                    LinkSample* sample) {
+  const int64_t num_edges = eid.size();
+  auto& nodes = sample->nodes;
+  nodes.reserve(2 * num_edges);
+  for (const dgl_id_t e : eid) {
+    nodes.push_back(inc.src[e]);
+    nodes.push_back(inc.dst[e]);
+  }
+  std::sort(nodes.begin(), nodes.end());
+  nodes.erase(std::unique(nodes.begin(), nodes.end()), nodes.end());
+  auto relabel = [&nodes] (dgl_id_t v) {
+    return std::lower_bound(nodes.begin(), nodes.end(), v) - nodes.begin();
+  };
+  sample->src.resize(num_edges);
+  sample->dst.resize(num_edges);
+  std::vector<int64_t> degree_cumsum(nodes.size(), 0);
+  for (int64_t i = 0; i < num_edges; ++i) {
+    sample->src[i] = relabel(inc.src[eid[i]]);
+    sample->dst[i] = relabel(inc.dst[eid[i]]);
+    ++degree_cumsum[sample->src[i]];
+    ++degree_cumsum[sample->dst[i]];
+  }
+  for (size_t v = 1; v < nodes.size(); ++v) {
+    degree_cumsum[v] += degree_cumsum[v - 1];
+  }
+  sample->eid = std::move(eid);
+
+  // negative i corrupts either end of positive i % num_edges
+  const int64_t num_neg = negative_rate * num_edges;
+  const int64_t num_nodes = nodes.size();
+  const int64_t total_degree = 2 * num_edges;
+  sample->neg_src.resize(num_neg);
+  sample->neg_dst.resize(num_neg);
+#pragma omp parallel for
+  for (int64_t i = 0; i < num_neg; ++i) {
+    const uint64_t r = Hash(seed ^ Hash(i));
+    dgl_id_t v;
+    if (degree_corrupt) {
+      const int64_t target = (r >> 1) % total_degree;
+      v = std::upper_bound(degree_cumsum.begin(), degree_cumsum.end(), target)
+        - degree_cumsum.begin();
+    } else {
+      v = (r >> 1) % num_nodes;
+    }
+    const int64_t pos = i % num_edges;
+    sample->neg_src[i] = (r & 1) ? v : sample->src[pos];
+    sample->neg_dst[i] = (r & 1) ? sample->dst[pos] : v;
+  }
+}
+
+}  // namespace
+
+DGL_REGISTER_GLOBAL("contrib.sampling.link_sampler._CAPI_DGLEdgeNeighborhoodIncidenceCreate")
+.set_body([] (DGLArgs args, DGLRetValue* rv) {
+    GraphHandle ghandle = args[0];
+    const Graph* gptr = static_cast<Graph*>(ghandle);
+    void* handle = new Incidence(*gptr);
+    *rv = handle;
+  });
+
+DGL_REGISTER_GLOBAL("contrib.sampling.link_sampler._CAPI_DGLEdgeNeighborhoodIncidenceFree")
+.set_body([] (DGLArgs args, DGLRetValue* rv) {
+    void* handle = args[0];
+    delete static_cast<Incidence*>(handle);
+  });
+
+DGL_REGISTER_GLOBAL("contrib.sampling.link_sampler._CAPI_DGLEdgeNeighborhoodSample")
+.set_body([] (DGLArgs args, DGLRetValue* rv) {
+    void* handle = args[0];
+    const Incidence& inc = *static_cast<Incidence*>(handle);
+    const int64_t sample_size = args[1];
+    const int64_t num_samples = args[2];
+    const int64_t negative_rate = args[3];
+    const bool degree_corrupt = args[4];
+    const uint64_t seed = static_cast<int64_t>(args[5]);
+    // the index of the first sample, to derive the seed of each sample
+    const int64_t first = args[6];
+    CHECK_LE(sample_size, inc.NumEdges())
+      << "Cannot sample " << sample_size << " edges out of " << inc.NumEdges();
+    std::vector<LinkSample> samples(num_samples);
+#pragma omp parallel for
+    for (int64_t i = 0; i < num_samples; ++i) {
+      const uint64_t sample_seed = Hash(seed + Hash(first + i));
+      auto eid = SampleEdgeNeighborhood(inc, sample_size, sample_seed);
+      MakeLinkSample(inc, std::move(eid), negative_rate, degree_corrupt,
+                     Hash(sample_seed), &samples[i]);
+    }
+    std::vector<NDArray> ret;
+    for (const auto& sample : samples) {
+      ret.push_back(CopyVectorToNDArray(sample.nodes));
+      ret.push_back(CopyVectorToNDArray(sample.eid));
+      ret.push_back(CopyVectorToNDArray(sample.src));
+      ret.push_back(CopyVectorToNDArray(sample.dst));
+      ret.push_back(CopyVectorToNDArray(sample.neg_src));
+      ret.push_back(CopyVectorToNDArray(sample.neg_dst));
+    }
+    *rv = ConvertNDArrayVectorToPackedFunc(ret);
+  });
+
+}  // namespace sampling
+}  // namespace dgl
@@ -4,52 +4,226 @@
  * \brief DGL Scheduler implementation
  */
 #include <dgl/scheduler.h>
-#include <unordered_map>
+#ifdef _OPENMP
+#include <omp.h>
+#endif
+#include <algorithm>
 #include <vector>
 
 namespace dgl {
 namespace sched {
 
+namespace {
+/*!
+ * \brief Use node ids directly as local ids if they span at most this many
+ *        times the number of ids in the input; relabel them otherwise.
+ */
+constexpr int64_t kDenseIdRatio = 4;
+/*! \brief Minimal number of messages or nodes to bucket them in parallel. */
+constexpr int64_t kParallelMinMsgs = 1 << 16;
+/*! \brief Empty slot of the relabeling table; node ids are non-negative. */
+constexpr int64_t kEmpty = -1;
+
+/*!
+ * \brief Open addressing hash table that assigns consecutive local ids to
+ *        node ids in the order they are first seen.
+ */
+class IdRelabel {
+  public:
+    explicit IdRelabel(int64_t expected_size) {
+        int64_t capacity = 16;
+        while (capacity < 2 * expected_size) {
+            capacity <<= 1;
+        }
+        Resize(capacity);
+    }
+
+    /*! \brief Return the local id of the node, assigning a new one if unseen. */
+    int64_t operator()(int64_t id, std::vector<int64_t>* local_to_id) {
+        int64_t slot = Find(id);
+        if (keys_[slot] != id) {
+            if (2 * (local_to_id->size() + 1) > keys_.size()) {
+                Resize(keys_.size() * 2);
+                slot = Find(id);
+            }
+            keys_[slot] = id;
+            values_[slot] = local_to_id->size();
+            local_to_id->push_back(id);
+        }
+        return values_[slot];
+    }
+
+  private:
+    int64_t Find(int64_t id) const {
+        const uint64_t mask = keys_.size() - 1;
+        // fibonacci hashing spreads consecutive ids over the table
+        uint64_t slot = (static_cast<uint64_t>(id) * 11400714819323198485ull) & mask;
+        while (keys_[slot] != kEmpty && keys_[slot] != id) {
+            slot = (slot + 1) & mask;
+        }
+        return slot;
+    }
+
+    void Resize(int64_t capacity) {
+        std::vector<int64_t> keys(capacity, kEmpty), values(capacity);
+        keys_.swap(keys);
+        values_.swap(values);
+        for (size_t i = 0; i < keys.size(); ++i) {
+            if (keys[i] != kEmpty) {
+                const int64_t slot = Find(keys[i]);
+                keys_[slot] = keys[i];
+                values_[slot] = values[i];
+            }
+        }
+    }
+
+    std::vector<int64_t> keys_, values_;
+};
+
+/*!
+ * \brief Number of chunks the messages are split into for counting.
+ *
+ * Each chunk is counted by one thread into its own histogram of the local
+ * node ids, so the histograms together hold at most one entry per message.
+ */
+int NumChunks(int64_t n_msgs, int64_t n_local) {
+#ifdef _OPENMP
+    if (n_msgs < kParallelMinMsgs) {
+        return 1;
+    }
+    const int64_t n_chunks = std::min<int64_t>(omp_get_max_threads(),
+                                               n_msgs / std::max<int64_t>(n_local, 1));
+    return static_cast<int>(std::max<int64_t>(n_chunks, 1));
+#else
+    return 1;
+#endif
+}
+}  // namespace
+
 std::vector<IdArray> DegreeBucketing(const IdArray& msg_ids, const IdArray& vids,
         const IdArray& recv_ids) {
-    auto n_msgs = msg_ids->shape[0];
+    const int64_t n_msgs = msg_ids->shape[0];
+    const int64_t n_recv = recv_ids->shape[0];
 
     const int64_t* vid_data = static_cast<int64_t*>(vids->data);
     const int64_t* msg_id_data = static_cast<int64_t*>(msg_ids->data);
     const int64_t* recv_id_data = static_cast<int64_t*>(recv_ids->data);
 
-    // in edge: dst->msgs
-    std::unordered_map<int64_t, std::vector<int64_t>> in_edges;
+    // map node ids to a dense local range [0, n_local)
+    int64_t max_id = -1;
     for (int64_t i = 0; i < n_msgs; ++i) {
-        in_edges[vid_data[i]].push_back(msg_id_data[i]);
+        max_id = std::max(max_id, vid_data[i]);
+    }
+    for (int64_t i = 0; i < n_recv; ++i) {
+        max_id = std::max(max_id, recv_id_data[i]);
+    }
+    const bool dense = max_id < kDenseIdRatio * (n_msgs + n_recv) + 1;
+    int64_t n_local = max_id + 1;
+    std::vector<int64_t> msg_local, recv_local, local_to_id;
+    if (!dense) {
+        IdRelabel relabel(n_recv);
+        msg_local.resize(n_msgs);
+        for (int64_t i = 0; i < n_msgs; ++i) {
+            msg_local[i] = relabel(vid_data[i], &local_to_id);
+        }
+        recv_local.resize(n_recv);
+        for (int64_t i = 0; i < n_recv; ++i) {
+            recv_local[i] = relabel(recv_id_data[i], &local_to_id);
+        }
+        n_local = local_to_id.size();
+        vid_data = msg_local.data();
+        recv_id_data = recv_local.data();
     }
+    auto global_id = [&] (int64_t v) { return dense ? v : local_to_id[v]; };
 
-    // bkt: deg->dsts
-    std::unordered_map<int64_t, std::vector<int64_t>> bkt;
-    for (const auto& it : in_edges) {
-        bkt[it.second.size()].push_back(it.first);
+    // count the messages of each node per chunk of messages, and keep the
+    // nodes in the order they first appear in each chunk
+    const int n_chunks = NumChunks(n_msgs, n_local);
+    auto chunk_begin = [&] (int c) { return n_msgs * c / n_chunks; };
+    std::vector<std::vector<int64_t>> chunk_count(n_chunks);
+    std::vector<std::vector<int64_t>> chunk_dsts(n_chunks);
+#pragma omp parallel for schedule(static, 1) if (n_chunks > 1)
+    for (int c = 0; c < n_chunks; ++c) {
+        std::vector<int64_t>& count = chunk_count[c];
+        count.assign(n_local, 0);
+        for (int64_t i = chunk_begin(c); i < chunk_begin(c + 1); ++i) {
+            if (++count[vid_data[i]] == 1) {
+                chunk_dsts[c].push_back(vid_data[i]);
+            }
+        }
+    }
+    // in-degree of each node; the chunk counts become the number of
+    // messages of the node in the previous chunks
+    std::vector<int64_t> in_deg(n_local);
+#pragma omp parallel for if (n_chunks > 1)
+    for (int64_t v = 0; v < n_local; ++v) {
+        int64_t deg = 0;
+        for (int c = 0; c < n_chunks; ++c) {
+            const int64_t count = chunk_count[c][v];
+            chunk_count[c][v] = deg;
+            deg += count;
+        }
+        in_deg[v] = deg;
+    }
+    // the destinations in the order they first appear
+    std::vector<int64_t> dsts;
+    int64_t max_deg = 0;
+    for (int c = 0; c < n_chunks; ++c) {
+        for (const int64_t dst : chunk_dsts[c]) {
+            if (chunk_count[c][dst] == 0) {
+                dsts.push_back(dst);
+                max_deg = std::max(max_deg, in_deg[dst]);
+            }
+        }
     }
+    const int64_t n_dst = dsts.size();
 
-    std::unordered_set<int64_t> zero_deg_nodes;
-    for (int64_t i = 0; i < recv_ids->shape[0]; ++i) {
-        if (in_edges.find(recv_id_data[i]) == in_edges.end()) {
-            zero_deg_nodes.insert(recv_id_data[i]);
+    // counting sort of the destinations by degree; the buckets are in
+    // ascending degree order and each keeps the order of first appearance
+    std::vector<int64_t> deg_count(max_deg + 1, 0);
+    for (const int64_t dst : dsts) {
+        ++deg_count[in_deg[dst]];
+    }
+    int64_t n_bkt = 0;
+    std::vector<int64_t> deg_pos(max_deg + 1, 0);
+    for (int64_t deg = 1, pos = 0; deg <= max_deg; ++deg) {
+        deg_pos[deg] = pos;
+        pos += deg_count[deg];
+        n_bkt += deg_count[deg] > 0;
+    }
+    // position of each destination in nids, and the first message slot of
+    // each node in mids
+    std::vector<int64_t> sorted_dsts(n_dst);
+    std::vector<int64_t> msg_pos(n_local, 0);
+    for (const int64_t dst : dsts) {
+        sorted_dsts[deg_pos[in_deg[dst]]++] = dst;
+    }
+    for (int64_t i = 0, pos = 0; i < n_dst; ++i) {
+        msg_pos[sorted_dsts[i]] = pos;
+        pos += in_deg[sorted_dsts[i]];
+    }
+
+    // zero degree nodes, deduplicated in the order of recv_ids
+    std::vector<int64_t> zero_deg_nodes;
+    for (int64_t i = 0; i < n_recv; ++i) {
+        const int64_t v = recv_id_data[i];
+        if (in_deg[v] == 0) {
+            zero_deg_nodes.push_back(v);
+            in_deg[v] = -1;  // mark as seen
         }
     }
-    auto n_zero_deg = zero_deg_nodes.size();
+    const int64_t n_zero_deg = zero_deg_nodes.size();
 
     // calc output size
-    int64_t n_deg = bkt.size();
-    int64_t n_dst = in_edges.size();
-    int64_t n_mid_sec = bkt.size();  // zero deg won't affect message size
+    int64_t n_deg = n_bkt;
+    int64_t n_mid_sec = n_bkt;  // zero deg won't affect message size
     if (n_zero_deg > 0) {
         n_deg += 1;
-        n_dst += n_zero_deg;
     }
 
     // initialize output
     IdArray degs = IdArray::Empty({n_deg}, vids->dtype, vids->ctx);
-    IdArray nids = IdArray::Empty({n_dst}, vids->dtype, vids->ctx);
+    IdArray nids = IdArray::Empty({n_dst + n_zero_deg}, vids->dtype, vids->ctx);
     IdArray nid_section = IdArray::Empty({n_deg}, vids->dtype, vids->ctx);
     IdArray mids = IdArray::Empty({n_msgs}, vids->dtype, vids->ctx);
     IdArray mid_section = IdArray::Empty({n_mid_sec}, vids->dtype, vids->ctx);
@@ -59,26 +233,33 @@ std::vector<IdArray> DegreeBucketing(const IdArray& msg_ids, const IdArray& vids
     int64_t* mid_ptr = static_cast<int64_t*>(mids->data);
     int64_t* msec_ptr = static_cast<int64_t*>(mid_section->data);
 
-    // fill in bucketing ordering
-    for (const auto& it : bkt) {  // for each bucket
-        const int64_t deg = it.first;
-        const int64_t bucket_size = it.second.size();
-        *deg_ptr++ = deg;
-        *nsec_ptr++ = bucket_size;
-        *msec_ptr++ = deg * bucket_size;
-        for (const auto dst : it.second) {  // for each dst in this bucket
-            *nid_ptr++ = dst;
-            for (const auto mid : in_edges[dst]) {  // for each in edge of dst
-                *mid_ptr++ = mid;
-            }
+    for (int64_t deg = 1; deg <= max_deg; ++deg) {
+        if (deg_count[deg] > 0) {
+            *deg_ptr++ = deg;
+            *nsec_ptr++ = deg_count[deg];
+            *msec_ptr++ = deg * deg_count[deg];
         }
     }
-
     if (n_zero_deg > 0) {
         *deg_ptr = 0;
         *nsec_ptr = n_zero_deg;
-        for (const auto dst : zero_deg_nodes) {
-            *nid_ptr++ = dst;
+    }
+
+#pragma omp parallel for if (n_dst >= kParallelMinMsgs)
+    for (int64_t i = 0; i < n_dst; ++i) {
+        nid_ptr[i] = global_id(sorted_dsts[i]);
+    }
+    for (int64_t i = 0; i < n_zero_deg; ++i) {
+        nid_ptr[n_dst + i] = global_id(zero_deg_nodes[i]);
+    }
+    // stable scatter of the messages into the slots of their destinations,
+    // each chunk starts after the messages of the previous chunks
+#pragma omp parallel for schedule(static, 1) if (n_chunks > 1)
+    for (int c = 0; c < n_chunks; ++c) {
+        std::vector<int64_t>& cursor = chunk_count[c];
+        for (int64_t i = chunk_begin(c); i < chunk_begin(c + 1); ++i) {
+            const int64_t v = vid_data[i];
+            mid_ptr[msg_pos[v] + cursor[v]++] = msg_id_data[i];
         }
     }
 
@@ -89,7 +270,7 @@ std::vector<IdArray> DegreeBucketing(const IdArray& msg_ids, const IdArray& vids
     ret.push_back(std::move(mids));
     ret.push_back(std::move(mid_section));
 
-    return std::move(ret);
+    return ret;
 }
 
 }  // namespace sched
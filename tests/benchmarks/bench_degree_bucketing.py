@@ -0,0 +1,118 @@
+"""Benchmark degree bucketing of the recv scheduler.
+
+Times the C++ degree bucketing used by ``recv``/``send_and_recv`` for random
+messages over dense and sparse (large) destination ids, and checks the
+buckets against a numpy reference.
+
+With ``--baseline``, also times a Python port of the previous bucketing,
+which grouped the messages in a hash map of vectors and the destinations in
+a hash map keyed by degree. The port pays the Python overhead on top of the
+hash maps, so it only bounds the old implementation from above.
+
+Usage::
+
+    python bench_degree_bucketing.py [--num-msgs N] [--num-nodes N] [--repeat R]
+                                     [--baseline]
+"""
+import argparse
+import time
+import numpy as np
+import dgl.utils as utils
+from dgl.runtime.degree_bucketing import _degree_bucketing_schedule
+
+def reference(mids, dsts, recv):
+    """Degree bucketing in numpy. Returns {deg: (nids, mids)}."""
+    order = np.argsort(dsts, kind='stable')
+    uniq, counts = np.unique(dsts, return_counts=True)
+    msgs = np.split(mids[order], np.cumsum(counts)[:-1])
+    buckets = {}
+    for deg in np.unique(counts):
+        sel = np.nonzero(counts == deg)[0]
+        buckets[deg] = (uniq[sel], np.concatenate([msgs[i] for i in sel]))
+    zero = np.setdiff1d(recv, uniq)
+    if len(zero) > 0:
+        buckets[0] = (zero, np.zeros(0, dtype=np.int64))
+    return buckets
+
+def hash_map_bucketing(mids, dsts, recv):
+    """Port of the previous unordered_map bucketing, in the same output
+    format as ``_degree_bucketing_schedule``."""
+    in_edges = {}
+    for mid, dst in zip(mids.tolist(), dsts.tolist()):
+        in_edges.setdefault(dst, []).append(mid)
+    bkt = {}
+    for dst, msgs in in_edges.items():
+        bkt.setdefault(len(msgs), []).append(dst)
+    zero_deg_nodes = set(v for v in recv.tolist() if v not in in_edges)
+    degs, nids, msg_ids = [], [], []
+    for deg, vs in bkt.items():
+        degs.append(deg)
+        nids.append(utils.toindex(vs))
+        msg_ids.append(utils.toindex([mid for v in vs for mid in in_edges[v]]))
+    if len(zero_deg_nodes) > 0:
+        zero_deg_nodes = utils.toindex(list(zero_deg_nodes))
+    else:
+        zero_deg_nodes = None
+    return None, degs, nids, msg_ids, zero_deg_nodes
+
+def check(result, mids, dsts, recv):
+    _, degs, nids, msg_ids, zero_deg_nodes = result
+    expected = reference(mids, dsts, recv)
+    got = {}
+    for deg, v, m in zip(degs, nids, msg_ids):
+        v = v.tonumpy()
+        m = m.tonumpy().reshape(len(v), deg)
+        order = np.argsort(v)
+        got[deg] = (v[order], m[order].reshape(-1))
+    if zero_deg_nodes is not None:
+        got[0] = (np.sort(zero_deg_nodes.tonumpy()), np.zeros(0, dtype=np.int64))
+    assert sorted(got.keys()) == sorted(expected.keys())
+    for deg, (v, m) in expected.items():
+        assert np.array_equal(got[deg][0], v)
+        # messages of a node keep their input order
+        assert np.array_equal(got[deg][1], m)
+
+def timeit(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.time()
+        fn()
+        times.append(time.time() - t0)
+    return min(times)
+
+def bench(name, dsts, recv, repeat, baseline):
+    mids = np.arange(len(dsts), dtype=np.int64)
+    mids_idx = utils.toindex(mids)
+    dsts_idx = utils.toindex(dsts)
+    recv_idx = utils.toindex(recv)
+    result = _degree_bucketing_schedule(mids_idx, dsts_idx, recv_idx)
+    check(result, mids, dsts, recv)
+    t = timeit(lambda: _degree_bucketing_schedule(mids_idx, dsts_idx, recv_idx), repeat)
+    print('%-8s msgs=%-10d buckets=%-5d time=%.3fs'
+          % (name, len(dsts), len(result[1]), t))
+    if baseline:
+        check(hash_map_bucketing(mids, dsts, recv), mids, dsts, recv)
+        t = timeit(lambda: hash_map_bucketing(mids, dsts, recv), repeat)
+        print('%-8s msgs=%-10d buckets=%-5d time=%.3fs (hash map baseline)'
+              % (name, len(dsts), len(result[1]), t))
+
+def main(args):
+    np.random.seed(0)
+    n, m = args.num_nodes, args.num_msgs
+    # power-law-ish in-degrees so that there are many buckets
+    dsts = (np.random.pareto(1.5, m) * n / 100).astype(np.int64) % n
+    recv = np.unique(np.concatenate([dsts, np.random.randint(0, n, 1000)]))
+    bench('dense', dsts, recv, args.repeat, args.baseline)
+    # same structure with ids spread over a huge range
+    ids = np.unique(np.random.randint(0, 1 << 40, 2 * n))[:n]
+    np.random.shuffle(ids)
+    bench('sparse', ids[dsts], np.unique(ids[recv]), args.repeat, args.baseline)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Degree bucketing benchmark')
+    parser.add_argument('--num-msgs', type=int, default=10000000)
+    parser.add_argument('--num-nodes', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', action='store_true',
+                        help='also time the previous hash map bucketing')
+    main(parser.parse_args())
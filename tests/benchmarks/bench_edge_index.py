@@ -0,0 +1,54 @@
+"""Benchmark the edge lookup index of hub vertices.
+
+Times adding edges one by one to a hub vertex, followed by a lookup that
+indexes them, then building a node subgraph, an edge subgraph and a
+disjoint union of the resulting star, and checks the edge ids of the
+lookups.
+
+Usage::
+
+    python bench_edge_index.py [--num-edges M]
+"""
+import argparse
+import time
+import numpy as np
+from dgl.graph_index import create_graph_index, disjoint_union
+from dgl.utils import toindex
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num-edges', type=int, default=100000)
+    args = parser.parse_args()
+
+    m = args.num_edges
+    gi = create_graph_index(multigraph=True)
+    gi.add_nodes(m + 1)
+    dst = np.random.permutation(np.arange(1, m + 1))
+    t0 = time.time()
+    for v in dst:
+        gi.add_edge(0, int(v))
+    t1 = time.time()
+    query = np.random.randint(1, m + 1, 1000)
+    eid = gi.edge_ids(toindex(np.zeros(len(query), dtype=np.int64)), toindex(query))[2]
+    t2 = time.time()
+    assert np.array_equal(eid.tonumpy(), np.argsort(dst)[query - 1])
+    print('add_edge x %d: %.3fs, first lookup: %.3fs' % (m, t1 - t0, t2 - t1))
+
+    t0 = time.time()
+    sub = gi.node_subgraph(toindex(np.arange(m + 1)))
+    t1 = time.time()
+    esub = gi.edge_subgraph(toindex(np.arange(m)))
+    t2 = time.time()
+    union = disjoint_union([gi, gi])
+    t3 = time.time()
+    src = toindex(np.zeros(len(query), dtype=np.int64))
+    for g in [sub, union]:
+        eid = g.edge_ids(src, toindex(query))[2]
+        assert np.array_equal(eid.tonumpy(), np.argsort(dst)[query - 1])
+    # the edge subgraph numbers the leaves in edge order
+    assert np.array_equal(esub.edge_ids(src, toindex(query))[2].tonumpy(), query - 1)
+    print('node_subgraph: %.3fs, edge_subgraph: %.3fs, disjoint_union: %.3fs'
+          % (t1 - t0, t2 - t1, t3 - t2))
+
+if __name__ == '__main__':
+    main()
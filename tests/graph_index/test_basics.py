@@ -2,6 +2,7 @@ from dgl import DGLError
 from dgl.utils import toindex
 from dgl.graph_index import create_graph_index
 import networkx as nx
+import numpy as np
 
 def test_edge_id():
     gi = create_graph_index(multigraph=False)
@@ -150,8 +151,131 @@ def test_create_from_elist():
         print(u, v, g.edge_id(u, v)[0])
         assert g.edge_id(u, v)[0] == i
 
+def test_edge_id_hub():
+    # hub vertices use the sorted edge lookup index
+    n = 300
+    gi = create_graph_index(multigraph=True)
+    gi.add_nodes(n)
+    dst = np.random.randint(0, n, 1000)
+    gi.add_edges(toindex([0]), toindex(dst[:500]))
+    for v in dst[500:700]:
+        gi.add_edge(0, int(v))
+    gi.add_edges(toindex(np.zeros(300, dtype=np.int64)), toindex(dst[700:]))
+    # non-hub edges
+    gi.add_edges(toindex([1, 2, 2]), toindex([3, 4, 4]))
+
+    for v in range(n):
+        expected = np.nonzero(dst == v)[0]
+        assert np.array_equal(gi.edge_id(0, v).tonumpy(), expected)
+        assert gi.has_edge_between(0, v) == (len(expected) > 0)
+
+    query = np.random.randint(0, n, 2000)
+    src, dst2, eid = gi.edge_ids(toindex(np.zeros(2000, dtype=np.int64)), toindex(query))
+    expected = np.concatenate([np.nonzero(dst == v)[0] for v in query])
+    assert np.array_equal(eid.tonumpy(), expected)
+    assert np.array_equal(dst2.tonumpy(), dst[expected])
+    has = gi.has_edges_between(toindex([0]), toindex(query)).tonumpy()
+    assert np.array_equal(has, np.isin(query, dst).astype(np.int64))
+    assert np.array_equal(gi.edge_id(2, 4).tonumpy(), [1001, 1002])
+
+def test_add_edge_hub():
+    # edges added one by one to a hub are indexed at the next lookup
+    n = 500
+    gi = create_graph_index(multigraph=True)
+    gi.add_nodes(n)
+    dst = np.random.randint(0, n, 3000)
+    for i, v in enumerate(dst):
+        gi.add_edge(0, int(v))
+        if i % 500 in (0, 63, 64):
+            w = int(dst[i // 2])
+            assert np.array_equal(gi.edge_id(0, w).tonumpy(),
+                                  np.nonzero(dst[:i + 1] == w)[0])
+    query = np.random.randint(0, n, 2000)
+    eid = gi.edge_ids(toindex(np.zeros(2000, dtype=np.int64)), toindex(query))[2]
+    expected = np.concatenate([np.nonzero(dst == v)[0] for v in query])
+    assert np.array_equal(eid.tonumpy(), expected)
+    gi.add_edge(0, 1)
+    has = gi.has_edges_between(toindex([0]), toindex(query)).tonumpy()
+    assert np.array_equal(has, np.isin(query, np.append(dst, 1)).astype(np.int64))
+    assert gi.has_edge_between(0, 1)
+    assert gi.edge_id(0, 1).tonumpy()[-1] == len(dst)
+
+def test_int32_graph():
+    import pickle
+    from dgl.graph_index import disjoint_union, disjoint_partition
+    n = 200
+    src = np.random.randint(0, n, 2000)
+    dst = np.random.randint(0, n, 2000)
+    # a hub with an edge lookup index
+    src[:100] = 0
+    g64 = create_graph_index(multigraph=True)
+    g32 = create_graph_index(multigraph=True, index_dtype='int32')
+    assert g64.index_dtype() == 'int64'
+    assert g32.index_dtype() == 'int32'
+    for g in [g64, g32]:
+        g.add_nodes(n)
+        g.add_edges(toindex(src), toindex(dst))
+        g.add_edge(1, 2)
+
+    def _check(a, b):
+        for x, y in zip(a.edges(), b.edges()):
+            assert np.array_equal(x.tonumpy(), y.tonumpy())
+        assert a.number_of_nodes() == b.number_of_nodes()
+        v = toindex(np.arange(a.number_of_nodes()))
+        for x, y in zip(a.in_edges(v), b.in_edges(v)):
+            assert np.array_equal(x.tonumpy(), y.tonumpy())
+
+    _check(g64, g32)
+    for v in range(n):
+        assert np.array_equal(g32.edge_id(0, v).tonumpy(), g64.edge_id(0, v).tonumpy())
+    _check(g64.line_graph(False), g32.line_graph(False))
+    assert g32.line_graph().index_dtype() == 'int32'
+    sub = g32.node_subgraph(toindex(np.arange(50)))
+    assert sub.index_dtype() == 'int32'
+    _check(g64.node_subgraph(toindex(np.arange(50))), sub)
+    union = disjoint_union([g32, g32])
+    assert union.index_dtype() == 'int32'
+    assert disjoint_union([g32, g64]).index_dtype() == 'int64'
+    for part in disjoint_partition(union, 2):
+        assert part.index_dtype() == 'int32'
+        _check(g64, part)
+    g = pickle.loads(pickle.dumps(g32))
+    assert g.index_dtype() == 'int32'
+    _check(g64, g)
+
+def test_subgraph_hub():
+    from dgl.graph_index import disjoint_union
+    # a star whose hub has an edge lookup index; subgraphs and unions must
+    # carry the index over with the right edge ids (see
+    # tests/benchmarks/bench_edge_index.py for the timing)
+    n = 2000
+    gi = create_graph_index(multigraph=True)
+    gi.add_nodes(n)
+    leaves = np.random.permutation(np.arange(1, n))
+    gi.add_edges(toindex([0]), toindex(leaves))
+    gi.add_edges(toindex(leaves[:10]), toindex([0]))
+    sub = gi.node_subgraph(toindex(np.arange(n)))
+    esub = gi.edge_subgraph(toindex(np.arange(gi.number_of_edges())))
+    union = disjoint_union([gi, gi])
+    assert sub.number_of_edges() == n - 1 + 10
+    assert esub.number_of_edges() == n - 1 + 10
+    assert union.number_of_edges() == 2 * (n - 1 + 10)
+    query = np.random.randint(1, n, 100)
+    for g in [sub, union]:
+        eid = g.edge_ids(toindex(np.zeros(100, dtype=np.int64)), toindex(query))[2]
+        assert np.array_equal(eid.tonumpy(), np.argsort(leaves)[query - 1])
+    # the edge subgraph numbers the leaves in edge order
+    eid = esub.edge_ids(toindex(np.zeros(100, dtype=np.int64)), toindex(query))[2]
+    assert np.array_equal(eid.tonumpy(), query - 1)
+    assert np.array_equal(union.edge_id(n, n + leaves[3]).tonumpy(),
+                          [gi.number_of_edges() + 3])
+
 if __name__ == '__main__':
     test_edge_id()
     test_nx()
     test_predsucc()
     test_create_from_elist()
+    test_edge_id_hub()
+    test_add_edge_hub()
+    test_int32_graph()
+    test_subgraph_hub()
@@ -254,6 +254,21 @@ def test_apply_nodes():
     u = th.tensor([0, 3, 4, 6])
     g.apply_nodes(lambda nodes : {'h' : nodes.data['h'] * 0.}, u)
     assert U.allclose(g.ndata['h'][u], th.zeros((4, D)))
+    # whole-frame applies read and replace the columns by reference
+    new = th.randn(10, D)
+    def _replace(nodes):
+        assert nodes.data['h'] is g.ndata['h']
+        return {'h' : new}
+    g.apply_nodes(_replace, inplace=True)
+    assert g.ndata['h'] is new
+    g.apply_nodes(lambda nodes : {'h' : new + 1})
+    assert U.allclose(g.ndata['h'], new + 1)
+    # the returned columns are still checked against the number of nodes
+    try:
+        g.apply_nodes(lambda nodes : {'h' : th.zeros(3, D)})
+        assert False
+    except dgl.DGLError:
+        pass
 
 def test_apply_edges():
     def _upd(edges):
@@ -268,6 +283,12 @@ def test_apply_edges():
     g.apply_edges(lambda edges : {'w' : edges.data['w'] * 0.}, (u, v))
     eid = g.edge_ids(u, v)
     assert U.allclose(g.edata['w'][eid], th.zeros((6, D)))
+    new = th.randn(17, D)
+    def _replace(edges):
+        assert edges.data['w'] is g.edata['w']
+        return {'w' : new}
+    g.apply_edges(_replace)
+    assert g.edata['w'] is new
 
 def test_update_routines():
     g = generate_graph()
@@ -584,6 +605,85 @@ def test_dynamic_addition():
     g.edges[4].data['h1'] = th.randn(1, D)
     assert g.edata['h1'].shape[0] == g.edata['h2'].shape[0] == 5
 
+def test_pending_messages():
+    g = DGLGraph()
+    g.add_nodes(4)
+    g.add_edges([0, 1, 2, 3], [1, 2, 1, 2])
+    g.edata['a'] = th.arange(4).float().view(4, 1)
+
+    def _message(edges):
+        return {'m': edges.data['a']}
+    def _reduce(nodes):
+        return {'h': nodes.mailbox['m'].sum(1)}
+
+    g.ndata['h'] = th.zeros(4, 1)
+    # the later send on an edge replaces its message
+    g.send([0, 1], _message)
+    g.edata['a'] = g.edata['a'] * 10
+    g.send([1, 2, 2], _message)
+    assert len(g._msg_store) == 3
+    # messages to other nodes stay pending
+    g.recv(1, _reduce)
+    assert U.allclose(g.ndata['h'][1], th.tensor([20.]))
+    assert len(g._msg_store) == 1
+    g.recv(2, _reduce)
+    assert U.allclose(g.ndata['h'][2], th.tensor([10.]))
+    assert len(g._msg_store) == 0
+    assert g._msg_store.frame.num_rows == 0
+
+    # the message frame does not grow in send loops
+    for _ in range(10):
+        g.send(message_func=_message)
+        g.send([0, 2], _message)
+    assert len(g._msg_store) == 4
+    assert g._msg_store.frame.num_rows <= 8
+    g.recv(g.nodes(), _reduce)
+    assert U.allclose(g.ndata['h'], th.tensor([[0.], [20.], [40.], [0.]]))
+
+def test_degree_norm():
+    g = DGLGraph()
+    g.add_nodes(4)
+    g.add_edges([0, 0, 1, 2], [1, 2, 2, 2])
+    in_deg = th.tensor([0., 1., 3., 0.])
+    out_deg = th.tensor([2., 1., 1., 0.])
+    src_norm, dst_norm = g.degree_norm('right')
+    assert U.allclose(src_norm, th.ones(4))
+    assert U.allclose(dst_norm, th.tensor([0., 1., 1. / 3, 0.]))
+    src_norm, dst_norm = g.degree_norm('left')
+    assert U.allclose(src_norm, th.tensor([.5, 1., 1., 0.]))
+    assert U.allclose(dst_norm, th.ones(4))
+    src_norm, dst_norm = g.degree_norm()
+    assert U.allclose(src_norm, th.tensor([.5 ** .5, 1., 1., 0.]))
+    assert U.allclose(dst_norm, th.tensor([0., 1., 3. ** -.5, 0.]))
+    # cached, and the caller cannot modify the cache
+    src_norm[0] = 100.
+    assert U.allclose(g.degree_norm()[0], th.tensor([.5 ** .5, 1., 1., 0.]))
+    assert 'degree_norm_both' in g._graph._cache
+    # invalidated on mutation
+    g.add_edges([3, 3], [3, 0])
+    src_norm, dst_norm = g.degree_norm('right')
+    assert U.allclose(dst_norm, th.tensor([1., 1., 1. / 3, 1.]))
+    assert U.allclose(g.in_degrees(), th.tensor([1, 1, 3, 1]))
+    assert U.allclose(g.out_degrees(), th.tensor([2, 1, 1, 2]))
+    # the caller cannot modify the cached degrees either
+    deg = g.in_degrees()
+    deg += 100
+    deg = g.out_degrees()
+    deg += 100
+    assert U.allclose(g.in_degrees(), th.tensor([1, 1, 3, 1]))
+    assert U.allclose(g.out_degrees(), th.tensor([2, 1, 1, 2]))
+    src_norm, dst_norm = g.degree_norm('right')
+    assert U.allclose(dst_norm, th.tensor([1., 1., 1. / 3, 1.]))
+    try:
+        g.degree_norm('none')
+        fail = True
+    except dgl.DGLError:
+        fail = False
+    assert not fail
+    # per-relation in-degrees
+    etype = th.tensor([0, 1, 1, 0, 1, 1])
+    assert U.allclose(g.typed_in_degrees(etype),
+                      th.tensor([1, 2, 2, 1, 1, 1]))
 
 if __name__ == '__main__':
     test_nx_conversion()
@@ -600,3 +700,5 @@ if __name__ == '__main__':
     test_pull_0deg()
     test_send_multigraph()
     test_dynamic_addition()
+    test_pending_messages()
+    test_degree_norm()
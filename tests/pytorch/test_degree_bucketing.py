@@ -0,0 +1,77 @@
+import numpy as np
+import torch as th
+import dgl
+import dgl.utils as utils
+from dgl.runtime.degree_bucketing import _degree_bucketing_schedule, ContentKey
+
+def _bucketing(mids, dsts, recv):
+    return _degree_bucketing_schedule(utils.toindex(mids), utils.toindex(dsts),
+                                      utils.toindex(recv))
+
+def _check(offset):
+    dsts = np.array([3, 1, 3, 0, 3, 1, 5]) + offset
+    mids = np.array([10, 11, 12, 13, 14, 15, 16])
+    recv = np.array([0, 1, 2, 3, 4, 5]) + offset
+    _, degs, nids, msg_ids, zero_deg_nodes = _bucketing(mids, dsts, recv)
+    # buckets in ascending degree; nodes in order of first message
+    assert list(degs) == [1, 2, 3]
+    assert [list(v.tonumpy() - offset) for v in nids] == [[0, 5], [1], [3]]
+    # messages of each node keep their order
+    assert [list(m.tonumpy()) for m in msg_ids] == [[13, 16], [11, 15], [10, 12, 14]]
+    assert list(zero_deg_nodes.tonumpy() - offset) == [2, 4]
+
+def test_degree_bucketing():
+    _check(0)
+    # sparse ids are relabeled
+    _check(1 << 40)
+
+def test_degree_bucketing_no_zero_deg():
+    _, degs, nids, msg_ids, zero_deg_nodes = _bucketing(
+            np.arange(4), np.array([7, 7, 2, 7]), np.array([2, 7]))
+    assert list(degs) == [1, 3]
+    assert [list(v.tonumpy()) for v in nids] == [[2], [7]]
+    assert [list(m.tonumpy()) for m in msg_ids] == [[2], [0, 1, 3]]
+    assert zero_deg_nodes is None
+
+def _message(edges):
+    return {'m' : edges.src['h']}
+
+def _reduce(nodes):
+    return {'h' : nodes.mailbox['m'].sum(1)}
+
+def test_plan_cache():
+    g = dgl.DGLGraph()
+    g.add_nodes(6)
+    g.add_edges([0, 1, 2, 3, 4, 0], [1, 2, 1, 1, 2, 5])
+    g.ndata['h'] = th.arange(6).float()
+    g.update_all(_message, _reduce)
+    plans = g._graph._cache['degree_bucketing']
+    assert list(plans.keys()) == ['update_all']
+    g.ndata['h'] = th.arange(6).float()
+    g.update_all(_message, _reduce)
+    assert g._graph._cache['degree_bucketing'] is plans
+    assert len(plans) == 1
+    assert th.equal(g.ndata['h'], th.tensor([0., 5., 5., 0., 0., 0.]))
+    # calls on the same edges share a plan
+    g.send_and_recv(([0, 2], [1, 1]), _message, _reduce)
+    g.send_and_recv(([0, 2], [1, 1]), _message, _reduce)
+    assert len(plans) == 2
+    g.send_and_recv(([0], [5]), _message, _reduce)
+    assert len(plans) == 3
+    # content keys compare the ids, not only their digests
+    key = ContentKey(utils.toindex([1, 1]), utils.toindex([1]))
+    assert key == ContentKey(utils.toindex([1, 1]), utils.toindex([1]))
+    assert key in plans
+    assert key != ContentKey(utils.toindex([1, 2]), utils.toindex([1, 2]))
+    assert key != 'update_all'
+    # mutation drops the plans
+    g.add_edge(5, 3)
+    assert 'degree_bucketing' not in g._graph._cache
+    g.ndata['h'] = th.arange(6).float()
+    g.update_all(_message, _reduce)
+    assert th.equal(g.ndata['h'], th.tensor([0., 5., 5., 5., 0., 0.]))
+
+if __name__ == '__main__':
+    test_degree_bucketing()
+    test_degree_bucketing_no_zero_deg()
+    test_plan_cache()
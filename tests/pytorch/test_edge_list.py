@@ -0,0 +1,74 @@
+import os
+import tempfile
+import numpy as np
+import dgl
+import dgl.data as data
+
+def _random_edges(n, m):
+    src = np.random.randint(0, n, (m,))
+    dst = np.random.randint(0, n, (m,))
+    # make sure the largest node shows up
+    src[-1] = n - 1
+    return src, dst
+
+def _write_text(path, src, dst, delimiter=' '):
+    with open(path, 'w') as f:
+        f.write('# comment line\n')
+        for u, v in zip(src, dst):
+            f.write('%d%s%d%s1.0\n' % (u, delimiter, v, delimiter))
+
+def _check_edges(g, src, dst):
+    u, v, eid = g._graph.edges()
+    assert np.array_equal(eid.tonumpy(), np.arange(len(src)))
+    assert np.array_equal(u.tonumpy(), src)
+    assert np.array_equal(v.tonumpy(), dst)
+
+def test_load_edge_list():
+    src, dst = _random_edges(50, 1000)
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'edges.txt')
+    _write_text(path, src, dst, '\t')
+    g = data.load_edge_list(path, multigraph=True, block_size=77, delimiter='\t')
+    assert g.number_of_nodes() == 50
+    _check_edges(g, src, dst)
+
+    path = os.path.join(tmpdir, 'edges.bin')
+    np.stack([src, dst], 1).astype(np.int32).tofile(path)
+    g = data.load_edge_list(path, num_nodes=60, multigraph=True,
+                            block_size=100, fmt='binary', dtype=np.int32)
+    assert g.number_of_nodes() == 60
+    _check_edges(g, src, dst)
+
+def test_text_id_columns():
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'edges.txt')
+    # ids beyond 2^53 are not exact as floats; extra columns are skipped
+    with open(path, 'w') as f:
+        f.write('9007199254740993 1 0.5 a\n3 4 1.5 b\n')
+    src, dst = next(data.iter_edge_blocks(path))
+    assert src.dtype == np.int64
+    assert src.tolist() == [9007199254740993, 3]
+    assert dst.tolist() == [1, 4]
+
+def test_csr_store():
+    src, dst = _random_edges(50, 1000)
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'edges.txt')
+    _write_text(path, src, dst)
+    store = data.build_csr_store(path, os.path.join(tmpdir, 'csr'), block_size=64)
+    assert store.number_of_nodes() == 50
+    assert store.number_of_edges() == 1000
+    for v in range(50):
+        succ, eid = store.out_edges(v)
+        expected = np.nonzero(src == v)[0]
+        assert np.array_equal(eid, expected)
+        assert np.array_equal(succ, dst[expected])
+    # reopen from disk and build a graph
+    store = data.CSRStore(os.path.join(tmpdir, 'csr'))
+    g = store.to_graph(multigraph=True, block_size=100)
+    _check_edges(g, src, dst)
+
+if __name__ == '__main__':
+    test_load_edge_list()
+    test_text_id_columns()
+    test_csr_store()
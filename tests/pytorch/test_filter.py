@@ -35,6 +35,57 @@ def test_filter():
     e_idx = g.filter_edges(predicate, [0, 1])
     assert set(e_idx.numpy()) == {1}
 
+def test_filter_blocks():
+    g = DGLGraph()
+    g.add_nodes(100)
+    src = np.random.randint(0, 100, 500)
+    dst = np.random.randint(0, 100, 500)
+    g.add_edges(src, dst)
+    g.ndata['a'] = th.randn(100)
+    g.edata['a'] = th.randn(500)
+
+    def n_pred(nodes):
+        return nodes.data['a'] > 0
+
+    def e_pred(edges):
+        return (edges.src['a'] > 0) & (edges.data['a'] < edges.dst['a'])
+
+    n_ans = np.nonzero(g.ndata['a'].numpy() > 0)[0]
+    a = g.ndata['a'].numpy()
+    e_ans = np.nonzero((a[src] > 0) & (g.edata['a'].numpy() < a[dst]))[0]
+    query = np.random.permutation(100)[:40]
+    e_query = np.random.permutation(500)[:200]
+    for block_size in [None, 1, 7, 1000]:
+        for num_workers in [0, 3]:
+            n_idx = g.filter_nodes(n_pred, block_size=block_size,
+                                   num_workers=num_workers)
+            assert np.array_equal(n_idx.numpy(), n_ans)
+            n_idx = g.filter_nodes(n_pred, th.tensor(query), block_size=block_size,
+                                   num_workers=num_workers)
+            assert np.array_equal(n_idx.numpy(), query[a[query] > 0])
+            e_idx = g.filter_edges(e_pred, block_size=block_size,
+                                   num_workers=num_workers)
+            assert np.array_equal(e_idx.numpy(), e_ans)
+            e_idx = g.filter_edges(e_pred, e_query, block_size=block_size,
+                                   num_workers=num_workers)
+            assert np.array_equal(e_idx.numpy(), e_query[np.isin(e_query, e_ans)])
+
+    # non-contiguous frames of a subgraph
+    sg = g.subgraph([5, 1, 3, 8])
+    sg.copy_from_parent()
+    ans = np.nonzero(a[[5, 1, 3, 8]] > 0)[0]
+    assert np.array_equal(sg.filter_nodes(n_pred, block_size=3).numpy(), ans)
+
+    # empty graph
+    assert len(DGLGraph().filter_nodes(n_pred)) == 0
+
+    # the whole set is one batch by default, for batch statistics
+    def mean_pred(nodes):
+        assert len(nodes) == 100
+        return nodes.data['a'] > nodes.data['a'].mean()
+    n_idx = g.filter_nodes(mean_pred)
+    assert np.array_equal(n_idx.numpy(), np.nonzero(a > a.mean())[0])
 
 if __name__ == '__main__':
     test_filter()
+    test_filter_blocks()
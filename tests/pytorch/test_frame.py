@@ -1,7 +1,10 @@
 import torch as th
 from torch.autograd import Variable
 import numpy as np
-from dgl.frame import Frame, FrameRef
+import os
+import tempfile
+import dgl
+from dgl.frame import Frame, FrameRef, MMapColumn
 from dgl.utils import Index, toindex
 import utils as U
 
@@ -305,6 +308,39 @@ def test_add_rows():
     ans = th.cat([th.zeros(4, 5), th.ones(4, 5)])
     assert U.allclose(f1['y'], ans)
 
+def test_mmap_column():
+    path = os.path.join(tempfile.mkdtemp(), 'feat.npy')
+    data = np.random.randn(100, D).astype(np.float32)
+    np.save(path, data)
+    col = MMapColumn(path, page_size=8, cache_pages=4)
+    assert len(col) == 100
+    assert col.shape == (D,)
+    rows = toindex([3, 97, 3, 50, 51, 99])
+    assert U.allclose(col[rows], th.tensor(data[[3, 97, 3, 50, 51, 99]]))
+    assert U.allclose(col[slice(10, 20)], th.tensor(data[10:20]))
+    assert col.misses == 3
+    col[toindex([50])]
+    assert col.hits == 1
+    # reads over more pages than the cache holds
+    many = np.random.randint(0, 100, 50)
+    assert U.allclose(col[toindex(many)], th.tensor(data[many]))
+    assert len(col._cache) <= 4
+    # no cache
+    col = MMapColumn(path, cache_pages=0)
+    assert U.allclose(col[rows], th.tensor(data[[3, 97, 3, 50, 51, 99]]))
+    # read-only
+    assert check_fail(lambda: col.update(rows, th.zeros(6, D), False))
+
+    # attach to a graph and write through
+    g = dgl.DGLGraph()
+    g.add_nodes(100)
+    g.ndata['h'] = MMapColumn(path, mode='r+')
+    assert U.allclose(g.nodes[[1, 2]].data['h'], th.tensor(data[[1, 2]]))
+    g.nodes[[1, 2]].data['h'] = th.zeros(2, D)
+    assert U.allclose(g.nodes[[1, 2, 3]].data['h'],
+                      th.cat([th.zeros(2, D), th.tensor(data[[3]])]))
+    assert np.all(np.load(path)[[1, 2]] == 0)
+
 if __name__ == '__main__':
     test_create()
     test_column1()
@@ -319,3 +355,4 @@ if __name__ == '__main__':
     test_sharing()
     test_slicing()
     test_add_rows()
+    test_mmap_column()
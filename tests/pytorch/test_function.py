@@ -49,7 +49,105 @@ def test_src_mul_edge():
     assert U.allclose(g.ndata['h'],
             th.tensor([100., 1., 1., 1., 1., 1., 1., 1., 1., 284.]))
 
+def test_src_mul_typed_weight():
+    g = generate_graph()
+    g.ndata['x'] = th.randn(10, 4)
+    g.edata['type'] = th.tensor([0, 2, 1, 1, 0, 0, 2, 2, 1, 0, 0, 1, 2, 2, 0, 0, 1])
+    g.edata['norm'] = th.rand(17, 1)
+    weight = th.randn(4, 4, 3, requires_grad=True)  # type 3 is not used
+    def _mfunc(edges):
+        w = weight[edges.data['type']]
+        m = th.bmm(edges.src['x'].unsqueeze(1), w).squeeze(1)
+        return {'m' : m * edges.data['norm']}
+    g.update_all(_mfunc, fn.sum(msg='m', out='y1'))
+    y1 = g.ndata['y1']
+    grad1, = th.autograd.grad(y1.sum(), weight)
+    g.update_all(fn.src_mul_typed_weight(src='x', type='type', weight=weight,
+                                         out='m', edge='norm'),
+                 fn.sum(msg='m', out='y2'))
+    y2 = g.ndata['y2']
+    grad2, = th.autograd.grad(y2.sum(), weight)
+    assert U.allclose(y1, y2)
+    assert U.allclose(grad1, grad2)
+    # with a reduce UDF and on a subset of the edges
+    g.send_and_recv([0, 4, 9], fn.src_mul_typed_weight(
+        src='x', type='type', weight=weight, out='m'),
+        lambda nodes : {'y3' : th.sum(nodes.mailbox['m'], 1)})
+    u, v = g.find_edges([0, 4, 9])
+    ans = th.stack([g.ndata['x'][u[i]] @ weight[g.edata['type'][e]]
+                    for i, e in enumerate([0, 4, 9])])
+    assert U.allclose(g.ndata['y3'][v], ans)
+    # the grouping of the whole graph is cached until the types are set again
+    plans = g._graph._cache['typed_weight']
+    spmv_plan = plans[('spmv', 'type')]
+    g.update_all(fn.src_mul_typed_weight(src='x', type='type', weight=weight,
+                                         out='m', edge='norm'),
+                 fn.sum(msg='m', out='y2'))
+    assert plans[('spmv', 'type')] is spmv_plan
+    g.edata['type'] = th.flip(g.edata['type'], [0])
+    g.update_all(_mfunc, fn.sum(msg='m', out='y1'))
+    g.update_all(fn.src_mul_typed_weight(src='x', type='type', weight=weight,
+                                         out='m', edge='norm'),
+                 fn.sum(msg='m', out='y2'))
+    assert plans[('spmv', 'type')] is not spmv_plan
+    assert U.allclose(g.ndata['y1'], g.ndata['y2'])
+    # with a reduce UDF on the whole graph, and a builtin sum on a subset
+    g.update_all(fn.src_mul_typed_weight(src='x', type='type', weight=weight,
+                                         out='m', edge='norm'),
+                 lambda nodes : {'y2' : th.sum(nodes.mailbox['m'], 1)})
+    assert ('order', 'type') in plans
+    assert U.allclose(g.ndata['y1'], g.ndata['y2'])
+    g.send_and_recv([0, 4, 9], fn.src_mul_typed_weight(
+        src='x', type='type', weight=weight, out='m', edge='norm'),
+        fn.sum(msg='m', out='y4'))
+    ans = th.stack([g.ndata['x'][u[i]] @ weight[g.edata['type'][e]]
+                    * g.edata['norm'][e] for i, e in enumerate([0, 4, 9])])
+    assert U.allclose(g.ndata['y4'][v], ans)
+
+def test_src_embedding():
+    g = generate_graph()
+    g.ndata['id'] = th.tensor([3, 1, 4, 1, 5, 9, 2, 6, 5, 3])
+    g.edata['type'] = th.tensor([0, 2, 1, 1, 0, 0, 2, 2, 1, 0, 0, 1, 2, 2, 0, 0, 1])
+    g.edata['norm'] = th.rand(17, 1)
+    table = th.randn(3, 12, 4, requires_grad=True)
+    def _mfunc(edges):
+        m = table[edges.data['type'], edges.src['id']]
+        return {'m' : m * edges.data['norm']}
+    g.update_all(_mfunc, fn.sum(msg='m', out='y1'))
+    y1 = g.ndata['y1']
+    grad1, = th.autograd.grad(y1.sum(), table)
+    mfunc = fn.src_embedding(src='id', table=table, out='m', type='type',
+                             edge='norm')
+    g.update_all(mfunc, fn.sum(msg='m', out='y2'))
+    y2 = g.ndata['y2']
+    grad2, = th.autograd.grad(y2.sum(), table)
+    assert U.allclose(y1, y2)
+    assert U.allclose(grad1, grad2)
+    # sparse gradient of the table without types
+    table = th.randn(12, 4, requires_grad=True)
+    g.update_all(fn.src_embedding(src='id', table=table, out='m',
+                                  sparse_grad=True),
+                 fn.sum(msg='m', out='y2'))
+    grad, = th.autograd.grad(g.ndata['y2'].sum(), table)
+    assert grad.is_sparse
+    g.update_all(lambda edges : {'m' : table[edges.src['id']]},
+                 fn.sum(msg='m', out='y1'))
+    ref, = th.autograd.grad(g.ndata['y1'].sum(), table)
+    assert U.allclose(g.ndata['y1'], g.ndata['y2'])
+    assert U.allclose(grad.to_dense(), ref)
+    # on a subset of the edges, and with a reduce UDF
+    g.send_and_recv([0, 4, 9], fn.src_embedding(src='id', table=table, out='m'),
+                    fn.sum(msg='m', out='y3'))
+    g.send_and_recv([0, 4, 9], lambda edges : {'m' : table[edges.src['id']]},
+                    fn.sum(msg='m', out='y4'))
+    assert U.allclose(g.ndata['y3'], g.ndata['y4'])
+    g.update_all(fn.src_embedding(src='id', table=table, out='m'),
+                 lambda nodes : {'y3' : th.sum(nodes.mailbox['m'], 1)})
+    assert U.allclose(g.ndata['y3'], g.ndata['y1'])
+
 if __name__ == '__main__':
     test_copy_src()
     test_copy_edge()
     test_src_mul_edge()
+    test_src_mul_typed_weight()
+    test_src_embedding()
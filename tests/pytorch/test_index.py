@@ -86,6 +86,38 @@ def test_index():
     assert np.allclose(ans, y2)
     assert np.allclose(ans, y3)
 
+def test_zerocopy():
+    dgl.utils.reset_copy_stats()
+    # numpy -> user tensor -> dgl ndarray share the same buffer
+    a = np.arange(10, dtype=np.int64)
+    idx = toindex(a)
+    assert idx.tonumpy().ctypes.data == a.ctypes.data
+    # the user's array is not written through the index
+    assert not idx.tonumpy().flags.writeable
+    assert a.flags.writeable
+    assert idx.tousertensor().data_ptr() == a.ctypes.data
+    # dgl ndarray -> numpy
+    idx = toindex(idx.todgltensor())
+    assert idx.tonumpy().ctypes.data == a.ctypes.data
+    # user tensor -> numpy
+    t = th.arange(10)
+    idx = toindex(t)
+    assert idx.tonumpy().ctypes.data == t.data_ptr()
+    assert idx.tousertensor(th.device('cpu')) is t
+    assert len(dgl.utils.copy_stats()) == 0
+
+def test_int32_index():
+    ans = np.arange(10, dtype=np.int64)
+    for data in [th.arange(10, dtype=th.int32),
+                 np.arange(10, dtype=np.int32),
+                 nd.array(np.arange(10, dtype=np.int32))]:
+        idx = toindex(data)
+        assert idx.tonumpy().dtype == np.int64
+        assert np.array_equal(idx.tonumpy(), ans)
+        assert idx.tousertensor().dtype == th.int64
+
 if __name__ == '__main__':
     test_dlpack()
     test_index()
+    test_zerocopy()
+    test_int32_index()
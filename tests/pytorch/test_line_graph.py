@@ -39,6 +39,29 @@ def test_no_backtracking():
         assert not L.has_edge_between(e1, e2)
         assert not L.has_edge_between(e2, e1)
 
+def test_line_graph_edges():
+    # random multigraph with self loops and reciprocal edges
+    np.random.seed(42)
+    src = np.random.randint(0, 20, 200)
+    dst = np.random.randint(0, 20, 200)
+    G = dgl.DGLGraph(multigraph=True)
+    G.add_nodes(20)
+    G.add_edges(src, dst)
+    for backtracking in [True, False]:
+        expected = [(i, j) for i in range(200) for j in range(200)
+                    if dst[i] == src[j] and (backtracking or dst[j] != src[i])]
+        L = G.line_graph(backtracking=backtracking)
+        u, v, eid = L._graph.edges()
+        assert np.array_equal(eid.tonumpy(), np.arange(len(expected)))
+        assert list(zip(u.tonumpy(), v.tonumpy())) == expected
+        # in-edges are in edge id order
+        for j in [0, 57, 199]:
+            u, v, eid = L._graph.in_edges(dgl.utils.toindex([j]))
+            ids = [k for k, e in enumerate(expected) if e[1] == j]
+            assert list(eid.tonumpy()) == ids
+            assert list(u.tonumpy()) == [expected[k][0] for k in ids]
+
 if __name__ == '__main__':
     test_line_graph()
     test_no_backtracking()
+    test_line_graph_edges()
@@ -0,0 +1,62 @@
+import torch as th
+import numpy as np
+import dgl
+from dgl.contrib.sampling import EdgeNeighborhoodSampler
+
+def generate_graph():
+    g = dgl.DGLGraph()
+    g.add_nodes(100)
+    # a ring, plus random chords
+    u = np.arange(100)
+    g.add_edges(u, (u + 1) % 100)
+    g.add_edges(np.random.randint(0, 100, 200), np.random.randint(0, 100, 200))
+    return g
+
+def check_sample(g, s, sample_size, negative_rate):
+    eid = s.edges.numpy()
+    assert len(eid) == sample_size
+    assert len(np.unique(eid)) == sample_size
+    # relabeled ends
+    nodes = s.nodes.numpy()
+    assert np.all(nodes[1:] > nodes[:-1])
+    u, v = g.find_edges(s.edges)
+    assert th.equal(s.nodes[s.src], u)
+    assert th.equal(s.nodes[s.dst], v)
+    assert len(nodes) == len(np.unique(np.concatenate([u.numpy(), v.numpy()])))
+    # the edges grow a connected neighborhood
+    seen = {int(u[0]), int(v[0])}
+    for i in range(1, sample_size):
+        assert int(u[i]) in seen or int(v[i]) in seen
+        seen.update([int(u[i]), int(v[i])])
+    # negative edges keep one end of their positive edge
+    assert len(s.neg_src) == negative_rate * sample_size
+    pos = th.arange(len(s.neg_src)) % sample_size
+    keep = (s.neg_src == s.src[pos]) | (s.neg_dst == s.dst[pos])
+    assert keep.all()
+    assert (s.neg_src < len(nodes)).all() and (s.neg_dst < len(nodes)).all()
+
+def test_edge_neighborhood_sampler():
+    g = generate_graph()
+    samples = list(EdgeNeighborhoodSampler(g, 50, negative_rate=3,
+                                           num_samples=5, seed=42))
+    assert len(samples) == 5
+    for s in samples:
+        check_sample(g, s, 50, 3)
+    # reproducible with any number of workers
+    samples2 = list(EdgeNeighborhoodSampler(g, 50, negative_rate=3,
+                                            num_samples=5, num_workers=2,
+                                            seed=42))
+    for s, s2 in zip(samples, samples2):
+        assert th.equal(s.edges, s2.edges)
+        assert th.equal(s.neg_src, s2.neg_src)
+        assert th.equal(s.neg_dst, s2.neg_dst)
+    assert not th.equal(samples[0].edges, samples[1].edges)
+
+    # all the edges
+    s = next(EdgeNeighborhoodSampler(g, 300, negative_rate=2,
+                                     negative_mode='degree', seed=0))
+    check_sample(g, s, 300, 2)
+    assert th.equal(th.sort(s.edges)[0], th.arange(300))
+
+if __name__ == '__main__':
+    test_edge_neighborhood_sampler()
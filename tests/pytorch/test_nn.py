@@ -0,0 +1,60 @@
+import torch as th
+import dgl
+import dgl.function as fn
+from dgl.nn import edge_softmax
+import utils as U
+
+def generate_graph():
+    g = dgl.DGLGraph()
+    g.add_nodes(10)
+    # create a graph where 0 is the source and 9 is the sink
+    for i in range(1, 9):
+        g.add_edge(0, i)
+        g.add_edge(i, 9)
+    # add a back flow from 9 to 0
+    g.add_edge(9, 0)
+    return g
+
+def test_edge_softmax():
+    g = generate_graph()
+    H = 3
+    score = th.randn(17, H, 1) * 100
+
+    # reference: softmax over the in-edges of each node
+    eid = th.arange(17)
+    _, dst = g.find_edges(eid)
+    ref = th.zeros(17, H, 1)
+    for v in range(10):
+        in_eid = g.in_edges(v, form='eid')
+        ref[in_eid] = th.softmax(score[in_eid], 0)
+
+    a = edge_softmax(g, score)
+    assert a.shape == score.shape
+    assert U.allclose(a, ref)
+    assert not th.isnan(a).any()
+    # normalized over the in-edges of each node
+    ssum = th.zeros(10, H, 1).index_add_(0, dst, a)
+    assert U.allclose(ssum[1:], th.ones(9, H, 1))
+
+    # 1-d scores
+    a1 = edge_softmax(g, score[:, 0, 0])
+    assert U.allclose(a1, ref[:, 0, 0])
+
+    # backward
+    score = th.randn(17, H, dtype=th.float64, requires_grad=True)
+    assert th.autograd.gradcheck(lambda s: edge_softmax(g, s), (score,))
+
+    # used with builtin SPMV
+    g.ndata['h'] = th.randn(10, 4)
+    g.edata['a'] = edge_softmax(g, th.randn(17, 1))
+    g.update_all(fn.src_mul_edge(src='h', edge='a', out='m'),
+                 fn.sum(msg='m', out='h2'))
+    def _wfunc(nodes):
+        return {'h3' : th.sum(nodes.mailbox['m'], 1)}
+    def _wmsg(edges):
+        return {'m' : edges.src['h'] * edges.data['a']}
+    g.update_all(_wmsg, _wfunc)
+    assert U.allclose(g.ndata['h2'], g.ndata['h3'])
+
+if __name__ == '__main__':
+    test_edge_softmax()
@@ -1,5 +1,5 @@
 import dgl
-from dgl.frame import Frame, FrameRef, Column
+from dgl.frame import Frame, FrameRef, Column, MMapColumn
 from dgl.graph_index import create_graph_index
 from dgl.utils import toindex
 import dgl.backend as backend
@@ -8,6 +8,12 @@ import utils as U
 import torch
 import pickle
 import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
 
 def _reconstruct_pickle(obj):
     f = io.BytesIO()
@@ -142,9 +148,134 @@ def test_pickling_graph():
     _assert_is_identical(g, new_g)
     _assert_is_identical(g2, new_g2)
 
+def test_pickling_shared_memory():
+    g = dgl.DGLGraph()
+    g.add_nodes(1000)
+    g.add_edges(torch.arange(0, 999), torch.arange(1, 1000))
+    g.ndata['x'] = torch.randn(1000, 7)
+    g.edata['a'] = torch.randn(999, 6)
+    g2 = dgl.DGLGraph()
+    g2.add_nodes(4)
+    g2.add_edges([0, 1], [2, 3])
+    g2.ndata['x'] = torch.randn(4, 7)
+    g2.edata['a'] = torch.randn(2, 6)
+    bg = dgl.batch([g, g2])
+    bg.share_memory()
+
+    # only the shared memory handles are pickled
+    data = pickle.dumps(bg)
+    assert len(data) < bg.ndata['x'].numel() * 4
+    bg2 = pickle.loads(data)
+    _assert_is_identical(bg, bg2)
+    new_g, new_g2 = dgl.unbatch(bg2)
+    _assert_is_identical(g, new_g)
+    _assert_is_identical(g2, new_g2)
+
+    # the receiver shares the feature memory with the sender
+    bg2.ndata['x'][0] = 0
+    assert U.allclose(bg.ndata['x'][0], torch.zeros(7))
+
+    # features replaced after sharing are pickled as usual
+    bg.ndata['x'] = torch.randn(1004, 7)
+    bg3 = _reconstruct_pickle(bg)
+    _assert_is_identical(bg, bg3)
+
+    # the edges are added from the mapped arrays without a copy
+    data = pickle.dumps(bg)
+    dgl.utils.reset_copy_stats()
+    bg4 = pickle.loads(data)
+    assert len(dgl.utils.copy_stats()) == 0
+    assert bg4.number_of_edges() == bg.number_of_edges()
+
+def _block_exists(name):
+    from multiprocessing.shared_memory import SharedMemory
+    try:
+        shm = SharedMemory(name=name)
+    except FileNotFoundError:
+        return False
+    # do not let the tracker of this process remove the block
+    from multiprocessing import resource_tracker
+    resource_tracker.unregister('/' + name, 'shared_memory')
+    shm.close()
+    return True
+
+def test_shared_memory_cleanup():
+    from dgl.shared_memory import SharedArray
+    # a block that is never pickled is removed with its array
+    arr = SharedArray(np.arange(10))
+    name = arr.name
+    assert _block_exists(name)
+    del arr
+    assert not _block_exists(name)
+
+    # a block that is pickled but never unpickled is removed by the
+    # resource tracker when the process that created it exits
+    code = ('import pickle, numpy as np\n'
+            'from dgl.shared_memory import SharedArray\n'
+            'arr = SharedArray(np.arange(10))\n'
+            'pickle.dumps(arr)\n'
+            'print(arr.name)\n')
+    out = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE,
+                         stderr=subprocess.PIPE, check=True)
+    name = out.stdout.decode().strip()
+    for _ in range(50):
+        if not _block_exists(name):
+            break
+        time.sleep(0.1)
+    assert not _block_exists(name)
+
+def test_pickling_mmap_column():
+    x = np.random.randn(20, 3).astype(np.float32)
+    path = os.path.join(tempfile.mkdtemp(), 'x.npy')
+    np.save(path, x)
+    g = dgl.DGLGraph()
+    g.add_nodes(20)
+    g.add_edges(torch.arange(0, 19), torch.arange(1, 20))
+    g.ndata['h'] = MMapColumn(path, page_size=4)
+    g.ndata['h'][[0, 5]]
+
+    g2 = _reconstruct_pickle(g)
+    col = g2._node_frame._frame._columns['h']
+    assert isinstance(col, MMapColumn)
+    assert U.allclose(g2.ndata['h'], torch.tensor(x))
+    assert U.allclose(g2.nodes[[3, 17]].data['h'], torch.tensor(x[[3, 17]]))
+
+    # the file is mapped again, not pickled
+    x = np.random.randn(2000, 16).astype(np.float32)
+    np.save(path, x)
+    col = MMapColumn(path, mode='r+')
+    assert len(pickle.dumps(col)) < 2000
+    col2 = _reconstruct_pickle(col)
+    assert U.allclose(col2[toindex([5, 1999])], torch.tensor(x[[5, 1999]]))
+    col2.update(toindex([5]), torch.zeros(1, 16), False)
+    assert np.all(np.load(path)[5] == 0)
+    # raw binary files too
+    raw = os.path.join(os.path.dirname(path), 'x.bin')
+    x.tofile(raw)
+    col = MMapColumn(raw, dtype='float32', shape=(-1, 16))
+    assert len(pickle.dumps(col)) < 2000
+    assert U.allclose(_reconstruct_pickle(col).data, torch.tensor(x))
+
+def test_pickling_lazy_column():
+    g = dgl.DGLGraph()
+    g.add_nodes(10000)
+    g.add_edges(torch.arange(0, 9999), torch.arange(1, 10000))
+    g.ndata['h'] = torch.randn(10000, 64)
+    sg = g.subgraph([0, 1, 2, 3])
+    sg.copy_from_parent()
+    # only the rows of the subgraph are pickled
+    assert len(pickle.dumps(sg._node_frame)) < 10000
+    col = sg._node_frame._frame._columns['h']
+    assert not col.resolved
+    frame = _reconstruct_pickle(sg._node_frame)
+    assert U.allclose(frame['h'], g.ndata['h'][:4])
 
 if __name__ == '__main__':
     test_pickling_index()
     test_pickling_graph_index()
     test_pickling_frame()
     test_pickling_graph()
+    test_pickling_shared_memory()
+    test_shared_memory_cleanup()
+    test_pickling_mmap_column()
+    test_pickling_lazy_column()
@@ -569,6 +569,304 @@ def test_spmv_3d_feat():
     g.update_all(message_func=src_mul_edge_udf, reduce_func=sum_udf) # 3
     assert U.allclose(g.ndata['h'], ans)
 
+def test_gather_memo():
+    g = generate_graph()
+    u = th.tensor([0, 0, 0, 3, 4, 9])
+    v = th.tensor([1, 2, 3, 9, 9, 0])
+
+    # a UDF reading the same source field twice gathers it once
+    dgl.utils.reset_gather_stats()
+    def message_func(edges):
+        return {'m' : edges.src['f2'] + edges.src['f2'] * edges.data['e2']}
+    g.send_and_recv((u, v), message_func, fn.sum(msg='m', out='v1'))
+    stats = dgl.utils.gather_stats()
+    assert stats['hits'] == 1
+    assert stats['bytes_saved'] == 6 * D * 4
+    ans = g.ndata['v1']
+
+    # bundled builtins reading the same fields share the gathers
+    dgl.utils.reset_gather_stats()
+    g.send_and_recv((u, v),
+                    [fn.src_mul_edge(src='f2', edge='e2', out='m1'),
+                     fn.src_mul_edge(src='f2', edge='e2', out='m2')],
+                    [fn.max(msg='m1', out='v2'), fn.max(msg='m2', out='v3')])
+    stats = dgl.utils.gather_stats()
+    assert stats['hits'] == 2
+    assert stats['bytes_saved'] == 6 * D * 4 + 6 * 4
+    assert U.allclose(g.ndata['v2'], g.ndata['v3'])
+
+    # so do the edge reads of SPMV
+    dgl.utils.reset_gather_stats()
+    g.send_and_recv((u, v),
+                    [fn.src_mul_edge(src='f2', edge='e2', out='m1'),
+                     fn.src_mul_edge(src='f2', edge='e2', out='m2')],
+                    [fn.sum(msg='m1', out='v5'), fn.sum(msg='m2', out='v6')])
+    stats = dgl.utils.gather_stats()
+    assert stats['hits'] == 1
+    assert stats['bytes_saved'] == 6 * 4
+    g.send_and_recv((u, v), message_func, fn.sum(msg='m', out='v4'))
+    assert U.allclose(g.ndata['v4'], ans)
+
+def test_v2v_copy_src_norm():
+    g = generate_graph()
+    u = th.tensor([0, 0, 0, 3, 4, 9])
+    v = th.tensor([1, 2, 3, 9, 9, 0])
+    for norm in ['right', 'left', 'both']:
+        src_norm, dst_norm = g.degree_norm(norm)
+        def message_func(edges):
+            w = src_norm[edges.src['id']] * dst_norm[edges.dst['id']]
+            return {'m' : edges.src['f2'] * w.unsqueeze(1)}
+        g.ndata['id'] = th.arange(10)
+        # update_all
+        g.update_all(fn.copy_src_norm(src='f2', out='m', norm=norm),
+                     fn.sum(msg='m', out='v1'))
+        g.update_all(message_func, fn.sum(msg='m', out='v2'))
+        assert U.allclose(g.ndata['v1'], g.ndata['v2'])
+        # with a UDF reducer
+        g.update_all(fn.copy_src_norm(src='f2', out='m', norm=norm),
+                     lambda nodes : {'v3' : th.sum(nodes.mailbox['m'], 1)})
+        assert U.allclose(g.ndata['v3'], g.ndata['v2'])
+        # send_and_recv
+        g.send_and_recv((u, v), fn.copy_src_norm(src='f2', out='m', norm=norm),
+                        fn.sum(msg='m', out='v1'))
+        g.send_and_recv((u, v), message_func, fn.sum(msg='m', out='v2'))
+        assert U.allclose(g.ndata['v1'], g.ndata['v2'])
+        del g.ndata['id']
+    # the normalized adjmat is cached, and invalidated on mutation
+    assert 'adj_norm_both' in g._graph._cache
+    g.add_edge(1, 9)
+    g.update_all(fn.copy_src_norm(src='f2', out='m'), fn.sum(msg='m', out='v1'))
+    src_norm, dst_norm = g.degree_norm()
+    assert U.allclose(dst_norm[9], th.tensor(9 ** -.5))
+    g.ndata['id'] = th.arange(10)
+    g.update_all(message_func, fn.sum(msg='m', out='v2'))
+    assert U.allclose(g.ndata['v1'], g.ndata['v2'])
+
+def test_v2v_head_batched():
+    g = generate_graph()
+    H = 3
+    u = th.tensor([0, 0, 0, 3, 4, 9])
+    v = th.tensor([1, 2, 3, 9, 9, 0])
+    def message_func(edges):
+        return {'m' : edges.src['h'] * edges.data['a'].view(-1, H, 1)}
+    for eshape in [(17, H), (17, H, 1)]:
+        h = th.randn(10, H, D, requires_grad=True)
+        a = th.randn(eshape, requires_grad=True)
+        mfunc = fn.src_mul_edge(src='h', edge='a', out='m')
+        g.ndata['h'] = h
+        g.edata['a'] = a
+        assert mfunc.is_spmv_supported(g)
+        # update_all
+        g.update_all(mfunc, fn.sum(msg='m', out='v1'))
+        v1 = g.ndata['v1']
+        v1.sum().backward()
+        grad_h, grad_a = h.grad.clone(), a.grad.clone()
+        h.grad.zero_()
+        a.grad.zero_()
+        g.update_all(message_func, fn.sum(msg='m', out='v2'))
+        v2 = g.ndata['v2']
+        v2.sum().backward()
+        assert v1.shape == (10, H, D)
+        assert U.allclose(v1, v2)
+        assert U.allclose(grad_h, h.grad)
+        assert U.allclose(grad_a, a.grad)
+        # send_and_recv
+        g.send_and_recv((u, v), mfunc, fn.sum(msg='m', out='v1'))
+        g.send_and_recv((u, v), message_func, fn.sum(msg='m', out='v2'))
+        assert U.allclose(g.ndata['v1'], g.ndata['v2'])
+        g.ndata.pop('v1')
+        g.ndata.pop('v2')
+    # the heads of a 2-d source feature
+    g.ndata['h'] = th.randn(10, H)
+    g.edata['a'] = th.randn(17, H)
+    g.update_all(fn.src_mul_edge(src='h', edge='a', out='m'),
+                 fn.sum(msg='m', out='v1'))
+    g.update_all(lambda edges : {'m' : edges.src['h'] * edges.data['a']},
+                 fn.sum(msg='m', out='v2'))
+    assert U.allclose(g.ndata['v1'], g.ndata['v2'])
+    # a single head
+    g.ndata['h'] = th.randn(10, 1, D)
+    g.edata['a'] = th.randn(17, 1, 1)
+    g.update_all(fn.src_mul_edge(src='h', edge='a', out='m'),
+                 fn.sum(msg='m', out='v1'))
+    g.update_all(lambda edges : {'m' : edges.src['h'] * edges.data['a']},
+                 fn.sum(msg='m', out='v2'))
+    assert U.allclose(g.ndata['v1'], g.ndata['v2'])
+    # not head-batched
+    g.edata['a'] = th.randn(17, H, 2)
+    assert not fn.src_mul_edge(src='h', edge='a', out='m').is_spmv_supported(g)
+
+def test_segment_reduce():
+    g = generate_graph()
+    u = th.tensor([0, 0, 0, 3, 4, 9, 5])
+    v = th.tensor([1, 2, 3, 9, 9, 0, 9])
+    udfs = {
+        'max' : lambda x : th.max(x, 1)[0],
+        'min' : lambda x : th.min(x, 1)[0],
+        'mean' : lambda x : th.mean(x, 1),
+        'prod' : lambda x : th.prod(x, 1),
+    }
+    for name, udf in udfs.items():
+        builtin = getattr(fn, name)
+        def reduce_func(nodes):
+            return {'r2' : udf(nodes.mailbox['m'])}
+        for feat in ['f1', 'f2']:
+            # update_all
+            x = g.ndata[feat].clone().requires_grad_()
+            g.ndata['x'] = x
+            g.update_all(fn.copy_src(src='x', out='m'), builtin(msg='m', out='r1'))
+            r1 = g.ndata.pop('r1')
+            r1.sum().backward()
+            grad = x.grad.clone()
+            x.grad.zero_()
+            g.update_all(fn.copy_src(src='x', out='m'), reduce_func)
+            r2 = g.ndata.pop('r2')
+            r2.sum().backward()
+            assert U.allclose(r1, r2)
+            assert U.allclose(grad, x.grad)
+            # with a UDF message
+            message_func = lambda edges : {'m' : edges.src['x'] * 2}
+            g.update_all(message_func, builtin(msg='m', out='r1'))
+            g.update_all(message_func, reduce_func)
+            assert U.allclose(g.ndata.pop('r1'), g.ndata.pop('r2'))
+            # send_and_recv
+            g.send_and_recv((u, v), fn.copy_src(src='x', out='m'),
+                            builtin(msg='m', out='r1'))
+            g.send_and_recv((u, v), fn.copy_src(src='x', out='m'), reduce_func)
+            assert U.allclose(g.ndata.pop('r1'), g.ndata.pop('r2'))
+            if feat == 'f2':
+                # send and recv, on the message scheme of 'f2'
+                g.send((u, v), message_func)
+                g.recv(th.tensor([9, 1]), builtin(msg='m', out='r1'))
+                g.send((u, v), message_func)
+                g.recv(th.tensor([9, 1]), reduce_func)
+                assert U.allclose(g.ndata.pop('r1'), g.ndata.pop('r2'))
+            g.ndata.pop('x')
+    # multiple reducers on the same messages
+    g.update_all(fn.copy_src(src='f2', out='m'),
+                 [fn.max(msg='m', out='r1'), fn.mean(msg='m', out='r2'),
+                  fn.sum(msg='m', out='r3')])
+    g.update_all(fn.copy_src(src='f2', out='m'),
+                 lambda nodes : {'r4' : th.max(nodes.mailbox['m'], 1)[0],
+                                 'r5' : th.mean(nodes.mailbox['m'], 1)})
+    assert U.allclose(g.ndata['r1'], g.ndata['r4'])
+    assert U.allclose(g.ndata['r2'], g.ndata['r5'])
+    # without the segment max of the backend, max falls back to bucketing
+    import dgl.backend
+    dgl.backend._enabled_apis.remove('unsorted_1d_segment_max')
+    try:
+        assert not fn.max(msg='m', out='r1').is_segment_supported()
+        g.update_all(fn.copy_src(src='f2', out='m'), fn.max(msg='m', out='r1'))
+        assert U.allclose(g.ndata['r1'], g.ndata['r4'])
+    finally:
+        dgl.backend._enabled_apis.add('unsorted_1d_segment_max')
+
+def test_binary_message():
+    g = generate_graph()
+    g.ndata['f3'] = th.randn(10, D) + 3
+    g.edata['e3'] = th.randn(17, D)
+    g.edata['e4'] = th.randn(17, D) + 3
+    u = th.tensor([0, 0, 0, 3, 4, 9, 5])
+    v = th.tensor([1, 2, 3, 9, 9, 0, 9])
+    ops = {'add' : lambda a, b : a + b, 'sub' : lambda a, b : a - b,
+           'mul' : lambda a, b : a * b, 'div' : lambda a, b : a / b,
+           'dot' : lambda a, b : (a * b).sum(-1, keepdim=True)}
+    fields = {'u' : 'f2', 'v' : 'f3', 'e' : 'e3'}
+    def _data(edges, target, field):
+        return {'u' : edges.src, 'v' : edges.dst, 'e' : edges.data}[target][field]
+    for lhs in ['u', 'v', 'e']:
+        for rhs in ['u', 'v', 'e']:
+            if lhs == rhs:
+                continue
+            for op, ref in ops.items():
+                name = '%s_%s_%s' % (lhs, op, rhs)
+                lf = fields[lhs]
+                # divide by features away from zero
+                rf = ('e4' if rhs == 'e' else 'f3') if op == 'div' else fields[rhs]
+                builtin = getattr(fn, name)(lf, rf, 'm')
+                assert builtin.name == name
+                def message_func(edges):
+                    return {'m' : ref(_data(edges, lhs, lf), _data(edges, rhs, rf))}
+                # apply_edges
+                g.apply_edges(builtin)
+                a1 = g.edata.pop('m')
+                g.apply_edges(message_func)
+                assert U.allclose(a1, g.edata.pop('m'))
+                # update_all and send_and_recv, with sum and max
+                for reducer in [fn.sum, fn.max]:
+                    g.update_all(builtin, reducer(msg='m', out='r1'))
+                    g.update_all(message_func, reducer(msg='m', out='r2'))
+                    assert U.allclose(g.ndata.pop('r1'), g.ndata.pop('r2'))
+                    g.send_and_recv((u, v), builtin, reducer(msg='m', out='r1'))
+                    g.send_and_recv((u, v), message_func, reducer(msg='m', out='r2'))
+                    assert U.allclose(g.ndata.pop('r1'), g.ndata.pop('r2'))
+    # head-batched features
+    g.ndata['k'] = th.randn(10, 2, D)
+    g.ndata['q'] = th.randn(10, 2, D)
+    g.apply_edges(fn.u_dot_v('k', 'q', 's'))
+    assert g.edata['s'].shape == (17, 2, 1)
+    # gradients through the SPMV
+    x = th.randn(10, D, requires_grad=True)
+    y = th.randn(10, D, requires_grad=True)
+    g.ndata.update({'x' : x, 'y' : y})
+    for op in ['add', 'sub', 'mul', 'div', 'dot']:
+        g.update_all(getattr(fn, 'u_%s_v' % op)('x', 'y', 'm'),
+                     fn.sum(msg='m', out='r'))
+        gx, gy = th.autograd.grad(g.ndata.pop('r').sum(), [x, y])
+        g.update_all(lambda edges : {'m' : ops[op](edges.src['x'], edges.dst['y'])},
+                     fn.sum(msg='m', out='r'))
+        rx, ry = th.autograd.grad(g.ndata.pop('r').sum(), [x, y])
+        assert U.allclose(gx, rx)
+        assert U.allclose(gy, ry)
+    assert fn.u_add_v('x', 'y', 'm').is_spmv_supported(g)
+    assert not fn.v_div_u('x', 'y', 'm').is_spmv_supported(g)
+    # a node without messages gets 0, even if dividing by 0
+    g = dgl.DGLGraph()
+    g.add_nodes(3)
+    g.add_edges([0, 1], [1, 1])
+    g.ndata['x'] = th.randn(3, D)
+    g.ndata['y'] = th.randn(3, D)
+    g.ndata['y'][0] = 0
+    for op in ['add', 'sub', 'mul', 'div', 'dot']:
+        name = 'u_%s_v' % op
+        g.update_all(getattr(fn, name)('x', 'y', 'm'), fn.sum(msg='m', out='r1'))
+        g.update_all(lambda edges : {'m' : ops[op](edges.src['x'], edges.dst['y'])},
+                     fn.sum(msg='m', out='r2'))
+        assert not th.isnan(g.ndata['r1']).any()
+        assert U.allclose(g.ndata.pop('r1'), g.ndata.pop('r2'))
+
+def test_spmv_backward():
+    g = generate_graph()
+    # a multigraph edge, so the sorted matrix has duplicates
+    g.add_edge(0, 1)
+    h = th.randn(10, D, requires_grad=True)
+    w = th.randn(18, 1, requires_grad=True)
+    def _udf(edges):
+        return {'m' : edges.src['h'] * edges.data['w']}
+    def _run(mfunc, nodes=None):
+        g.ndata['h'] = h
+        g.edata['w'] = w
+        if nodes is None:
+            g.update_all(mfunc, fn.sum(msg='m', out='y'))
+        else:
+            g.pull(nodes, mfunc, fn.sum(msg='m', out='y'))
+        y = g.ndata.pop('y')
+        return [y] + list(th.autograd.grad((y * y).sum(), [h, w],
+                                           allow_unused=True))
+    for nodes in [None, [1, 3, 9]]:
+        for r1, r2 in zip(_run(fn.src_mul_edge('h', 'w', 'm'), nodes),
+                          _run(_udf, nodes)):
+            assert U.allclose(r1, r2)
+    # the sorted formats are cached with the adjacency matrix of the graph
+    r1 = _run(fn.copy_src('h', 'm'))
+    r2 = _run(lambda edges : {'m' : edges.src['h']})
+    assert U.allclose(r1[0], r2[0])
+    assert U.allclose(r1[1], r2[1])
+    adj, _ = g._graph._cache['adj']
+    assert len(adj._sorted._ctx_dict) == 1
+    g.add_edge(2, 3)
+    assert 'adj' not in g._graph._cache
+
 if __name__ == '__main__':
     test_v2v_update_all()
     test_v2v_snr()
@@ -581,3 +879,9 @@ if __name__ == '__main__':
     test_update_all_multi_fallback()
     test_pull_multi_fallback()
     test_spmv_3d_feat()
+    test_gather_memo()
+    test_v2v_copy_src_norm()
+    test_v2v_head_batched()
+    test_segment_reduce()
+    test_binary_message()
+    test_spmv_backward()
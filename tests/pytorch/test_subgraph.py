@@ -65,6 +65,37 @@ def test_basics():
     sg.ndata['h'] = th.zeros((6, D))
     assert U.allclose(h, g.ndata['h'])
 
+def test_lazy_copy():
+    g = generate_graph()
+    g.ndata['x'] = th.randn(10, D)
+    nid = [0, 2, 3, 6, 7, 9]
+    sg = g.subgraph(nid)
+    sg.copy_from_parent()
+    cols = sg._node_frame._frame._columns
+    assert set(sg.ndata.keys()) == {'h', 'x'}
+    assert not any(col.resolved for col in cols.values())
+    # only the accessed column is gathered
+    assert U.allclose(sg.ndata['x'], g.ndata['x'][nid])
+    assert cols['x'].resolved and not cols['h'].resolved
+    # replaced parent data is not seen
+    h = g.ndata['h']
+    g.ndata['h'] = th.zeros((10, D))
+    assert U.allclose(sg.ndata['h'], h[nid])
+    # only written columns go back to the parent
+    g.ndata['x'] = th.zeros((10, D))
+    sg.nodes[[1, 2]].data['h'] = th.ones((2, D))
+    sg.ndata['y'] = th.ones((6, 2))
+    sg.copy_to_parent()
+    assert U.allclose(g.ndata['x'], th.zeros((10, D)))
+    assert U.allclose(g.ndata['h'][[2, 3]], th.ones((2, D)))
+    assert U.allclose(g.ndata['h'][[0, 6, 7, 9]], h[[0, 6, 7, 9]])
+    assert U.allclose(g.ndata['y'][nid], th.ones((6, 2)))
+    # edge features that are not touched are not written
+    l = g.edata['l']
+    g.edata['l'] = th.zeros((17, D))
+    sg.copy_to_parent()
+    assert U.allclose(g.edata['l'], th.zeros((17, D)))
+
 def test_merge():
     # FIXME: current impl cannot handle this case!!!
     #        comment out for now to test CI
@@ -95,4 +126,5 @@ def test_merge():
 
 if __name__ == '__main__':
     test_basics()
+    test_lazy_copy()
     #test_merge()